@@ -0,0 +1,39 @@
+import numpy as np
+
+MAP_KINDS = ("uniform", "smooth", "corridor")
+
+
+def random_cost_grids(n_rows, n_cols, kind="uniform", seed=0, low=0.0, high=5.0):
+    """
+    Seeded (price, energy, time) cost grids of shape (n_rows, n_cols).
+
+    uniform:  i.i.d. integers in [low, high] (like the toy map)
+    smooth:   white noise blurred to spatially correlated fields, rescaled to [low, high]
+    corridor: uniform fields with a cheap-but-slow diagonal band from start to goal
+    """
+    if kind not in MAP_KINDS:
+        raise ValueError(f"Unknown map kind {kind!r}; expected one of {list(MAP_KINDS)}")
+    rng = np.random.default_rng(seed)
+    shape = (3, n_rows, n_cols)
+    if kind == "smooth":
+        from scipy.ndimage import gaussian_filter
+
+        sigma = max(1.0, min(n_rows, n_cols) / 10.0)
+        grids = np.stack([gaussian_filter(g, sigma, mode="nearest") for g in rng.standard_normal(shape)])
+        lo = grids.min(axis=(1, 2), keepdims=True)
+        span = np.ptp(grids, axis=(1, 2), keepdims=True)
+        grids = low + (high - low) * (grids - lo) / np.where(span > 0, span, 1.0)
+    else:
+        grids = rng.integers(int(low), int(high) + 1, size=shape).astype(float)
+    if kind == "corridor":
+        r, c = np.meshgrid(np.linspace(1, 0, n_rows), np.linspace(0, 1, n_cols), indexing="ij")
+        band = np.abs(r - c) < 0.1
+        grids[0][band] = low
+        grids[1][band] = low
+        grids[2][band] = high
+    return grids[0], grids[1], grids[2]
+
+
+def default_start_goal(n_rows, n_cols):
+    """Bottom-left start, top-right goal, as in configs/toy_3x3.yaml."""
+    return (n_rows - 1, 0), (0, n_cols - 1)
@@ -1,4 +1,6 @@
-from .gridworld import ACTIONS, LEFT_OF, RIGHT_OF, step_det
+import numpy as np
+
+from .gridworld import ACTIONS, DIR, LEFT_OF, RIGHT_OF, step_det
 
 def slip_transitions(s, a, slip, n_rows, n_cols, goal=None):
     if goal is not None and s == goal:
@@ -7,4 +9,60 @@ def slip_transitions(s, a, slip, n_rows, n_cols, goal=None):
     for aa, p in [(a, 1 - slip), (LEFT_OF[a], slip / 2), (RIGHT_OF[a], slip / 2)]:
         s2 = step_det(s, aa, n_rows, n_cols)
         probs[s2] = probs.get(s2, 0.0) + p
-    return probs
\ No newline at end of file
+    return probs
+
+
+def wall_mask(walls, n_rows, n_cols):
+    """Boolean (S,) mask of wall cells from a list of (r, c) cells or an (n_rows, n_cols) grid."""
+    mask = np.zeros(n_rows * n_cols, bool)
+    if walls is None:
+        return mask
+    walls = np.asarray(walls)
+    if walls.dtype == bool and walls.shape == (n_rows, n_cols):
+        return walls.reshape(-1).copy()
+    if walls.size:
+        walls = walls.reshape(-1, 2)
+        mask[walls[:, 0] * n_cols + walls[:, 1]] = True
+    return mask
+
+
+def slip_successors(n_rows, n_cols, slip, goal=None, walls=None, states=None):
+    """
+    Vectorized slip_transitions for every (s, a) pair at once (or only the
+    pairs of the state ids `states`, in that order, to patch a few rows).
+
+    States and pairs use the integer ids of models/indexing.py
+    (s = r*n_cols + c, sa = s*4 + a). Returns (succ, prob), both of
+    shape (n_sa, 3): successor state ids and probabilities of the intended
+    move and the two side slips. Colliding successors are not merged; the
+    goal is absorbing. Moves into `walls` (cells or a boolean grid, see
+    wall_mask) are blocked like moves off the grid.
+    """
+    ids = np.arange(n_rows * n_cols) if states is None else np.asarray(states, int).reshape(-1)
+    r, c = np.divmod(ids, n_cols)
+
+    dr = np.array([DIR[a][0] for a in ACTIONS])
+    dc = np.array([DIR[a][1] for a in ACTIONS])
+    a_id = {a: k for k, a in enumerate(ACTIONS)}
+    branches = np.array([[a_id[a], a_id[LEFT_OF[a]], a_id[RIGHT_OF[a]]] for a in ACTIONS])
+
+    # (S, A, 3) tentative moves; blocked moves stay in place
+    rr = r[:, None, None] + dr[branches][None]
+    cc = c[:, None, None] + dc[branches][None]
+    inside = (rr >= 0) & (rr < n_rows) & (cc >= 0) & (cc < n_cols)
+    if walls is not None:
+        blocked = wall_mask(walls, n_rows, n_cols)
+        inside &= ~blocked[np.where(inside, rr * n_cols + cc, 0)]
+    rr = np.where(inside, rr, r[:, None, None])
+    cc = np.where(inside, cc, c[:, None, None])
+
+    succ = (rr * n_cols + cc).reshape(-1, 3)
+    prob = np.tile([1.0 - slip, slip / 2.0, slip / 2.0], (succ.shape[0], 1))
+
+    if goal is not None:
+        g = goal[0] * n_cols + goal[1]
+        rows = np.repeat(ids == g, len(ACTIONS))
+        succ[rows] = g
+        prob[rows] = [1.0, 0.0, 0.0]
+
+    return succ, prob
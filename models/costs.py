@@ -1,31 +1,39 @@
-from envs.slip import slip_transitions
+from envs.slip import slip_successors
+from models.indexing import state_id
 import numpy as np
 
-def build_cost_vectors(price_grid, energy_grid, time_grid, start, goal, n_rows, n_cols, sa_list, slip):
-    price_grid = np.asarray(price_grid, float)
-    energy_grid = np.asarray(energy_grid, float)
-    time_grid = np.asarray(time_grid, float)
+def build_cost_matrix(cost_grids, goal, n_rows, n_cols, slip, succ=None, prob=None):
+    """
+    Expected one-step costs for any number of cost grids at once.
 
-    c = np.zeros(len(sa_list))
-    e = np.zeros(len(sa_list))
-    t = np.zeros(len(sa_list))
+    cost_grids is (K, n_rows, n_cols) (or a list of K grids); row k of the
+    returned (K, S*A) matrix is sum_{s'} P(s'|s,a) * grid_k[s'], where
+    entering the goal is free. succ/prob are the shared slip_successors
+    arrays and are rebuilt when not given.
+    """
+    grids = np.asarray(cost_grids, float).reshape(-1, n_rows * n_cols)
+    if succ is None or prob is None:
+        succ, prob = slip_successors(n_rows, n_cols, slip, goal=goal)
+    return pair_costs(grids, succ, prob, state_id(*goal, n_cols))
 
-    for k, (s, a) in enumerate(sa_list):
-        trans = slip_transitions(s, a, slip, n_rows, n_cols, goal=goal)
 
-        ck = 0.0
-        ek = 0.0
-        tk = 0.0
-        for s2, p in trans.items():
-            if s2 == goal:
-                continue
-            r2, c2 = s2
-            ck += p * float(price_grid[r2, c2])
-            ek += p * float(energy_grid[r2, c2])
-            tk += p * float(time_grid[r2, c2])
+def pair_costs(grids, succ, prob, goal_state, pairs=None):
+    """
+    (K, len(pairs)) columns of the cost matrix for pair ids `pairs` (all
+    pairs if None); grids is (K, S). Used to patch a few columns after
+    cost-cell or goal edits (CompiledMDP.with_costs / with_dynamics).
+    """
+    if pairs is not None:
+        succ, prob = succ[pairs], prob[pairs]
+    weights = np.where(succ == goal_state, 0.0, prob)  # (n_pairs, 3)
+    return np.einsum("kij,ij->ki", grids[:, succ], weights)
 
-        c[k] = ck
-        e[k] = ek
-        t[k] = tk
 
-    return c, e, t
\ No newline at end of file
+def build_cost_vectors(price_grid, energy_grid, time_grid, start, goal, n_rows, n_cols, sa_list, slip):
+    """
+    (c, e, t) vectors in build_sa_index order; thin wrapper over
+    build_cost_matrix (sa_list is only used for its length).
+    """
+    C = build_cost_matrix([price_grid, energy_grid, time_grid], goal, n_rows, n_cols, slip)
+    c, e, t = C
+    return c, e, t
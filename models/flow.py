@@ -1,6 +1,9 @@
 from envs.gridworld import ACTIONS
-from envs.slip import slip_transitions
+from envs.slip import slip_transitions, slip_successors
 import numpy as np
+import scipy.sparse as sp
+
+from models.indexing import N_ACTIONS, state_id, state_sa_ids
 
 def build_flow_A_b(n_rows, n_cols, start, goal, slip, sa_list, sa_idx):
     """
@@ -42,4 +45,88 @@ def build_flow_A_b(n_rows, n_cols, start, goal, slip, sa_list, sa_idx):
             i = row_of[s_to]
             A[i, sa_idx[(s_prev, a_prev)]] -= float(p)
 
-    return A, b
\ No newline at end of file
+    return A, b
+
+
+def build_transition_matrix(succ, prob, n_states):
+    """
+    Sparse P with P[sa, s'] = P(s' | s, a), from slip_successors arrays.
+    Duplicate successors are summed; zero-probability branches are dropped.
+    """
+    n_sa, n_branch = succ.shape
+    keep = prob.ravel() > 0.0
+    rows = np.repeat(np.arange(n_sa), n_branch)[keep]
+    P = sp.coo_matrix((prob.ravel()[keep], (rows, succ.ravel()[keep])), shape=(n_sa, n_states))
+    return P.tocsr()
+
+
+def patch_transition_rows(P, rows, succ_rows, prob_rows):
+    """
+    P (CSR) with the pair rows `rows` (ascending) replaced by the
+    transitions in succ_rows / prob_rows; the other rows are copied
+    without re-sorting, so this costs one pass over the nonzeros.
+    """
+    new = build_transition_matrix(succ_rows, prob_rows, P.shape[1])
+    old_counts = np.diff(P.indptr)
+    patched = np.zeros(P.shape[0], bool)
+    patched[rows] = True
+    counts = old_counts.copy()
+    counts[rows] = np.diff(new.indptr)
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+
+    kept_src = ~np.repeat(patched, old_counts)
+    kept_dst = ~np.repeat(patched, counts)
+    data = np.empty(indptr[-1])
+    indices = np.empty(indptr[-1], P.indices.dtype)
+    data[kept_dst], indices[kept_dst] = P.data[kept_src], P.indices[kept_src]
+    data[~kept_dst], indices[~kept_dst] = new.data, new.indices
+    return sp.csr_matrix((data, indices, indptr), shape=P.shape)
+
+
+def flow_rhs(n_rows, n_cols, start, goal):
+    """b of the flow constraints: 1 on start's row (rows skip the goal)."""
+    n_states = n_rows * n_cols
+    keep_rows = np.flatnonzero(np.arange(n_states) != state_id(*goal, n_cols))
+    return (keep_rows == state_id(*start, n_cols)).astype(float)
+
+
+def build_flow_A_b_sparse(n_rows, n_cols, start, goal, slip, succ=None, prob=None):
+    """
+    Sparse (CSR) version of build_flow_A_b, same rows/columns and values.
+
+    A = (E - P^T) with the goal row removed and the goal's outflow dropped,
+    where E[s, (s,a)] = 1. Memory grows with nnz (~4 entries per column).
+    """
+    n_states = n_rows * n_cols
+    if succ is None or prob is None:
+        succ, prob = slip_successors(n_rows, n_cols, slip, goal=goal)
+    return flow_A_b_from_successors(succ, prob, n_states, state_id(*start, n_cols), [state_id(*goal, n_cols)])
+
+
+def flow_A_b_from_successors(succ, prob, n_states, start_state, goal_states, P=None):
+    """
+    A x = b for any MDP given as (n_states*4, n_branch) successor / probability
+    arrays over integer state ids (e.g. the product MDPs of models/product.py).
+    Rows are the non-goal states in id order; goal states are absorbing, so
+    their pairs generate no inflow. b is 1 on start_state's row. P: the
+    transition matrix of succ / prob, if already built.
+    """
+    n_sa = n_states * N_ACTIONS
+    goal_states = np.asarray(goal_states, int)
+    if P is None:
+        P = build_transition_matrix(succ, prob, n_states)
+
+    # no inflow is generated by the (absorbing) goals' own actions
+    not_goal_sa = np.ones(n_sa)
+    not_goal_sa[state_sa_ids(goal_states).ravel()] = 0.0
+    P = sp.diags(not_goal_sa) @ P
+
+    E = sp.csr_matrix(
+        (np.ones(n_sa), (np.repeat(np.arange(n_states), N_ACTIONS), np.arange(n_sa))),
+        shape=(n_states, n_sa),
+    )
+    keep_rows = np.flatnonzero(~np.isin(np.arange(n_states), goal_states))
+    A = (E - P.T).tocsr()[keep_rows]
+    A.eliminate_zeros()
+
+    return A, (keep_rows == start_state).astype(float)
@@ -1,7 +1,46 @@
+import numpy as np
+
 from envs.gridworld import ACTIONS
 
+# Integer encoding used by every array in the solvers:
+#   state id  s  = r*n_cols + c
+#   action id a  = position in ACTIONS (U, D, L, R)
+#   pair id   sa = s*N_ACTIONS + a
+N_ACTIONS = len(ACTIONS)
+ACTION_ID = {a: k for k, a in enumerate(ACTIONS)}
+
+
+def state_id(r, c, n_cols):
+    """State id of cell (r, c); works elementwise on arrays."""
+    return np.asarray(r) * n_cols + np.asarray(c)
+
+
+def state_rc(s, n_cols):
+    """(r, c) of state id(s) s."""
+    return np.divmod(s, n_cols)
+
+
+def sa_id(s, a):
+    """Pair id of state id(s) s and action id(s) a."""
+    return np.asarray(s) * N_ACTIONS + np.asarray(a)
+
+
+def sa_split(sa):
+    """(s, a) of pair id(s) sa."""
+    return np.divmod(sa, N_ACTIONS)
+
+
+def state_sa_ids(s):
+    """All pair ids of state id(s) s: shape (N_ACTIONS,) or (len(s), N_ACTIONS)."""
+    return sa_id(np.asarray(s)[..., None], np.arange(N_ACTIONS))
+
+
 def build_sa_index(n_rows, n_cols):
+    """
+    Tuple views of the integer encoding, for plotting and reporting:
+    states[s] = (r, c), sa_list[sa] = ((r, c), action), idx[((r, c), action)] = sa.
+    """
     states = [(r, c) for r in range(n_rows) for c in range(n_cols)]
     sa_list = [(s, a) for s in states for a in ACTIONS]
     idx = {sa: k for k, sa in enumerate(sa_list)}
-    return states, sa_list, idx
\ No newline at end of file
+    return states, sa_list, idx
@@ -0,0 +1,344 @@
+import hashlib
+import json
+from collections import OrderedDict
+from functools import cached_property
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+from envs.slip import slip_successors, wall_mask
+from models.costs import build_cost_matrix, pair_costs
+from models.flow import build_flow_A_b_sparse, build_transition_matrix, flow_A_b_from_successors, \
+    patch_transition_rows
+from models.indexing import build_sa_index, state_id, state_sa_ids
+
+# in-memory LRU of compiled maps, keyed by mdp_key
+CACHE_SIZE = 8
+_CACHE = OrderedDict()
+
+# compile_mdp patches a cached map with the same layout (shape, start, walls)
+# instead of rebuilding when at most this fraction of the cells' costs differ
+PATCH_MAX_FRACTION = 0.1
+
+# arrays written to / memory-mapped from the on-disk cache
+_DENSE = ("succ", "prob", "C", "b")
+_SPARSE = ("A", "P")
+
+
+def _freeze(a):
+    """a as a read-only array; a writeable view is copied first, since its base could still change it."""
+    a = np.asarray(a)
+    if a.flags.writeable:
+        if not a.flags.owndata:
+            a = a.copy()
+        a.flags.writeable = False
+    return a
+
+
+class CompiledMDP:
+    """
+    Everything the solvers need about one map, built once and shared by
+    every run that only changes budgets, betas or step sizes.
+
+    C is the stacked (K, S*A) cost matrix with rows named by cost_names
+    (price first, then the constraint channels); A, b are the sparse flow
+    constraints, P the sparse (S*A, S) transition matrix and goal_idx the
+    goal's (absorbing) pair ids. States and pairs are integer ids (see
+    models/indexing.py); states / sa_list / sa_idx are tuple views built
+    on first access, for plotting. key is the content hash the object is
+    cached under; walls the blocked (r, c) cells. Instances are read-only: arrays are frozen and
+    attributes cannot be reassigned.
+
+    grids (K, n_rows, n_cols) are the cost grids C was built from;
+    with_costs() / with_dynamics() return patched copies after cell,
+    slip or goal edits, recomputing only the affected pairs and sharing
+    every unchanged array.
+    """
+
+    def __init__(self, n_rows, n_cols, start, goal, slip, succ, prob, C, A, b, cost_names, P=None, key=None,
+                 walls=(), grids=None):
+        set_ = object.__setattr__
+        set_(self, "n_rows", n_rows)
+        set_(self, "n_cols", n_cols)
+        set_(self, "start", tuple(start))
+        set_(self, "goal", tuple(goal))
+        set_(self, "slip", slip)
+        set_(self, "succ", _freeze(succ))
+        set_(self, "prob", _freeze(prob))
+        set_(self, "C", _freeze(C))
+        set_(self, "b", _freeze(b))
+        set_(self, "grids", None if grids is None else _freeze(np.asarray(grids, float)))
+        if P is None:
+            P = build_transition_matrix(succ, prob, n_rows * n_cols)
+        for name, M in (("A", A), ("P", P)):
+            M = sp.csr_matrix(M)
+            M.data, M.indices, M.indptr = _freeze(M.data), _freeze(M.indices), _freeze(M.indptr)
+            set_(self, name, M)
+        set_(self, "cost_names", tuple(cost_names))
+        set_(self, "key", key)
+        set_(self, "walls", tuple(tuple(int(v) for v in cell) for cell in walls))
+
+        set_(self, "start_state", int(state_id(*start, n_cols)))
+        set_(self, "goal_state", int(state_id(*goal, n_cols)))
+        set_(self, "goal_idx", _freeze(state_sa_ids(self.goal_state)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"CompiledMDP is immutable; cannot set {name!r}")
+
+    @cached_property
+    def inflow(self):
+        """Sparse (S, S*A) P^T: row s' holds the pairs with a positive-probability move into s'."""
+        return self.P.T.tocsr()
+
+    @cached_property
+    def _tuple_index(self):
+        return build_sa_index(self.n_rows, self.n_cols)
+
+    @property
+    def states(self):
+        return self._tuple_index[0]
+
+    @property
+    def sa_list(self):
+        return self._tuple_index[1]
+
+    @property
+    def sa_idx(self):
+        return self._tuple_index[2]
+
+    @property
+    def n_states(self):
+        return self.n_rows * self.n_cols
+
+    @property
+    def n(self):
+        return self.C.shape[1]
+
+    def cost(self, name):
+        return self.C[self.cost_names.index(name)]
+
+    def with_costs(self, edits, remember=True):
+        """
+        Copy with cost-grid cells changed, edits = {cost name: {(r, c): value}}.
+        Only the pairs that can move into an edited cell get new cost
+        columns; the flow constraints, transitions and projection
+        workspaces built on them stay valid. remember=False keeps the copy
+        out of the in-memory LRU.
+        """
+        if self.grids is None:
+            raise ValueError("This map was compiled without its cost grids; recompile it to edit costs")
+        grids = np.array(self.grids)
+        cells = set()
+        for name, values in edits.items():
+            k = self.cost_names.index(name)
+            for (r, c), value in values.items():
+                grids[k, r, c] = value
+                cells.add(int(state_id(r, c, self.n_cols)))
+        pairs = np.unique(self.inflow[sorted(cells)].indices)
+        C = np.array(self.C)
+        C[:, pairs] = pair_costs(grids.reshape(len(grids), -1), self.succ, self.prob, self.goal_state, pairs)
+        return self._derive(remember, C=C, grids=grids)
+
+    def with_dynamics(self, slip=None, goal=None, remember=True):
+        """
+        Copy with a new slip and/or goal. A goal move re-derives the
+        transition rows of the old and new goal states only; a slip change
+        keeps every successor and only replaces the probabilities. Cost
+        columns are recomputed for the pairs whose moves changed (all of
+        them for a new slip); A, b and P are re-assembled from the arrays.
+        remember as in with_costs.
+        """
+        slip = self.slip if slip is None else float(slip)
+        goal = self.goal if goal is None else tuple(int(v) for v in goal)
+        if slip == self.slip and goal == self.goal:
+            return self
+        if self.grids is None:
+            raise ValueError("This map was compiled without its cost grids; recompile it to change slip or goal")
+        if goal in self.walls:
+            raise ValueError(f"Goal {goal} is a wall cell")
+        S = self.n_states
+        goal_state = int(state_id(*goal, self.n_cols))
+        succ, prob = np.array(self.succ), np.array(self.prob)
+        if slip != self.slip:
+            prob[:] = [1.0 - slip, slip / 2.0, slip / 2.0]
+        states = np.unique([self.goal_state, goal_state])
+        rows = state_sa_ids(states).ravel()
+        succ[rows], prob[rows] = slip_successors(self.n_rows, self.n_cols, slip, goal=goal,
+                                                 walls=self.walls or None, states=states)
+        if slip != self.slip:
+            P = build_transition_matrix(succ, prob, S)
+        else:
+            P = patch_transition_rows(self.P, rows, succ[rows], prob[rows])
+
+        # new slip: every cost column; new goal: the goals' own pairs and the pairs entering either goal
+        pairs = None if slip != self.slip else np.union1d(rows, self.inflow[states].indices)
+        grids = self.grids.reshape(len(self.grids), -1)
+        if pairs is None:
+            C = pair_costs(grids, succ, prob, goal_state)
+        else:
+            C = np.array(self.C)
+            C[:, pairs] = pair_costs(grids, succ, prob, goal_state, pairs)
+        A, b = flow_A_b_from_successors(succ, prob, S, self.start_state, [goal_state], P=P)
+        return self._derive(remember, goal=goal, slip=slip, succ=succ, prob=prob, C=C, A=A, b=b, P=P)
+
+    def _derive(self, remember=True, **changes):
+        """New map from this one with some fields replaced, cached under its content key if remember."""
+        fields = dict(n_rows=self.n_rows, n_cols=self.n_cols, start=self.start, goal=self.goal, slip=self.slip,
+                      succ=self.succ, prob=self.prob, C=self.C, A=self.A, b=self.b, P=self.P,
+                      cost_names=self.cost_names, walls=self.walls, grids=self.grids)
+        fields.update(changes)
+        fields["key"] = mdp_key(*fields["grids"], fields["start"], fields["goal"], fields["slip"], fields["walls"])
+        mdp = CompiledMDP(**fields)
+        if mdp.P is self.P and "inflow" in self.__dict__:
+            mdp.__dict__["inflow"] = self.inflow
+        if "_tuple_index" in self.__dict__:
+            mdp.__dict__["_tuple_index"] = self._tuple_index
+        return _remember(mdp) if remember else mdp
+
+    def save(self, path):
+        """Write the arrays as .npy files (plus meta.json) into directory `path`."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for name in _DENSE:
+            np.save(path / f"{name}.npy", getattr(self, name))
+        if self.grids is not None:
+            np.save(path / "grids.npy", self.grids)
+        for name in _SPARSE:
+            M = getattr(self, name)
+            for part in ("data", "indices", "indptr"):
+                np.save(path / f"{name}_{part}.npy", getattr(M, part))
+        meta = {"n_rows": self.n_rows, "n_cols": self.n_cols, "start": list(self.start),
+                "goal": list(self.goal), "slip": self.slip, "cost_names": list(self.cost_names),
+                "key": self.key, "walls": [list(cell) for cell in self.walls], "A_shape": list(self.A.shape), "P_shape": list(self.P.shape)}
+        # meta.json last: its presence marks a complete entry
+        with open(path / "meta.json", "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Inverse of save(); arrays are memory-mapped (read-only) by default."""
+        path = Path(path)
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in _DENSE}
+        # entries written before the grids were kept load without them (no with_costs)
+        if (path / "grids.npy").exists():
+            arrays["grids"] = np.load(path / "grids.npy", mmap_mode=mmap_mode)
+        for name in _SPARSE:
+            parts = [np.load(path / f"{name}_{part}.npy", mmap_mode=mmap_mode)
+                     for part in ("data", "indices", "indptr")]
+            arrays[name] = sp.csr_matrix(tuple(parts), shape=tuple(meta[f"{name}_shape"]))
+        return cls(meta["n_rows"], meta["n_cols"], tuple(meta["start"]), tuple(meta["goal"]), meta["slip"],
+                   cost_names=meta["cost_names"], key=meta["key"], walls=meta.get("walls", ()), **arrays)
+
+
+def mdp_key(price_grid, energy_grid, time_grid, start, goal, slip, walls=()):
+    """Content hash of a map: grid shape, start, goal, slip, walls and the cost grids."""
+    grids = [np.ascontiguousarray(g, dtype=float) for g in (price_grid, energy_grid, time_grid)]
+    h = hashlib.sha256()
+    h.update(repr((grids[0].shape, tuple(start), tuple(goal), float(slip))).encode())
+    if len(walls):
+        h.update(repr(sorted(walls)).encode())
+    for g in grids:
+        h.update(repr(g.shape).encode())
+        h.update(g.tobytes())
+    return h.hexdigest()[:16]
+
+
+def layout_key(n_rows, n_cols, start, walls=()):
+    """Hash of what with_costs / with_dynamics cannot change: grid shape, start and walls."""
+    spec = repr((int(n_rows), int(n_cols), tuple(int(v) for v in start), sorted(map(tuple, walls))))
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+
+def compile_mdp(price_grid, energy_grid, time_grid, start, goal, slip, cache_dir=None, walls=None):
+    """
+    Compile a map, or return it from the in-memory LRU (CACHE_SIZE entries)
+    or from cache_dir/<layout>/<key>/ if it was compiled before. A map that differs
+    from a cached one only in a few cost cells, its goal or its slip is
+    derived from it by with_dynamics / with_costs instead of being rebuilt.
+    A map missing from cache_dir (when given) is written there, even when
+    it came from the in-memory LRU. walls:
+    blocked (r, c) cells or a boolean grid (envs/slip.py:wall_mask).
+    """
+    n_rows, n_cols = np.shape(price_grid)
+    walls = [tuple(int(v) for v in divmod(s, n_cols)) for s in np.flatnonzero(wall_mask(walls, n_rows, n_cols))]
+    key = mdp_key(price_grid, energy_grid, time_grid, start, goal, slip, walls)
+    layout = layout_key(n_rows, n_cols, start, walls)
+    entry = Path(cache_dir) / layout / key if cache_dir is not None else None
+    if key in _CACHE:
+        _CACHE.move_to_end(key)
+        mdp = _CACHE[key]
+        if entry is not None and not (entry / "meta.json").exists():
+            mdp.save(entry)   # compiled before in this process without (or with another) cache_dir
+        return mdp
+    grids = np.array([price_grid, energy_grid, time_grid], dtype=float)
+    if entry is not None and (entry / "meta.json").exists():
+        mdp = CompiledMDP.load(entry)
+    elif (mdp := _patch_cached(grids, start, goal, slip, walls, cache_dir)) is not None:
+        if entry is not None:
+            mdp.save(entry)
+    else:
+        price_grid = np.asarray(price_grid, float)
+        start, goal = tuple(start), tuple(goal)
+
+        succ, prob = slip_successors(n_rows, n_cols, slip, goal=goal, walls=walls or None)
+        C = build_cost_matrix([price_grid, energy_grid, time_grid], goal, n_rows, n_cols, slip,
+                              succ=succ, prob=prob)
+        A, b = build_flow_A_b_sparse(n_rows, n_cols, start, goal, slip, succ=succ, prob=prob)
+        mdp = CompiledMDP(n_rows, n_cols, start, goal, slip, succ, prob, C, A, b,
+                          cost_names=("price", "energy", "time"), key=key, walls=walls,
+                          grids=grids)
+        if entry is not None:
+            mdp.save(entry)
+    return _remember(mdp)
+
+
+def _patch_cached(grids, start, goal, slip, walls, cache_dir=None):
+    """
+    The map for grids / goal / slip derived from the closest cached map of
+    the same layout (in memory, then in cache_dir/<layout>/, so only maps
+    of this layout are looked at), or None if every cached map differs in
+    more than PATCH_MAX_FRACTION of the cells. The result is not put in
+    the LRU (compile_mdp does that), nor is the intermediate map.
+    """
+    K, n_rows, n_cols = grids.shape
+    layout = (n_rows, n_cols, tuple(start), tuple(map(tuple, walls)))
+    best, best_diff = None, None
+    limit = PATCH_MAX_FRACTION * n_rows * n_cols
+
+    def consider(cached_grids, load):
+        nonlocal best, best_diff, limit
+        diff = (np.asarray(cached_grids) != grids).any(axis=0)
+        if diff.sum() <= limit:
+            best, best_diff, limit = load, diff, diff.sum() - 1
+
+    for mdp in reversed(_CACHE.values()):
+        if mdp.grids is not None and mdp.grids.shape == grids.shape and \
+                (mdp.n_rows, mdp.n_cols, mdp.start, mdp.walls) == layout:
+            consider(mdp.grids, lambda mdp=mdp: mdp)
+    layout_dir = Path(cache_dir) / layout_key(n_rows, n_cols, start, walls) if cache_dir is not None else None
+    if layout_dir is not None and layout_dir.is_dir():
+        for entry in layout_dir.iterdir():
+            # meta.json is written last: entries without it are incomplete
+            if entry.name not in _CACHE and (entry / "meta.json").exists() and (entry / "grids.npy").exists():
+                consider(np.load(entry / "grids.npy", mmap_mode="r"), lambda entry=entry: CompiledMDP.load(entry))
+    if best is None:
+        return None
+
+    mdp = best().with_dynamics(slip=slip, goal=goal, remember=False)
+    cells = np.argwhere(best_diff)
+    if len(cells):
+        mdp = mdp.with_costs({name: {(r, c): grids[k, r, c] for r, c in cells}
+                              for k, name in enumerate(mdp.cost_names)}, remember=False)
+    return mdp
+
+
+def _remember(mdp):
+    """Put mdp in the in-memory LRU under its key (evicting the oldest entries)."""
+    _CACHE[mdp.key] = mdp
+    _CACHE.move_to_end(mdp.key)
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return mdp
@@ -1,30 +1,30 @@
 
 import numpy as np
-from models.costs import build_cost_vectors
+from models.mdp import compile_mdp
 
 
 def compute_final_totals(price_grid, energy_grid, time_grid,
                          start, goal, slip, xk, sa_list):
-    n_rows, n_cols = price_grid.shape
-    c_vec, e_vec, t_vec = build_cost_vectors(
-        price_grid, energy_grid, time_grid,
-        start, goal, n_rows, n_cols, sa_list, slip=slip
-    )
-    price_raw = float(c_vec @ xk)
-    energy_tot = float(e_vec @ xk)
-    time_tot = float(t_vec @ xk)
+    # same map as the run -> served from the compile_mdp cache
+    mdp = compile_mdp(price_grid, energy_grid, time_grid, start, goal, slip)
+    price_raw, energy_tot, time_tot = (float(v) for v in mdp.C @ xk)
     return price_raw, energy_tot, time_tot
 
 
 def last(hist, key):
-    return float(hist[-1][key]) if len(hist) else float("nan")
+    """Last value of a history column (HistoryRecorder, DataFrame or dict of arrays)."""
+    if hasattr(hist, "last"):
+        return hist.last(key)
+    col = hist.get(key)
+    return float(np.asarray(col)[-1]) if col is not None and len(col) else float("nan")
 
 
 def print_summary_2c(hist, baseline, price_grid, energy_grid, time_grid,
-                     start, goal, slip, xk, sa_list, Emax, Tmax, betaE, betaT):
-    final_price, final_energy, final_time = compute_final_totals(
-        price_grid, energy_grid, time_grid, start, goal, slip, xk, sa_list
-    )
+                     start, goal, slip, xk, sa_list, Emax, Tmax, betaE, betaT, totals=None):
+    # totals: (price, energy, time) of xk if already known (walled maps, daemon runs)
+    if totals is None:
+        totals = compute_final_totals(price_grid, energy_grid, time_grid, start, goal, slip, xk, sa_list)
+    final_price, final_energy, final_time = (float(v) for v in totals)
 
     lamE = last(hist, "lamE")
     lamT = last(hist, "lamT")
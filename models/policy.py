@@ -1,18 +1,28 @@
+import numpy as np
+
 from envs.gridworld import ACTIONS
+from models.indexing import N_ACTIONS
+
+
+def policy_matrix_from_x(xk, tol=1e-12):
+    """
+    pi(a|s) as an (S, 4) array: x reshaped to (S, 4) and row-normalized.
+    Solver round-off below zero is clipped; rows with total mass <= tol
+    (unvisited states, the goal) are zero.
+    """
+    masses = np.maximum(np.asarray(xk, float).reshape(-1, N_ACTIONS), 0.0)
+    totals = masses.sum(axis=1, keepdims=True)
+    return np.divide(masses, totals, out=np.zeros_like(masses), where=totals > tol)
 
 
 def policy_from_x_fast(xk, states, sa_idx, goal, tol=1e-12):
     """
-    Recover pi(a|s) from occupancy measure xk using sa_idx mapping.
+    Recover pi(a|s) from occupancy measure xk as the {(r, c): {action: prob}}
+    view used for plotting (see policy_matrix_from_x for the array form).
+    sa_idx is kept for compatibility.
     """
-    pi = {}
-    for s in states:
-        if s == goal:
-            continue
-        masses = {a: float(xk[sa_idx[(s, a)]]) for a in ACTIONS}
-        total = sum(masses.values())
-        if total <= tol:
-            pi[s] = {a: 0.0 for a in ACTIONS}
-        else:
-            pi[s] = {a: masses[a] / total for a in ACTIONS}
-    return pi
+    probs = policy_matrix_from_x(xk, tol=tol)
+    return {
+        s: dict(zip(ACTIONS, probs[k].tolist()))
+        for k, s in enumerate(states) if s != goal
+    }
@@ -0,0 +1,202 @@
+import numpy as np
+import scipy.sparse as sp
+
+from models.flow import build_transition_matrix, flow_A_b_from_successors
+from models.indexing import N_ACTIONS, state_id, state_sa_ids
+
+
+class FlagAutomaton:
+    """
+    Deterministic flag automaton read along a trajectory: q' = delta[q, s']
+    for the grid state s' entered (the start state is read from q = 0).
+    accepting marks the flags that satisfy the formula when the episode
+    ends at the goal. Build with reach() / until().
+    """
+
+    def __init__(self, name, delta, accepting):
+        self.name = name
+        self.delta = np.asarray(delta, int)        # (n_flags, S)
+        self.accepting = np.asarray(accepting, bool)
+        self.n_flags = self.delta.shape[0]
+
+
+def region_mask(cells, n_rows, n_cols):
+    """Boolean (S,) mask of a list of (r, c) cells (or an (n_rows, n_cols) boolean grid)."""
+    cells = np.asarray(cells)
+    if cells.dtype == bool and cells.shape == (n_rows, n_cols):
+        return cells.reshape(-1)
+    mask = np.zeros(n_rows * n_cols, bool)
+    if cells.size:
+        mask[state_id(cells[:, 0], cells[:, 1], n_cols)] = True
+    return mask
+
+
+def reach(region, n_rows, n_cols, name="reach"):
+    """F region: flag 0 = not yet visited, 1 = visited (accepting, absorbing)."""
+    R = region_mask(region, n_rows, n_cols)
+    return FlagAutomaton(name, [R.astype(int), np.ones_like(R, int)], [False, True])
+
+
+def until(safe, target, n_rows, n_cols, name="until"):
+    """
+    safe U target: flag 0 = pending (only safe cells so far), 1 = target
+    reached first (accepting), 2 = left the safe cells first (failed).
+    Flags 1 and 2 are absorbing.
+    """
+    A = region_mask(safe, n_rows, n_cols)
+    B = region_mask(target, n_rows, n_cols)
+    pending = np.where(B, 1, np.where(A, 0, 2))
+    S = len(A)
+    return FlagAutomaton(name, [pending, np.ones(S, int), np.full(S, 2)], [False, True, False])
+
+
+class ProductMDP:
+    """
+    Grid MDP x flag automata, built on integer ids from a CompiledMDP.
+
+    Product states are (grid state, joint flag) pairs reachable from
+    (start, initial flags), numbered 0..n_states-1 in BFS order; the
+    joint flag is the mixed-radix number of the automata's flags. Pairs
+    are p*4 + a as on the grid, so every solver that takes a CompiledMDP
+    (projections, baseline, bargaining_loop) runs on the product: it has
+    C (grid costs per product pair), sparse A, b, P, succ / prob,
+    goal_idx (pairs of every (goal, flags) state, all absorbing), n.
+
+    sat[i] is the linear functional x -> P(automaton i accepts at the goal);
+    constraint_rows() turns probability thresholds into G x <= budgets rows
+    and grid_occupancy() maps a product occupancy back to the grid.
+    """
+
+    def __init__(self, mdp, automata):
+        self.grid = mdp
+        self.automata = list(automata)
+        self.cost_names = mdp.cost_names
+        sizes = [aut.n_flags for aut in self.automata]
+        self.n_flags = int(np.prod(sizes)) if sizes else 1
+        self.radix = np.cumprod([1] + sizes[:-1]).astype(int)
+
+        # --- reachable (state, flag) pairs: vectorized BFS over product keys s*n_flags + q ---
+        S, F = mdp.n_states, self.n_flags
+        goal = mdp.goal_state
+        q0 = self.next_flags(np.zeros(1, int), np.array([mdp.start_state]))[0]
+        start_key = mdp.start_state * F + q0
+        seen = np.zeros(S * F, bool)
+        seen[start_key] = True
+        frontier = np.array([start_key])
+        order = [frontier]
+        while len(frontier):
+            s, q = np.divmod(frontier, F)
+            expand = s != goal                         # goal states are absorbing
+            s, q = s[expand], q[expand]
+            sa = state_sa_ids(s).ravel()
+            live = mdp.prob[sa] > 0.0
+            s2 = mdp.succ[sa][live]
+            q2 = self.next_flags(np.broadcast_to(np.repeat(q, N_ACTIONS)[:, None], live.shape)[live], s2)
+            keys = np.unique(s2 * F + q2)
+            frontier = keys[~seen[keys]]
+            seen[frontier] = True
+            order.append(frontier)
+        keys = np.concatenate(order)
+
+        self.keys = keys
+        self.grid_state, self.flags = np.divmod(keys, F)
+        self.n_states = len(keys)
+        self.n = self.n_states * N_ACTIONS
+        index = np.full(S * F, -1)
+        index[keys] = np.arange(self.n_states)
+
+        # --- product arrays: successors, costs, flow constraints ---
+        grid_sa = state_sa_ids(self.grid_state).ravel()            # grid pair of each product pair
+        self.grid_sa = grid_sa
+        succ_grid = mdp.succ[grid_sa]
+        q_rep = np.repeat(self.flags, N_ACTIONS)[:, None]
+        q_next = self.next_flags(np.broadcast_to(q_rep, succ_grid.shape), succ_grid)
+        is_goal = self.grid_state == goal
+        goal_pairs = np.repeat(is_goal, N_ACTIONS)
+        # goal product states keep their flags and loop on themselves
+        own = np.repeat(np.arange(self.n_states), N_ACTIONS)
+        succ = np.where(goal_pairs[:, None], own[:, None], index[succ_grid * F + q_next])
+        prob = np.where(goal_pairs[:, None], [1.0, 0.0, 0.0], mdp.prob[grid_sa])
+        # branches with zero probability may point at unenumerated keys
+        succ = np.where(prob > 0.0, succ, own[:, None])
+        self.succ, self.prob = succ, prob
+
+        self.C = mdp.C[:, grid_sa]
+        self.goal_states = np.flatnonzero(is_goal)
+        self.goal_idx = state_sa_ids(self.goal_states).ravel()
+        self.start_state = 0
+        self.A, self.b = flow_A_b_from_successors(succ, prob, self.n_states, self.start_state, self.goal_states)
+        self.P = build_transition_matrix(succ, prob, self.n_states)
+
+        # P(accept_i) = expected inflow into accepting goal states (outside the goal itself)
+        self.sat = np.zeros((len(self.automata), self.n))
+        for i, aut in enumerate(self.automata):
+            acc_goal = np.zeros(self.n_states, bool)
+            acc_goal[self.goal_states] = aut.accepting[self.flag_of(self.flags[self.goal_states], i)]
+            hit = np.where(acc_goal[succ] & ~goal_pairs[:, None], prob, 0.0)
+            self.sat[i] = hit.sum(axis=1)
+
+        # (S*A, n) pair aggregation back onto the grid
+        self.to_grid = sp.csr_matrix((np.ones(self.n), (grid_sa, np.arange(self.n))), shape=(mdp.n, self.n))
+
+    # tuple views of the grid, for code that plots grid_occupancy(x)
+    @property
+    def states(self):
+        return self.grid.states
+
+    @property
+    def sa_list(self):
+        return self.grid.sa_list
+
+    @property
+    def sa_idx(self):
+        return self.grid.sa_idx
+
+    def flag_of(self, q, i):
+        """Flag of automaton i in joint flag(s) q."""
+        return (np.asarray(q) // self.radix[i]) % self.automata[i].n_flags
+
+    def next_flags(self, q, s_next):
+        """Joint flags after entering grid state(s) s_next from joint flag(s) q (same shape)."""
+        q = np.asarray(q)
+        out = np.zeros(np.shape(s_next), int)
+        for i, aut in enumerate(self.automata):
+            out += aut.delta[self.flag_of(q, i), s_next] * self.radix[i]
+        return out
+
+    def cost(self, name):
+        return self.C[self.cost_names.index(name)]
+
+    def constraint_rows(self, thresholds):
+        """
+        Rows for P(accept_i) >= thresholds[i] in bargaining form G x <= budgets:
+        G = -sat, budgets = -thresholds (bargaining then relaxes the level).
+        """
+        return -self.sat, -np.broadcast_to(np.asarray(thresholds, float), (len(self.automata),))
+
+    def grid_occupancy(self, x):
+        """Grid occupancy sum_q x[(s, q), a] (length S*A) of a product occupancy x."""
+        return self.to_grid @ np.asarray(x, float)
+
+    def probabilities(self, x):
+        """{automaton name: P(accept)} under product occupancy x."""
+        return {aut.name: float(v) for aut, v in zip(self.automata, self.sat @ x)}
+
+
+def build_product(mdp, specs):
+    """
+    ProductMDP of a CompiledMDP and specs from the YAML pctl block:
+      {type: reach, region: [[r, c], ...], name}
+      {type: until, safe: [[r, c], ...], target: [[r, c], ...], name}
+    """
+    automata = []
+    for k, spec in enumerate(specs):
+        kind = spec["type"]
+        name = spec.get("name", f"{kind}{k}")
+        if kind == "reach":
+            automata.append(reach(spec["region"], mdp.n_rows, mdp.n_cols, name=name))
+        elif kind == "until":
+            automata.append(until(spec["safe"], spec["target"], mdp.n_rows, mdp.n_cols, name=name))
+        else:
+            raise ValueError(f"Unknown pctl spec type {kind!r}; expected 'reach' or 'until'")
+    return ProductMDP(mdp, automata)
@@ -0,0 +1,109 @@
+import numpy as np
+import scipy.sparse as sp
+
+from models.flow import build_transition_matrix
+from models.indexing import N_ACTIONS, state_sa_ids
+
+
+def reachable_states(succ, prob, start_state, absorbing, n_states):
+    """
+    Boolean (n_states,) mask of the states reachable from start_state
+    along positive-probability transitions (vectorized BFS; absorbing
+    states are reached but not expanded).
+    """
+    stop = np.zeros(n_states, bool)
+    stop[np.asarray(absorbing, int)] = True
+    seen = np.zeros(n_states, bool)
+    seen[start_state] = True
+    frontier = np.array([start_state])
+    while len(frontier):
+        frontier = frontier[~stop[frontier]]
+        sa = state_sa_ids(frontier).ravel()
+        nxt = np.unique(succ[sa][prob[sa] > 0.0])
+        frontier = nxt[~seen[nxt]]
+        seen[frontier] = True
+    return seen
+
+
+class ReducedMDP:
+    """
+    An MDP with its unreachable and absorbing states removed before the
+    LP is built. Only non-absorbing states reachable from the start keep
+    variables; the goal(s) disappear from the problem instead of being
+    pinned by x[goal] == 0 rows, so goal_idx is empty. The reduced model
+    has the interface the solvers use (C, sparse A / b / P, goal_idx, n,
+    cost_names) and works on a CompiledMDP or a ProductMDP.
+
+    Reduced pairs are k*4 + a for the k-th kept state; parent_sa maps
+    them to the parent's pair ids. expand() puts a reduced occupancy back
+    on the parent (zeros elsewhere) and restrict() drops the parent columns
+    of extra constraint rows.
+    """
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.cost_names = parent.cost_names
+        goals = np.atleast_1d(getattr(parent, "goal_states", getattr(parent, "goal_state", None)))
+        n_parent = parent.n_states
+
+        reach = reachable_states(parent.succ, parent.prob, parent.start_state, goals, n_parent)
+        reach[goals] = False
+        self.kept = np.flatnonzero(reach)
+        self.n_states = len(self.kept)
+        self.n = self.n_states * N_ACTIONS
+        self.parent_sa = state_sa_ids(self.kept).ravel()
+
+        # successors in reduced ids; leaving the kept set (into a goal) -> exit column n_states
+        index = np.full(n_parent, self.n_states)
+        index[self.kept] = np.arange(self.n_states)
+        self.succ = index[parent.succ[self.parent_sa]]
+        self.prob = np.asarray(parent.prob[self.parent_sa])
+        self.P = build_transition_matrix(self.succ, self.prob, self.n_states + 1)[:, :self.n_states]
+
+        E = sp.csr_matrix(
+            (np.ones(self.n), (np.repeat(np.arange(self.n_states), N_ACTIONS), np.arange(self.n))),
+            shape=(self.n_states, self.n),
+        )
+        self.A = (E - self.P.T).tocsr()
+        self.A.eliminate_zeros()
+        self.b = (self.kept == parent.start_state).astype(float)
+        self.C = np.asarray(parent.C)[:, self.parent_sa]
+        self.goal_idx = np.zeros(0, int)
+        self.goal_states = np.zeros(0, int)   # every kept state is transient; goals are the exit column
+        self.start_state = int(index[parent.start_state])
+
+    # tuple views of the grid, for code that plots expand(x)
+    @property
+    def states(self):
+        return self.parent.states
+
+    @property
+    def sa_list(self):
+        return self.parent.sa_list
+
+    @property
+    def sa_idx(self):
+        return self.parent.sa_idx
+
+    def cost(self, name):
+        return self.C[self.cost_names.index(name)]
+
+    def expand(self, x):
+        """Parent-length occupancy of a reduced occupancy x (pruned pairs are 0)."""
+        full = np.zeros(self.parent.n)
+        full[self.parent_sa] = x
+        return full
+
+    def restrict(self, M):
+        """Columns of parent-space rows M (..., parent.n) that survive the pruning."""
+        return np.asarray(M)[..., self.parent_sa]
+
+    def reduction(self):
+        """{states, pairs, rows} before and after pruning."""
+        return {"states": (self.parent.n_states, self.n_states), "pairs": (self.parent.n, self.n),
+                "rows": (self.parent.A.shape[0], self.A.shape[0])}
+
+
+def prune_mdp(mdp):
+    """ReducedMDP of mdp: forward-reachable, non-absorbing states only."""
+    return ReducedMDP(mdp)
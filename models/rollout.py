@@ -0,0 +1,58 @@
+import numpy as np
+
+from models.indexing import N_ACTIONS, sa_id
+
+
+def simulate_policy(mdp, pi, cost_grids, names=None, episodes=10000, max_steps=None, seed=0, z=1.96):
+    """
+    Monte Carlo rollouts of policy pi ((S, 4) array, see
+    policy_matrix_from_x) under the slip dynamics of mdp (succ/prob from
+    envs.slip.slip_successors), all episodes advanced in lockstep.
+
+    Each step pays cost_grids[k][s'] on the cell entered, except the goal
+    (same convention as build_cost_matrix), so the means estimate C @ x.
+    States where pi has no mass act uniformly. Episodes still running
+    after max_steps (default 100 * S) are cut and counted as truncated.
+
+    Returns {name: {"mean", "std", "ci_low", "ci_high"}, "episodes",
+    "truncated", "steps"}; the intervals are mean +- z * std / sqrt(episodes).
+    """
+    rng = np.random.default_rng(seed)
+    grids = np.asarray(cost_grids, float).reshape(-1, mdp.n_states)
+    names = list(names) if names is not None else list(mdp.cost_names[:len(grids)])
+    max_steps = 100 * mdp.n_states if max_steps is None else int(max_steps)
+
+    pi = np.asarray(pi, float).reshape(-1, N_ACTIONS)
+    empty = pi.sum(axis=1) <= 0.0
+    pi = np.where(empty[:, None], 1.0 / N_ACTIONS, pi)
+    cum_pi = np.cumsum(pi / pi.sum(axis=1, keepdims=True), axis=1)
+    cum_branch = np.cumsum(mdp.prob, axis=1)
+
+    s = np.full(episodes, mdp.start_state)
+    totals = np.zeros((len(grids), episodes))
+    steps = np.zeros(episodes, int)
+    active = np.flatnonzero(s != mdp.goal_state)
+    for _ in range(max_steps):
+        if active.size == 0:
+            break
+        cur = s[active]
+        a = (cum_pi[cur] < rng.random(active.size)[:, None]).sum(axis=1)
+        sa = sa_id(cur, np.minimum(a, N_ACTIONS - 1))
+        branch = (cum_branch[sa] < rng.random(active.size)[:, None]).sum(axis=1)
+        nxt = mdp.succ[sa, np.minimum(branch, mdp.succ.shape[1] - 1)]
+
+        arrived = nxt == mdp.goal_state
+        totals[:, active] += np.where(arrived, 0.0, grids[:, nxt])
+        steps[active] += 1
+        s[active] = nxt
+        active = active[~arrived]
+
+    report = {}
+    for name, tot in zip(names, totals):
+        mean, std = float(tot.mean()), float(tot.std(ddof=1)) if episodes > 1 else 0.0
+        half = float(z * std / np.sqrt(episodes))
+        report[name] = {"mean": mean, "std": std, "ci_low": mean - half, "ci_high": mean + half}
+    report["episodes"] = int(episodes)
+    report["truncated"] = int(active.size)
+    report["steps"] = float(steps.mean())
+    return report
@@ -1,8 +1,14 @@
 import numpy as np
 import matplotlib.pyplot as plt
 
+from envs.gridworld import ACTIONS
+from models.indexing import ACTION_ID, N_ACTIONS, state_id, state_rc
 
-def plot_grid_with_labels(grid, title, start=None, goal=None, fmt="{:.0f}", out_path=None):
+# cell values are written into grids with at most this many cells
+LABEL_MAX_CELLS = 900
+
+
+def plot_grid_with_labels(grid, title, start=None, goal=None, fmt="{:.0f}", out_path=None, dpi=200):
     n_rows, n_cols = grid.shape
     fig, ax = plt.subplots(figsize=(5, 5))
     ax.imshow(grid)
@@ -18,9 +24,10 @@ def plot_grid_with_labels(grid, title, start=None, goal=None, fmt="{:.0f}", out_
     ax.grid(which="minor", linestyle='-', linewidth=1)
     ax.tick_params(which="minor", bottom=False, left=False)
 
-    for r in range(n_rows):
-        for c in range(n_cols):
-            ax.text(c, r, fmt.format(grid[r, c]), ha="center", va="center", fontsize=12)
+    if n_rows * n_cols <= LABEL_MAX_CELLS:
+        for r in range(n_rows):
+            for c in range(n_cols):
+                ax.text(c, r, fmt.format(grid[r, c]), ha="center", va="center", fontsize=12)
 
     if start is not None:
         ax.text(start[1], start[0], "S", ha="center", va="center", fontsize=14, weight="bold")
@@ -29,13 +36,29 @@ def plot_grid_with_labels(grid, title, start=None, goal=None, fmt="{:.0f}", out_
 
     fig.tight_layout()
     if out_path:
-        fig.savefig(out_path, dpi=200)
+        fig.savefig(out_path, dpi=dpi)
         plt.close(fig)
     else:
         plt.show()
 
 
-def plot_policy_arrows(pi, n_rows, n_cols, start=None, goal=None, title="Policy", out_path=None):
+def _policy_arrays(pi, n_rows, n_cols):
+    """(S, 4) action probabilities from a {(r, c): {action: prob}} dict or an (S, 4) array."""
+    if not isinstance(pi, dict):
+        return np.asarray(pi, float).reshape(n_rows * n_cols, N_ACTIONS)
+    probs = np.zeros((n_rows * n_cols, N_ACTIONS))
+    for (r, c), row in pi.items():
+        for a, p in row.items():
+            probs[state_id(r, c, n_cols), ACTION_ID[a]] = p
+    return probs
+
+
+def plot_policy_arrows(pi, n_rows, n_cols, start=None, goal=None, title="Policy", out_path=None, dpi=200):
+    """
+    One arrow per (state, action) with pi(a|s) > 1e-3, length proportional
+    to the probability, drawn with a single quiver call. pi is the dict
+    from policy_from_x_fast or the (S, 4) array from policy_matrix_from_x.
+    """
     fig, ax = plt.subplots(figsize=(5, 5))
     ax.set_title(title)
 
@@ -52,20 +75,18 @@ def plot_policy_arrows(pi, n_rows, n_cols, start=None, goal=None, title="Policy"
     ax.grid(which="minor", linestyle='-', linewidth=1)
     ax.tick_params(which="minor", bottom=False, left=False)
 
+    # (dx, dy) per action id in (column, row) data coordinates, rows growing downwards
     arrow = {"U": (0, -0.45), "D": (0, 0.45), "L": (-0.45, 0), "R": (0.45, 0)}
+    arrow = np.array([arrow[a] for a in ACTIONS])
 
-    for (r, c), probs in pi.items():
-        if goal is not None and (r, c) == goal:
-            continue
-        for a, p in probs.items():
-            if p > 1e-3:
-                dx, dy = arrow[a]
-                ax.arrow(
-                    c, r, dx * p, dy * p,
-                    head_width=0.10, head_length=0.10,
-                    length_includes_head=True,
-                    alpha=0.9
-                )
+    probs = _policy_arrays(pi, n_rows, n_cols)
+    if goal is not None:
+        probs[state_id(*goal, n_cols)] = 0.0
+    s, a = np.nonzero(probs > 1e-3)
+    r, c = state_rc(s, n_cols)
+    p = probs[s, a]
+    ax.quiver(c, r, arrow[a, 0] * p, arrow[a, 1] * p, angles="xy", scale_units="xy", scale=1.0,
+              width=0.004, headwidth=4, headlength=4, headaxislength=3.5, alpha=0.9)
 
     if start is not None:
         ax.text(start[1], start[0], "S", ha="center", va="center", fontsize=14, weight="bold")
@@ -74,7 +95,7 @@ def plot_policy_arrows(pi, n_rows, n_cols, start=None, goal=None, title="Policy"
 
     fig.tight_layout()
     if out_path:
-        fig.savefig(out_path, dpi=200)
+        fig.savefig(out_path, dpi=dpi)
         plt.close(fig)
     else:
         plt.show()
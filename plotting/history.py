@@ -2,101 +2,119 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 
-def plot_history_2c(hist, Emax, Tmax, betaE, betaT, title_prefix="", out_dir=None):
-    t = np.array([h["t"] for h in hist], dtype=float)
+def _column(hist, key):
+    """Column of a HistoryRecorder / DataFrame / dict of arrays; NaNs if not recorded."""
+    col = hist.get(key)
+    return np.full(len(hist["t"]), np.nan) if col is None else np.asarray(col, dtype=float)
 
-    price_raw = np.array([h["price_raw"] for h in hist], dtype=float)
-    price_reg = np.array([h["price_reg"] for h in hist], dtype=float)
-    energy    = np.array([h["energy"]    for h in hist], dtype=float)
-    time_used = np.array([h["time"]      for h in hist], dtype=float)
 
-    lamE = np.array([h["lamE"] for h in hist], dtype=float)
-    lamT = np.array([h["lamT"] for h in hist], dtype=float)
+# file names of the figures plot_history_2c draws, in order
+HISTORY_PLOTS = ("price.png", "energy.png", "time.png", "lambdas.png", "residuals.png", "convergence.png")
 
-    E_eff = np.array([h.get("E_eff", np.nan) for h in hist], dtype=float)
-    T_eff = np.array([h.get("T_eff", np.nan) for h in hist], dtype=float)
 
-    residE_prev = np.array([h.get("residE_prev", np.nan) for h in hist], dtype=float)
-    residT_prev = np.array([h.get("residT_prev", np.nan) for h in hist], dtype=float)
+def plot_history_2c(hist, Emax, Tmax, betaE, betaT, title_prefix="", out_dir=None, which=None, dpi=200):
+    """One figure per signal (HISTORY_PLOTS); which restricts to a subset of those names."""
+    which = HISTORY_PLOTS if which is None else tuple(which)
+    t = _column(hist, "t")
 
-    dx1 = np.array([h["dx1"] for h in hist], dtype=float)
+    price_raw = _column(hist, "price_raw")
+    price_reg = _column(hist, "price_reg")
+    energy    = _column(hist, "energy")
+    time_used = _column(hist, "time")
+
+    lamE = _column(hist, "lamE")
+    lamT = _column(hist, "lamT")
+
+    E_eff = _column(hist, "E_eff")
+    T_eff = _column(hist, "T_eff")
+
+    residE_prev = _column(hist, "residE_prev")
+    residT_prev = _column(hist, "residT_prev")
+
+    dx1 = _column(hist, "dx1")
 
     def save_or_show(fig, name):
         fig.tight_layout()
         if out_dir:
-            fig.savefig(f"{out_dir}/{name}", dpi=200)
+            fig.savefig(f"{out_dir}/{name}", dpi=dpi)
             plt.close(fig)
         else:
             plt.show()
 
     # 1) Price trace
-    fig = plt.figure(figsize=(7, 4))
-    plt.title(f"{title_prefix}Price vs iteration")
-    plt.plot(t, price_raw, label="price_raw")
-    plt.plot(t, price_reg, label="price_reg")
-    plt.xlabel("iteration t")
-    plt.ylabel("price")
-    plt.legend()
-    plt.grid(True)
-    save_or_show(fig, "price.png")
+    if "price.png" in which:
+        fig = plt.figure(figsize=(7, 4))
+        plt.title(f"{title_prefix}Price vs iteration")
+        plt.plot(t, price_raw, label="price_raw")
+        plt.plot(t, price_reg, label="price_reg")
+        plt.xlabel("iteration t")
+        plt.ylabel("price")
+        plt.legend()
+        plt.grid(True)
+        save_or_show(fig, "price.png")
 
     # 2) Energy + effective budget
-    fig = plt.figure(figsize=(7, 4))
-    plt.title(f"{title_prefix}Energy vs iteration")
-    plt.plot(t, energy, label="energy(x^t)")
-    if np.isfinite(E_eff).any():
-        plt.plot(t, E_eff, label="E_eff = Emax + betaE*lamE")
-    plt.axhline(Emax, linestyle="--", label="Emax (original)")
-    plt.xlabel("iteration t")
-    plt.ylabel("energy")
-    plt.legend()
-    plt.grid(True)
-    save_or_show(fig, "energy.png")
+    if "energy.png" in which:
+        fig = plt.figure(figsize=(7, 4))
+        plt.title(f"{title_prefix}Energy vs iteration")
+        plt.plot(t, energy, label="energy(x^t)")
+        if np.isfinite(E_eff).any():
+            plt.plot(t, E_eff, label="E_eff = Emax + betaE*lamE")
+        plt.axhline(Emax, linestyle="--", label="Emax (original)")
+        plt.xlabel("iteration t")
+        plt.ylabel("energy")
+        plt.legend()
+        plt.grid(True)
+        save_or_show(fig, "energy.png")
 
     # 3) Time + effective budget
-    fig = plt.figure(figsize=(7, 4))
-    plt.title(f"{title_prefix}Time vs iteration")
-    plt.plot(t, time_used, label="time(x^t)")
-    if np.isfinite(T_eff).any():
-        plt.plot(t, T_eff, label="T_eff = Tmax + betaT*lamT")
-    plt.axhline(Tmax, linestyle="--", label="Tmax (original)")
-    plt.xlabel("iteration t")
-    plt.ylabel("time")
-    plt.legend()
-    plt.grid(True)
-    save_or_show(fig, "time.png")
+    if "time.png" in which:
+        fig = plt.figure(figsize=(7, 4))
+        plt.title(f"{title_prefix}Time vs iteration")
+        plt.plot(t, time_used, label="time(x^t)")
+        if np.isfinite(T_eff).any():
+            plt.plot(t, T_eff, label="T_eff = Tmax + betaT*lamT")
+        plt.axhline(Tmax, linestyle="--", label="Tmax (original)")
+        plt.xlabel("iteration t")
+        plt.ylabel("time")
+        plt.legend()
+        plt.grid(True)
+        save_or_show(fig, "time.png")
 
     # 4) Dual variables
-    fig = plt.figure(figsize=(7, 4))
-    plt.title(f"{title_prefix}Dual variables")
-    plt.plot(t, lamE, label="lamE")
-    plt.plot(t, lamT, label="lamT")
-    plt.axhline(0.0, linestyle="--")
-    plt.xlabel("iteration t")
-    plt.ylabel("lambda")
-    plt.legend()
-    plt.grid(True)
-    save_or_show(fig, "lambdas.png")
+    if "lambdas.png" in which:
+        fig = plt.figure(figsize=(7, 4))
+        plt.title(f"{title_prefix}Dual variables")
+        plt.plot(t, lamE, label="lamE")
+        plt.plot(t, lamT, label="lamT")
+        plt.axhline(0.0, linestyle="--")
+        plt.xlabel("iteration t")
+        plt.ylabel("lambda")
+        plt.legend()
+        plt.grid(True)
+        save_or_show(fig, "lambdas.png")
 
     # 5) Residuals used in dual update (prev)
-    fig = plt.figure(figsize=(7, 4))
-    plt.title(f"{title_prefix}Residuals (paper-style, prev)")
-    plt.plot(t, residE_prev, label="residE_prev")
-    plt.plot(t, residT_prev, label="residT_prev")
-    plt.axhline(0.0, linestyle="--")
-    plt.xlabel("iteration t")
-    plt.ylabel("residual")
-    plt.legend()
-    plt.grid(True)
-    save_or_show(fig, "residuals.png")
+    if "residuals.png" in which:
+        fig = plt.figure(figsize=(7, 4))
+        plt.title(f"{title_prefix}Residuals (paper-style, prev)")
+        plt.plot(t, residE_prev, label="residE_prev")
+        plt.plot(t, residT_prev, label="residT_prev")
+        plt.axhline(0.0, linestyle="--")
+        plt.xlabel("iteration t")
+        plt.ylabel("residual")
+        plt.legend()
+        plt.grid(True)
+        save_or_show(fig, "residuals.png")
 
     # 6) Convergence
-    fig = plt.figure(figsize=(7, 4))
-    plt.title(f"{title_prefix}Convergence")
-    plt.plot(t, dx1, label="dx1 = ||x^t - x^{t-1}||_1")
-    plt.yscale("log")
-    plt.xlabel("iteration t")
-    plt.ylabel("dx1")
-    plt.legend()
-    plt.grid(True)
-    save_or_show(fig, "convergence.png")
+    if "convergence.png" in which:
+        fig = plt.figure(figsize=(7, 4))
+        plt.title(f"{title_prefix}Convergence")
+        plt.plot(t, dx1, label="dx1 = ||x^t - x^{t-1}||_1")
+        plt.yscale("log")
+        plt.xlabel("iteration t")
+        plt.ylabel("dx1")
+        plt.legend()
+        plt.grid(True)
+        save_or_show(fig, "convergence.png")
@@ -0,0 +1,103 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+# plots.mode in the YAML:
+#   sync        render every figure before run_experiment.py continues
+#   background  render on a process pool (Agg) while the summary / simulation run
+#   deferred    save xk.npy only; render later with scripts/render_plots.py
+#   off         no figures
+PLOT_MODES = ("sync", "background", "deferred", "off")
+
+# history columns plot_history_2c reads
+HISTORY_COLUMNS = ("t", "price_raw", "price_reg", "energy", "time", "lamE", "lamT",
+                   "E_eff", "T_eff", "residE_prev", "residT_prev", "dx1")
+
+
+def history_columns(hist):
+    """The plotted columns of a HistoryRecorder / DataFrame as a dict of arrays (cheap to pickle)."""
+    cols = {}
+    for key in HISTORY_COLUMNS:
+        col = hist.get(key)
+        if col is not None:
+            cols[key] = np.asarray(col, dtype=float)
+    return cols
+
+
+def plot_jobs(grids, start, goal, policy, hist, Emax, Tmax, betaE, betaT, out_dir, dpi=200):
+    """
+    The figures of one run as (function name, kwargs) jobs: the three cost
+    grids, the policy arrows and one job per history figure. policy is
+    the (S, 4) array of policy_matrix_from_x; hist anything with .get().
+    """
+    out_dir = Path(out_dir)
+    n_rows, n_cols = np.asarray(grids["price"]).shape
+    jobs = [("grid", dict(grid=np.asarray(grids[name]), title=name.capitalize(), start=start, goal=goal,
+                          out_path=out_dir / f"{name}_grid.png", dpi=dpi))
+            for name in ("price", "energy", "time")]
+    jobs.append(("policy", dict(pi=np.asarray(policy), n_rows=n_rows, n_cols=n_cols, start=start, goal=goal,
+                                title="Final policy", out_path=out_dir / "policy.png", dpi=dpi)))
+
+    from plotting.history import HISTORY_PLOTS
+
+    cols = history_columns(hist)
+    jobs += [("history", dict(hist=cols, Emax=Emax, Tmax=Tmax, betaE=betaE, betaT=betaT,
+                              out_dir=str(out_dir), which=(name,), dpi=dpi))
+             for name in HISTORY_PLOTS]
+    return jobs
+
+
+def render_job(job):
+    """Draw one (function name, kwargs) job; returns the name for bookkeeping."""
+    kind, kwargs = job
+    if kind == "grid":
+        from plotting.grids import plot_grid_with_labels
+        plot_grid_with_labels(**kwargs)
+    elif kind == "policy":
+        from plotting.grids import plot_policy_arrows
+        plot_policy_arrows(**kwargs)
+    elif kind == "history":
+        from plotting.history import plot_history_2c
+        plot_history_2c(**kwargs)
+    else:
+        raise ValueError(f"Unknown plot job {kind!r}")
+    return kind
+
+
+def _init_agg():
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+
+class PlotPool:
+    """
+    Renders plot jobs on a process pool with the Agg backend. submit()
+    returns immediately; wait() blocks until every submitted figure is
+    written (re-raising the first rendering error) and shuts the pool down.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_agg)
+        self.futures = []
+
+    def submit(self, jobs):
+        self.futures += [self.pool.submit(render_job, job) for job in jobs]
+
+    def wait(self):
+        try:
+            for f in self.futures:
+                f.result()
+        finally:
+            self.pool.shutdown()
+        return len(self.futures)
+
+
+def render(jobs):
+    """Render jobs in this process with the Agg backend (sync mode, render_plots.py)."""
+    _init_agg()
+    for job in jobs:
+        render_job(job)
+    return len(jobs)
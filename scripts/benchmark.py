@@ -0,0 +1,252 @@
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]   # repo root
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from envs.maps import MAP_KINDS, default_start_goal, random_cost_grids
+from envs.slip import slip_successors
+from models.costs import build_cost_matrix
+from models.flow import build_flow_A_b_sparse
+from models.indexing import build_sa_index
+from models.mdp import CompiledMDP
+
+
+class StageTimer:
+    """
+    Wall time of each `with timer.stage(name):` block, or (trace=True, with
+    tracemalloc running) its traced peak memory in MB. Tracing slows the
+    stages down, so the two are measured in separate runs (see run_size).
+    """
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.results = {}
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+
+class _Stage:
+    def __init__(self, timer, name):
+        self.timer, self.name = timer, name
+
+    def __enter__(self):
+        if self.timer.trace:
+            tracemalloc.reset_peak()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.t0
+        if self.timer.trace:
+            _, peak = tracemalloc.get_traced_memory()
+            self.timer.results[self.name] = {"peak_mb": peak / 2**20}
+        else:
+            self.timer.results[self.name] = {"time": wall}
+        return False
+
+
+# modules timed by bench_imports: the solve path, the heavy optional stacks and the CLI entry points
+IMPORT_TARGETS = ("numpy", "scipy.sparse", "osqp", "cvxpy", "pandas", "pyarrow", "matplotlib.pyplot",
+                  "solvers.primal_dual", "scripts/solve.py", "scripts/run_experiment.py")
+
+
+def bench_imports(targets=IMPORT_TARGETS, repeats=3):
+    """
+    Cold import time (s, best of repeats) of each module or script, in a
+    fresh interpreter; scripts are imported as modules (main() not run).
+    Also lists which heavy stacks each script pulls in.
+    """
+    heavy = ("cvxpy", "pandas", "pyarrow", "matplotlib")
+    out = {}
+    for target in targets:
+        if target.endswith(".py"):
+            path = ROOT / target
+            stmt = (f"import sys; sys.path[:0] = [{str(ROOT)!r}, {str(path.parent)!r}]; "
+                    f"import {path.stem}")
+        else:
+            stmt = f"import sys; sys.path.insert(0, {str(ROOT)!r}); import {target}"
+        code = ("import time; t0 = time.perf_counter(); " + stmt + "; "
+                "t = time.perf_counter() - t0; "
+                f"print(t, *[m for m in {heavy!r} if m in sys.modules])")
+        best, loaded = float("inf"), []
+        for _ in range(repeats):
+            res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+            if res.returncode != 0:
+                best, loaded = None, [res.stderr.strip().splitlines()[-1]]
+                break
+            t, *loaded = res.stdout.split()
+            best = min(best, float(t))
+        out[target] = {"time": best, "loads": loaded}
+    return out
+
+
+def lp_oracle(mdp, cost):
+    """argmin cost^T x over {x >= 0, Ax = b, x[goal] = 0} by HiGHS (None if not solved)."""
+    from scipy.optimize import linprog
+
+    bounds = np.zeros((mdp.n, 2))
+    bounds[:, 1] = np.inf
+    bounds[mdp.goal_idx, 1] = 0.0
+    res = linprog(cost, A_eq=mdp.A, b_eq=mdp.b, bounds=bounds, method="highs")
+    return res.x if res.status == 0 else None
+
+
+def bench_size(n, kind, seed, slip, iters, solve_max, plot_max, out_dir, trace=False):
+    price, energy, time_grid = random_cost_grids(n, n, kind=kind, seed=seed)
+    start, goal = default_start_goal(n, n)
+    timer = StageTimer(trace)
+
+    with timer.stage("successors"):
+        succ, prob = slip_successors(n, n, slip, goal=goal)
+    with timer.stage("costs"):
+        C = build_cost_matrix([price, energy, time_grid], goal, n, n, slip, succ=succ, prob=prob)
+    with timer.stage("flow"):
+        A, b = build_flow_A_b_sparse(n, n, start, goal, slip, succ=succ, prob=prob)
+    mdp = CompiledMDP(n, n, start, goal, slip, succ, prob, C, A, b, cost_names=("price", "energy", "time"),
+                      grids=[price, energy, time_grid])
+    # incremental updates: one cost cell, then a goal move (CompiledMDP.with_costs / with_dynamics)
+    with timer.stage("patch_cost_cell"):
+        mdp.with_costs({"price": {(n // 2, n // 2): 2.0}})
+    with timer.stage("patch_goal"):
+        mdp.with_dynamics(goal=(n - 1, 0) if goal != (n - 1, 0) else (0, n - 1))
+    if n <= plot_max:
+        with timer.stage("tuple_index"):
+            build_sa_index(n, n)
+
+    record = {"n_rows": n, "n_cols": n, "n_states": n * n, "n_sa": mdp.n, "nnz_A": int(A.nnz),
+              "kind": kind, "seed": seed, "slip": slip}
+
+    if n <= solve_max:
+        import osqp  # noqa: F401  (loaded lazily by the solvers; keep its import out of the stages)
+        import scipy.optimize  # noqa: F401  (lp_oracle's linprog, same reason)
+        from solvers.dp import DPOracle
+        from solvers.primal_dual import build_baseline_problem, solve_baseline
+        from solvers.projection import make_projector
+
+        # primal oracle min_x c^T x over X: policy iteration vs the LP (HiGHS)
+        with timer.stage("dp_oracle"):
+            x_dp = DPOracle(mdp).solve(mdp.C[0])
+        with timer.stage("lp_oracle"):
+            x_lp = lp_oracle(mdp, mdp.C[0])
+        record["oracle_gap"] = None if x_lp is None else float(mdp.C[0] @ (x_dp - x_lp))
+        if not trace:
+            record["dp_speedup"] = timer.results["lp_oracle"]["time"] / timer.results["dp_oracle"]["time"]
+
+        # budgets: 90% of the min-price policy's energy/time, so both constraints bind
+        budgets = 0.9 * (mdp.C[1:] @ x_dp)
+        record["budgets"] = budgets.tolist()
+
+        with timer.stage("baseline_setup"):
+            base = build_baseline_problem(mdp, 1e-6, backend="osqp")
+        with timer.stage("baseline_solve"):
+            baseline = solve_baseline(base, budgets)
+        record["baseline_solved"] = baseline is not None
+
+        with timer.stage("projection_setup"):
+            projector = make_projector("osqp", mdp.A, mdp.b, mdp.goal_idx)
+        xk = projector.project(np.zeros(mdp.n))
+        lam = np.ones(2)
+        with timer.stage("projection_iters"):
+            for _ in range(iters):
+                xk = projector.project(xk - 0.02 * (mdp.C[0] + lam @ mdp.C[1:]), x0=xk)
+        if not trace:
+            timer.results["projection_iters"]["per_iter"] = timer.results["projection_iters"]["time"] / max(iters, 1)
+
+    if n <= plot_max:
+        import matplotlib
+        matplotlib.use("Agg")
+        from models.policy import policy_from_x_fast
+        from plotting.grids import plot_grid_with_labels, plot_policy_arrows
+
+        x = xk if n <= solve_max else np.full(mdp.n, 1.0 / mdp.n)
+        with timer.stage("plotting"):
+            pi = policy_from_x_fast(x, mdp.states, mdp.sa_idx, goal)
+            plot_grid_with_labels(price, "Price", start=start, goal=goal, out_path=out_dir / f"price_{n}.png")
+            plot_policy_arrows(pi, n, n, start=start, goal=goal, out_path=out_dir / f"policy_{n}.png")
+
+    record["stages"] = timer.results
+    # peak RSS of this process; run_size gives every size a fresh one
+    record["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return record
+
+
+def run_size(n, args, out_dir):
+    """
+    bench_size(n) in two fresh interpreters: one timing the stages (its
+    max_rss_mb is this size's peak RSS, not a running maximum over the
+    sizes before it) and one with tracemalloc for the stage peaks.
+    """
+    passes = []
+    for trace in (False, True):
+        cmd = [sys.executable, __file__, "--worker-size", str(n), "--kind", args.kind, "--seed", str(args.seed),
+               "--slip", str(args.slip), "--iters", str(args.iters), "--solve-max", str(args.solve_max),
+               "--plot-max", str(args.plot_max), "--out", str(out_dir / "scaling.json")]
+        res = subprocess.run(cmd + (["--trace-memory"] if trace else []), capture_output=True, text=True)
+        if res.returncode != 0:
+            raise RuntimeError(f"benchmark of size {n} failed:\n{res.stderr}")
+        passes.append(json.loads(res.stdout.strip().splitlines()[-1]))
+    record, traced = passes
+    for name, stage in record["stages"].items():
+        stage["peak_mb"] = traced["stages"][name]["peak_mb"]
+    return record
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scaling benchmark of the bargaining pipeline stages")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[3, 10, 30, 100, 300, 1000])
+    ap.add_argument("--kind", choices=MAP_KINDS, default="uniform")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--slip", type=float, default=0.1)
+    ap.add_argument("--iters", type=int, default=5, help="Projection iterations to time")
+    ap.add_argument("--solve-max", type=int, default=100, help="Largest side length that is solved")
+    ap.add_argument("--plot-max", type=int, default=30, help="Largest side length that is plotted")
+    ap.add_argument("--import-repeats", type=int, default=3, help="Cold imports per module (0: skip)")
+    ap.add_argument("--out", default="results/benchmark/scaling.json")
+    # internal: run_size's per-size worker processes
+    ap.add_argument("--worker-size", type=int, default=None, help=argparse.SUPPRESS)
+    ap.add_argument("--trace-memory", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if args.worker_size is not None:
+        if args.trace_memory:
+            tracemalloc.start()
+        record = bench_size(args.worker_size, args.kind, args.seed, args.slip, args.iters, args.solve_max,
+                            args.plot_max, out_path.parent, trace=args.trace_memory)
+        print(json.dumps(record))
+        return
+
+    imports = bench_imports(repeats=args.import_repeats) if args.import_repeats > 0 else {}
+    for target, r in imports.items():
+        loads = f" (loads {', '.join(r['loads'])})" if r["loads"] else ""
+        print(f"import {target}: " + ("failed" if r["time"] is None else f"{r['time']:.3f}s") + loads)
+
+    records = []
+    for n in args.sizes:
+        record = run_size(n, args, out_path.parent)
+        records.append(record)
+        stages = ", ".join(f"{k} {v['time']:.3f}s" for k, v in record["stages"].items())
+        print(f"{n}x{n}: {stages} | max RSS {record['max_rss_mb']:.0f} MB")
+
+    with open(out_path, "w") as f:
+        json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                   "args": vars(args), "imports": imports, "runs": records}, f, indent=2)
+    print(f"\n✅ Done: {len(records)} sizes")
+    print(f"   results: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,34 @@
 import argparse
+import sys
 from pathlib import Path
 
+ROOT = Path(__file__).resolve().parents[1]   # repo root
+sys.path.insert(0, str(ROOT))
+
 import pandas as pd
 import matplotlib.pyplot as plt
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--history", required=True, help="Path to history.csv")
+    ap.add_argument("--history", default=None, help="Path to history.csv")
+    ap.add_argument("--store", default=None, help="Results store to read the history from (with --run)")
+    ap.add_argument("--run", default=None, help="run_id in --store")
     ap.add_argument("--out", default=None, help="Output PNG path")
     args = ap.parse_args()
 
-    hist_path = Path(args.history)
-    df = pd.read_csv(hist_path)
+    if args.store:
+        if not args.run:
+            raise SystemExit("--store needs --run <run_id>")
+        from solvers.store import ResultsStore
 
-    out = Path(args.out) if args.out else hist_path.parent / "convergence.png"
+        df = ResultsStore(args.store).history(args.run)
+        out = Path(args.out) if args.out else Path(args.store).parent / f"convergence_{args.run}.png"
+    elif args.history:
+        hist_path = Path(args.history)
+        df = pd.read_csv(hist_path)
+        out = Path(args.out) if args.out else hist_path.parent / "convergence.png"
+    else:
+        raise SystemExit("Give --history or --store/--run")
 
     # Plot a few key signals
     plt.figure()
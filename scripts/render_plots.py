@@ -0,0 +1,70 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]   # repo root
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import pandas as pd
+
+from models.policy import policy_matrix_from_x
+from plotting.pipeline import PlotPool, plot_jobs, render
+from solvers.store import ResultsStore
+from run_experiment import ensure_dir, env_from_config, load_yaml
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render a finished run's figures from its saved outputs")
+    ap.add_argument("--config", default=None, help="YAML config the run was made with")
+    ap.add_argument("--store", default=None, help="Results store (instead of --config); needs --run")
+    ap.add_argument("--run", default=None, help="run_id in --store")
+    ap.add_argument("--out", default=None, help="Output directory (default: the run's out_dir)")
+    ap.add_argument("--workers", type=int, default=1, help="Render on a process pool of this size (>1)")
+    ap.add_argument("--dpi", type=int, default=None, help="Override plots.dpi")
+    args = ap.parse_args()
+
+    if args.store:
+        # everything from the store: config, budgets of the run, xk and history
+        if not args.run:
+            raise SystemExit("--store needs --run <run_id>")
+        store = ResultsStore(args.store)
+        cfg = store.config(args.run)
+        row = store.runs(run_id=args.run).iloc[-1]
+        budgets = {key: float(row[key]) for key in ("Emax", "Tmax", "betaE", "betaT")}
+        xk, hist = store.xk(args.run), store.history(args.run)
+        out_dir = Path(args.out or Path(cfg.get("out_dir", "results")) / args.run)
+    elif args.config:
+        cfg = load_yaml(args.config)
+        out_dir = Path(args.out or cfg.get("out_dir", f"results/{cfg.get('experiment_name', 'experiment')}"))
+        save_cfg = cfg.get("save", {})
+        history_path = Path(cfg.get("out_dir", out_dir)) / save_cfg.get("history_file", "history.csv")
+        xk_path = history_path.parent / "xk.npy"
+        if not xk_path.exists() or not history_path.exists():
+            raise SystemExit(f"Need {xk_path} and {history_path}; run run_experiment.py first "
+                             "(with save.history_csv or save.stream)")
+        budgets = {key: float(cfg["constraints"][key]) for key in ("Emax", "Tmax", "betaE", "betaT")}
+        xk = np.load(xk_path)
+        hist = pd.read_parquet(history_path) if history_path.suffix == ".parquet" else pd.read_csv(history_path)
+    else:
+        raise SystemExit("Give --config or --store/--run")
+
+    ensure_dir(out_dir)
+    price, energy, time_grid, start, goal, _ = env_from_config(cfg)
+    jobs = plot_jobs({"price": price, "energy": energy, "time": time_grid}, start, goal,
+                     policy_matrix_from_x(xk), hist, **budgets,
+                     out_dir=out_dir, dpi=args.dpi or (cfg.get("plots") or {}).get("dpi", 200))
+
+    t0 = time.perf_counter()
+    if args.workers > 1:
+        pool = PlotPool(args.workers)
+        pool.submit(jobs)
+        n = pool.wait()
+    else:
+        n = render(jobs)
+    print(f"✅ rendered {n} figures into {out_dir} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,25 @@
 import argparse
 import json
 import sys
-import sys
+import time
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]   # repo root
 sys.path.insert(0, str(ROOT))
 
-from pathlib import Path
-from models.policy import policy_from_x_fast
-from models.metrics import print_summary_2c
-from plotting.grids import plot_grid_with_labels, plot_policy_arrows
-from plotting.history import plot_history_2c
-
-
 import numpy as np
-import pandas as pd
 import yaml
-import cvxpy as cp
+
+# Plotting (matplotlib), pandas, cvxpy and pyarrow are imported where they are used,
+# so runs with plots off / osqp backends don't pay for them (see scripts/solve.py).
+from models.mdp import compile_mdp
+from models.policy import policy_matrix_from_x
+from models.metrics import last, print_summary_2c
+from plotting.pipeline import PLOT_MODES, PlotPool, plot_jobs, render   # matplotlib loads per job
 
 # Expect your function exists here:
 from solvers.primal_dual import projected_primal_dual_loop
+from solvers.checkpoint import Checkpointer, HistoryStreamer, load_checkpoint
 
 
 def load_yaml(path: str) -> dict:
@@ -34,17 +33,8 @@ def ensure_dir(path: str | Path) -> Path:
     return p
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--config", required=True, help="Path to YAML config")
-    args = ap.parse_args()
-
-    cfg = load_yaml(args.config)
-
-    exp_name = cfg.get("experiment_name", "experiment")
-    out_dir = ensure_dir(cfg.get("out_dir", f"results/{exp_name}"))
-
-    # --- build inputs ---
+def env_from_config(cfg: dict):
+    """(price, energy, time, start, goal, slip) from the costs/env blocks."""
     price = np.array(cfg["costs"]["price"], dtype=float)
     energy = np.array(cfg["costs"]["energy"], dtype=float)
     time_grid = np.array(cfg["costs"]["time"], dtype=float)
@@ -52,111 +42,353 @@ def main():
     slip = float(cfg["env"].get("slip", 0.0))
     start = tuple(cfg["env"]["start"])
     goal = tuple(cfg["env"]["goal"])
+    return price, energy, time_grid, start, goal, slip
 
-    Emax = float(cfg["constraints"]["Emax"])
-    Tmax = float(cfg["constraints"]["Tmax"])
-    betaE = float(cfg["constraints"]["betaE"])
-    betaT = float(cfg["constraints"]["betaT"])
-
-    rho = float(cfg["solver"].get("rho", 1e-6))
-    alpha = float(cfg["solver"].get("alpha", 0.02))
-    etaE = float(cfg["solver"].get("etaE", 0.02))
-    etaT = float(cfg["solver"].get("etaT", 0.02))
-    iters = int(cfg["solver"].get("iters", 200))
-    lamE0 = float(cfg["solver"].get("lamE0", 0.0))
-    lamT0 = float(cfg["solver"].get("lamT0", 0.0))
-    verbose_every = int(cfg["solver"].get("verbose_every", 10))
-
-    # CVXPY solver name in YAML (e.g., OSQP, CLARABEL)
+
+def loop_params_from_config(cfg: dict) -> dict:
+    """Keyword arguments of projected_primal_dual_loop from the constraints/solver blocks."""
+    # CVXPY solver name in YAML (e.g., OSQP, CLARABEL); cvxpy's solver constants are these strings
     solver_name = cfg["solver"].get("cvxpy_solver", "OSQP")
-    cvxpy_solver = getattr(cp, solver_name)
-
-    # --- run ---
-    hist, xk, meta, baseline = projected_primal_dual_loop(
-        price, energy, time_grid,
-        start, goal,
-        slip=slip,
-        Emax=Emax,
-        Tmax=Tmax,
-        betaE=betaE,
-        betaT=betaT,
-        rho=rho,
-        alpha=alpha,
-        etaE=etaE,
-        etaT=etaT,
-        iters=iters,
-        lamE0=lamE0,
-        lamT0=lamT0,
-        solver=cvxpy_solver,
-        verbose_every=verbose_every,
-    )
-
-    states, sa_list, sa_idx = meta
-    pi = policy_from_x_fast(xk, states, sa_idx, goal)
-
-    #Save plots into out_dir
-    plot_grid_with_labels(price,  "Price",  start=start, goal=goal, out_path=out_dir / "price_grid.png")
-    plot_grid_with_labels(energy, "Energy", start=start, goal=goal, out_path=out_dir / "energy_grid.png")
-    plot_grid_with_labels(time_grid, "Time", start=start, goal=goal, out_path=out_dir / "time_grid.png")
-
-    plot_policy_arrows(pi, price.shape[0], price.shape[1], start=start, goal=goal,
-                   title="Final policy", out_path=out_dir / "policy.png")
-
-    plot_history_2c(hist, Emax=Emax, Tmax=Tmax, betaE=betaE, betaT=betaT, out_dir=str(out_dir))
-
-    summary = print_summary_2c(hist, baseline, price, energy, time_grid, start, goal, slip, xk, sa_list,
-                          Emax=Emax, Tmax=Tmax, betaE=betaE, betaT=betaT)
+    return {
+        "Emax": float(cfg["constraints"]["Emax"]),
+        "Tmax": float(cfg["constraints"]["Tmax"]),
+        "betaE": float(cfg["constraints"]["betaE"]),
+        "betaT": float(cfg["constraints"]["betaT"]),
+        "rho": float(cfg["solver"].get("rho", 1e-6)),
+        "alpha": float(cfg["solver"].get("alpha", 0.02)),
+        "etaE": float(cfg["solver"].get("etaE", 0.02)),
+        "etaT": float(cfg["solver"].get("etaT", 0.02)),
+        "iters": int(cfg["solver"].get("iters", 200)),
+        "lamE0": float(cfg["solver"].get("lamE0", 0.0)),
+        "lamT0": float(cfg["solver"].get("lamT0", 0.0)),
+        "solver": str(solver_name).upper(),
+        "verbose_every": int(cfg["solver"].get("verbose_every", 10)),
+        # Projection backend for the primal step: "cvxpy" or "osqp" (factorized once)
+        "projection": cfg["solver"].get("projection", "cvxpy"),
+        "projection_opts": cfg["solver"].get("projection_opts", {}),
+        # Baseline QP: "cvxpy", or osqp / clarabel / highs called on native sparse data
+        "baseline_backend": cfg["solver"].get("baseline_backend", "cvxpy"),
+        # primal-dual dynamics (solvers/dynamics.py)
+        "primal_rule": cfg["solver"].get("primal_rule", "gd"),
+        "dual_rule": cfg["solver"].get("dual_rule", "fixed"),
+        "dual_residual": cfg["solver"].get("dual_residual", "prev"),
+        "momentum": float(cfg["solver"].get("momentum", 0.1)),
+        # instrumentation: per-iteration timing columns, 'module:function' hooks
+        "timing": bool(cfg.get("instrument", {}).get("timing", False)),
+        "hooks": cfg.get("instrument", {}).get("hooks"),
+        # history recorder: keep every n-th iteration, optionally only some metrics
+        "history_stride": int(cfg.get("save", {}).get("history_stride", 1)),
+        "history_metrics": cfg.get("save", {}).get("history_metrics"),
+    }
 
 
-    # --- save outputs ---
-    save_cfg = cfg.get("save", {})
-    if save_cfg.get("history_csv", True):
-        df = pd.DataFrame(hist)
-        df.to_csv(out_dir / "history.csv", index=False)
+def build_model(cfg: dict, mdp):
+    """
+    (model, product, reduced) the loop runs on: the compiled grid, its
+    product with the pctl specs and/or its pruned reduction (env.prune).
+    """
+    # --- optional PCTL specs: solve on the product MDP ---
+    specs = cfg.get("pctl") or []
+    product = None
+    if specs:
+        from models.product import build_product
 
-    # A lightweight summary for quick comparisons
-    summary = {
+        product = build_product(mdp, specs)
+        print(f"Product MDP: {product.n_states} reachable (state, flags) of "
+              f"{mdp.n_states * product.n_flags}, {product.n} pairs")
+
+    # --- optional pruning: drop unreachable and absorbing states before the LP is built ---
+    model = mdp if product is None else product
+    reduced = None
+    if cfg["env"].get("prune", False):
+        from models.reduce import prune_mdp
+
+        reduced = prune_mdp(model)
+        model = reduced
+        sizes = reduced.reduction()
+        print(f"Pruned: {sizes['states'][0]} -> {sizes['states'][1]} states, "
+              f"{sizes['pairs'][0]} -> {sizes['pairs'][1]} pairs")
+    return model, product, reduced
+
+
+def add_pctl_constraints(cfg: dict, product, reduced, params: dict):
+    """params["extra_constraints"]: one bargained probability row per pctl spec (restricted if pruned)."""
+    if product is None:
+        return params
+    specs = cfg["pctl"]
+    G_spec, budgets_spec = product.constraint_rows([float(spec["p"]) for spec in specs])
+    spec_names = [aut.name for aut in product.automata]
+    params["extra_constraints"] = {
+        "G": G_spec if reduced is None else reduced.restrict(G_spec),
+        "budgets": budgets_spec, "names": spec_names,
+        "labels": [spec.get("label", name) for spec, name in zip(specs, spec_names)],
+        "betas": [float(spec.get("beta", 1.0)) for spec in specs],
+        "etas": [float(spec.get("eta", params["etaE"])) for spec in specs],
+    }
+    return params
+
+
+def grid_solution(xk, hist, product, reduced, params: dict):
+    """
+    (grid occupancy, pctl report) of the loop's xk: pruned pairs are put
+    back and product occupancies summed over flags; pctl is None without specs.
+    """
+    if reduced is not None:
+        xk = reduced.expand(xk)
+    pctl = None
+    if product is not None:
+        extra = params["extra_constraints"]
+        probs = product.probabilities(xk)
+        levels = -np.asarray(extra["budgets"], float)   # budgets are -p (constraint_rows)
+        pctl = {name: {"p": float(p), "prob": probs[name], "lam": last(hist, f"lam{label}")}
+                for name, label, p in zip(extra["names"], extra["labels"], levels)}
+        for name, r in pctl.items():
+            print(f"P({name}) = {r['prob']:.6f}  (>= {r['p']}, lam = {r['lam']:.6f})")
+        xk = product.grid_occupancy(xk)
+    return xk, pctl
+
+
+def build_summary(exp_name, out_dir, start, goal, slip, params, hist, full, baseline,
+                  simulated=None, pctl=None, wall_time=None) -> dict:
+    """
+    The summary.json dict of a run (full: the complete history, hist: this
+    process's recorder, wall_time: seconds spent in the solve).
+    """
+    final = None
+    if len(full) > 0:
+        final = {key: last(full, key)
+                 for key in ("price_raw", "price_reg", "energy", "time", "lamE", "lamT",
+                             "E_eff", "T_eff", "violE", "violT")}
+        # price plus the dual penalties, as sweep_row's all_in
+        final["all_in"] = (final["price_raw"] + (params["betaE"] / 2.0) * final["lamE"]**2
+                           + (params["betaT"] / 2.0) * final["lamT"]**2)
+        final["wall_time"] = wall_time
+    return {
         "experiment_name": exp_name,
         "out_dir": str(out_dir),
         "slip": slip,
         "start": list(start),
         "goal": list(goal),
-        "Emax": Emax,
-        "Tmax": Tmax,
-        "betaE": betaE,
-        "betaT": betaT,
-        "rho": rho,
-        "alpha": alpha,
-        "etaE": etaE,
-        "etaT": etaT,
-        "iters_requested": iters,
-        "iters_ran": len(hist),
+        "Emax": params["Emax"],
+        "Tmax": params["Tmax"],
+        "betaE": params["betaE"],
+        "betaT": params["betaT"],
+        "rho": params["rho"],
+        "alpha": params["alpha"],
+        "etaE": params["etaE"],
+        "etaT": params["etaT"],
+        "projection": params["projection"],
+        "baseline_backend": params["baseline_backend"],
+        "primal_rule": params["primal_rule"],
+        "dual_rule": params["dual_rule"],
+        "dual_residual": params["dual_residual"],
+        "iters_requested": params["iters"],
+        "iters_ran": hist.iters_ran,
+        "status": hist.status,
+        "solver_time": hist.solver_time,
+        "timing": hist.timing_summary(),
         "baseline": None if baseline is None else {
             "price": float(baseline["price"]),
             "energy": float(baseline["energy"]),
             "time": float(baseline["time"]),
             "obj": float(baseline["obj"]),
+            "setup_time": float(baseline["setup_time"]),
+            "solve_time": float(baseline["solve_time"]),
         },
-        "final": None if len(hist) == 0 else {
-            "price_raw": float(hist[-1].get("price_raw", np.nan)),
-            "price_reg": float(hist[-1].get("price_reg", np.nan)),
-            "energy": float(hist[-1].get("energy", np.nan)),
-            "time": float(hist[-1].get("time", np.nan)),
-            "lamE": float(hist[-1].get("lamE", np.nan)),
-            "lamT": float(hist[-1].get("lamT", np.nan)),
-            "E_eff": float(hist[-1].get("E_eff", np.nan)),
-            "T_eff": float(hist[-1].get("T_eff", np.nan)),
-            "violE": float(hist[-1].get("violE", np.nan)),
-            "violT": float(hist[-1].get("violT", np.nan)),
-        }
+        "final": final,
+        "simulated": simulated,
+        "pctl": pctl,
     }
 
+
+def solve_on_daemon(address, cfg, params, streamer=None):
+    """
+    (hist, xk, baseline, pctl, totals) of cfg solved by the solver daemon,
+    xk on the grid. Streamed history rows go to streamer (if any) and
+    progress is printed every verbose_every iterations.
+    """
+    from solvers.daemon import DaemonClient
+
+    client = DaemonClient(None if address == "default" else address)
+    if not client.ping():
+        raise SystemExit(f"--daemon: no solver daemon at {client.address} (start scripts/serve.py)")
+    every = params["verbose_every"]
+
+    def on_rows(rows):
+        if streamer is not None:
+            streamer.extend(rows)
+        for row in rows:
+            if every and row["t"] % every == 0:
+                print(f"it {row['t']:4d} price={row.get('price_raw', float('nan')):.4f} "
+                      f"lamE={row.get('lamE', float('nan')):.4f} lamT={row.get('lamT', float('nan')):.4f}")
+
+    res = client.solve(cfg, on_rows=on_rows, stride=params["history_stride"])
+    if streamer is not None:
+        streamer.close()
+    cache = res["cache"]
+    print(f"Daemon job {res['job']} on worker {res['worker']} ({'warm' if cache['hit'] else 'cold'} workspace, "
+          f"{res['wall_time']:.2f}s)")
+    for name, r in (res["pctl"] or {}).items():
+        print(f"P({name}) = {r['prob']:.6f}  (>= {r['p']}, lam = {r['lam']:.6f})")
+    return res["history"], res["xk"], res["baseline"], res["pctl"], res["totals"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", required=True, help="Path to YAML config")
+    ap.add_argument("--resume", action="store_true",
+                    help="Continue from out_dir/checkpoint.npz (implies save.stream)")
+    ap.add_argument("--daemon", nargs="?", const="default", default=None, metavar="ADDRESS",
+                    help="Solve on a running solver daemon (scripts/serve.py): socket path or host:port")
+    args = ap.parse_args()
+
+    cfg = load_yaml(args.config)
+
+    exp_name = cfg.get("experiment_name", "experiment")
+    out_dir = ensure_dir(cfg.get("out_dir", f"results/{exp_name}"))
+
+    # --- build inputs ---
+    price, energy, time_grid, start, goal, slip = env_from_config(cfg)
+    params = loop_params_from_config(cfg)
+    mdp = None
+    if not args.daemon:
+        # compiled map, reused from memory or from cache_dir (if set) across runs
+        mdp = compile_mdp(price, energy, time_grid, start, goal, slip, cache_dir=cfg.get("cache_dir"),
+                          walls=cfg["env"].get("walls"))
+        model, product, reduced = build_model(cfg, mdp)
+        add_pctl_constraints(cfg, product, reduced, params)
+    extra = params.get("extra_constraints") or {}
+    names = ["energy", "time"] + list(extra.get("names", []))
+    labels = ["E", "T"] + list(extra.get("labels", []))
+
+    # --- streaming history + checkpoints (save.stream or --resume) ---
+    save_cfg = cfg.get("save", {})
+    stream = bool(save_cfg.get("stream", False)) or args.resume
+    history_path = out_dir / save_cfg.get("history_file", "history.csv")
+    checkpoint_path = out_dir / "checkpoint.npz"
+    if args.resume:
+        if args.daemon:
+            raise SystemExit("--resume runs in this process; drop --daemon")
+        if not checkpoint_path.exists():
+            raise SystemExit(f"--resume: no checkpoint at {checkpoint_path}")
+        params["resume"] = load_checkpoint(checkpoint_path)
+        t_done = params["resume"]["t"]
+        if t_done >= params["iters"]:
+            print(f"Checkpoint is at iteration {t_done} >= iters {params['iters']}: nothing left to run")
+        else:
+            print(f"Resuming from iteration {t_done} up to {params['iters']}")
+    streamer = None
+    if stream:
+        streamer = HistoryStreamer(history_path, names, labels,
+                                   chunk=save_cfg.get("chunk_rows", 100), stride=params["history_stride"],
+                                   resume_t=params["resume"]["t"] if args.resume else None)
+        if not args.daemon:   # the daemon streams rows back but keeps no checkpoints
+            checkpointer = Checkpointer(checkpoint_path, every=save_cfg.get("checkpoint_every", 50),
+                                        streamer=streamer)
+            params["hooks"] = list(params["hooks"] or []) + [streamer, checkpointer]
+
+    # --- run: in this process, or on the solver daemon (scripts/serve.py) ---
+    t0 = time.perf_counter()
+    if args.daemon:
+        hist, xk, baseline, pctl, totals = solve_on_daemon(args.daemon, cfg, params, streamer)
+    else:
+        hist, xk, _, baseline = projected_primal_dual_loop(
+            price, energy, time_grid,
+            start, goal,
+            slip=slip,
+            mdp=model,
+            **params,
+        )
+    wall_time = time.perf_counter() - t0
+
+    # the full history: streamed runs (possibly resumed) are read back from disk
+    if stream:
+        import pandas as pd
+
+        full = pd.read_parquet(history_path) if history_path.suffix == ".parquet" else pd.read_csv(history_path)
+    else:
+        full = hist
+
+    if not args.daemon:
+        xk, pctl = grid_solution(xk, full, product, reduced, params)
+        totals = mdp.C @ xk
+
+    Emax, Tmax = params["Emax"], params["Tmax"]
+    betaE, betaT = params["betaE"], params["betaT"]
+
+    # Save plots into out_dir: now, on a background pool, or later from xk.npy + history
+    plot_cfg = cfg.get("plots") or {}
+    plot_mode = plot_cfg.get("mode", "sync")
+    if isinstance(plot_mode, bool):   # YAML reads a bare `off` as false
+        plot_mode = "sync" if plot_mode else "off"
+    if plot_mode not in PLOT_MODES:
+        raise ValueError(f"Unknown plots.mode {plot_mode!r}; expected one of {list(PLOT_MODES)}")
+    np.save(out_dir / "xk.npy", xk)
+    plotter = None
+    if plot_mode in ("sync", "background"):
+        jobs = plot_jobs({"price": price, "energy": energy, "time": time_grid}, start, goal,
+                         policy_matrix_from_x(xk), full, Emax=Emax, Tmax=Tmax, betaE=betaE, betaT=betaT,
+                         out_dir=out_dir, dpi=plot_cfg.get("dpi", 200))
+        if plot_mode == "sync":
+            render(jobs)
+        else:
+            plotter = PlotPool(plot_cfg.get("workers"))
+            plotter.submit(jobs)
+
+    summary = print_summary_2c(full, baseline, price, energy, time_grid, start, goal, slip, xk, None,
+                               Emax=Emax, Tmax=Tmax, betaE=betaE, betaT=betaT, totals=totals)
+
+
+    # optional Monte Carlo check of the LP totals under the extracted policy
+    sim_cfg = cfg.get("simulate") or {}
+    simulated = None
+    if sim_cfg.get("episodes", 0):
+        from models.rollout import simulate_policy
+
+        if mdp is None:
+            mdp = compile_mdp(price, energy, time_grid, start, goal, slip, walls=cfg["env"].get("walls"))
+        simulated = simulate_policy(mdp, policy_matrix_from_x(xk), [price, energy, time_grid],
+                                    episodes=int(sim_cfg["episodes"]), max_steps=sim_cfg.get("max_steps"),
+                                    seed=int(sim_cfg.get("seed", cfg.get("seed", 0))))
+        print(f"Simulated ({simulated['episodes']} episodes, {simulated['truncated']} truncated):")
+        for name in ("price", "energy", "time"):
+            r = simulated[name]
+            print(f"  {name:6s} = {r['mean']:.6f}  [{r['ci_low']:.6f}, {r['ci_high']:.6f}]")
+
+    # --- save outputs ---
+    # streamed runs already wrote history_file; history_csv adds history.csv if that is Parquet
+    if save_cfg.get("history_csv", True) and not stream:
+        df = hist.to_frame()
+        df.to_csv(out_dir / "history.csv", index=False)
+    elif save_cfg.get("history_csv", True) and history_path != out_dir / "history.csv":
+        full.to_csv(out_dir / "history.csv", index=False)
+
+    # A lightweight summary for quick comparisons
+    summary = build_summary(exp_name, out_dir, start, goal, slip, params, hist, full, baseline,
+                            simulated=simulated, pctl=pctl, wall_time=wall_time)
+
     if save_cfg.get("summary_json", True):
         with open(out_dir / "summary.json", "w") as f:
             json.dump(summary, f, indent=2)
 
+    # one row (params, summary, xk, history) in the shared results store
+    run_id = None
+    if save_cfg.get("store"):
+        from solvers.store import ResultsStore
+
+        store = ResultsStore(save_cfg["store"])
+        run_id = store.append({**params, "slip": slip, "n_rows": price.shape[0], "n_cols": price.shape[1]},
+                              summary, config=cfg, xk=xk, history=full, experiment_name=exp_name)
+        print(f"Stored run {run_id} in {store.path}")
+
+    if plotter is not None:
+        print(f"Rendered {plotter.wait()} figures in the background")
+    elif plot_mode == "deferred":
+        source = f"--store {save_cfg['store']} --run {run_id}" if run_id else f"--config {args.config}"
+        print(f"Plots deferred: python scripts/render_plots.py {source}")
+
     print(f"\n✅ Done: {exp_name}")
-    print(f"   outputs: {out_dir}/history.csv, {out_dir}/summary.json")
+    print(f"   outputs: {history_path if stream else out_dir / 'history.csv'}, {out_dir}/summary.json")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]   # repo root
+sys.path.insert(0, str(ROOT))
+
+import pandas as pd
+
+from models.mdp import compile_mdp
+from solvers.sweep import expand_grid, run_sweep, run_sweep_batched
+from run_experiment import ensure_dir, env_from_config, load_yaml, loop_params_from_config
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", required=True, help="Path to YAML config with a `sweep` block")
+    ap.add_argument("--workers", type=int, default=None, help="Override sweep.workers")
+    ap.add_argument("--continuation", choices=("off", "on", "compare"), default=None,
+                    help="Override sweep.continuation (compare: run both and report each)")
+    args = ap.parse_args()
+
+    cfg = load_yaml(args.config)
+    sweep_cfg = cfg["sweep"]
+
+    exp_name = cfg.get("experiment_name", "sweep")
+    out_dir = Path(cfg.get("out_dir", f"results/{exp_name}"))
+    out_path = Path(sweep_cfg.get("table", out_dir / "sweep.csv"))
+    ensure_dir(out_path.parent)
+
+    price, energy, time_grid, start, goal, slip = env_from_config(cfg)
+    params = loop_params_from_config(cfg)
+    points = expand_grid(sweep_cfg["grid"])
+    workers = args.workers if args.workers is not None else int(sweep_cfg.get("workers", os.cpu_count() or 1))
+
+    # continuation: off | on (seed each point from its neighbour) | compare (both)
+    continuation = args.continuation or sweep_cfg.get("continuation", "off")
+    if isinstance(continuation, bool):
+        continuation = "on" if continuation else "off"
+    # engine "pool": independent runs over a process pool; "batched": all points in lockstep
+    engine = sweep_cfg.get("engine", "pool")
+    if engine == "batched" and continuation != "off":
+        raise ValueError("sweep.continuation needs engine: pool (batched points run in lockstep)")
+
+    # sweep.store: append every run (params, final values, xk, history) to a results store
+    store = None
+    if sweep_cfg.get("store"):
+        from solvers.store import ResultsStore
+
+        store = {"store": ResultsStore(sweep_cfg["store"]), "config": cfg, "name": exp_name}
+
+    t0 = time.perf_counter()
+    mdp = compile_mdp(price, energy, time_grid, start, goal, slip, cache_dir=cfg.get("cache_dir"),
+                      walls=cfg["env"].get("walls"))
+    if engine == "batched":
+        rows = run_sweep_batched(mdp, params, points)
+    else:
+        modes = {"off": [False], "on": [True], "compare": [False, True]}[continuation]
+        rows, report = [], {}
+        for warm in modes:
+            t1 = time.perf_counter()
+            mode_rows = run_sweep(mdp, params, points, workers=workers, continuation=warm, store=store)
+            for row in mode_rows:
+                row["continuation"] = warm
+            report[warm] = (sum(r["iters_ran"] for r in mode_rows), time.perf_counter() - t1,
+                            sum(r["solver_time"] for r in mode_rows))
+            rows += mode_rows
+    elapsed = time.perf_counter() - t0
+
+    df = pd.DataFrame(rows)
+    if out_path.suffix == ".parquet":
+        df.to_parquet(out_path, index=False)
+    else:
+        df.to_csv(out_path, index=False)
+
+    print(f"\n✅ Done: {exp_name} ({len(rows)} runs, engine={engine}, {elapsed:.1f}s)")
+    print(f"   table: {out_path}")
+    if engine != "batched":
+        for warm, (total_iters, wall, solver_time) in report.items():
+            print(f"   continuation={'on' if warm else 'off':3s}: {total_iters} iterations "
+                  f"({total_iters / max(len(points), 1):.1f}/point), {wall:.2f}s wall, "
+                  f"{solver_time:.2f}s in primal solves")
+
+
+if __name__ == "__main__":
+    main()
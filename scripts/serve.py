@@ -0,0 +1,280 @@
+import argparse
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]   # repo root
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from models.mdp import compile_mdp
+from solvers.daemon import DEFAULT_ADDRESS, WorkspaceCache, cached, decode, encode, parse_address, workspace_key
+from solvers.history import flat_row
+from solvers.primal_dual import build_baseline_problem, projected_primal_dual_loop
+from solvers.projection import make_projector
+from run_experiment import add_pctl_constraints, build_model, env_from_config, grid_solution, \
+    loop_params_from_config
+
+
+# ---------------------------------------------------------------- worker processes
+
+class RowStreamer:
+    """Hook sending every stride-th flat history row to the server, batched every `interval` seconds."""
+
+    def __init__(self, job, outbox, names, labels, stride=1, interval=0.1):
+        self.job, self.outbox = job, outbox
+        self.names, self.labels = names, labels
+        self.stride = max(1, int(stride))
+        self.interval = interval
+        self.rows = []
+        self._sent = time.perf_counter()
+
+    def __call__(self, event, payload):
+        if event == "iteration":
+            t = payload["t"]
+            if t % self.stride == 0 or payload.get("last"):
+                self.rows.append(flat_row(t, payload["values"], self.names, self.labels))
+            if time.perf_counter() - self._sent >= self.interval:
+                self.flush()
+        elif event == "done":
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.outbox.put({"job": self.job, "event": "history", "rows": self.rows})
+            self.rows = []
+        self._sent = time.perf_counter()
+
+
+def _workspace(cfg):
+    """A fresh workspace for cfg's map: compiled grid MDP and the model the loop runs on."""
+    price, energy, time_grid, start, goal, slip = env_from_config(cfg)
+    mdp = compile_mdp(price, energy, time_grid, start, goal, slip, cache_dir=cfg.get("cache_dir"),
+                      walls=cfg["env"].get("walls"))
+    model, product, reduced = build_model(cfg, mdp)
+    return {"mdp": mdp, "model": model, "product": product, "reduced": reduced}
+
+
+def run_job(job, cache, outbox):
+    """Run one solve job on the worker's cached workspace; returns the result message."""
+    t0 = time.perf_counter()
+    cfg = job["config"]
+    ws, hit = cache.entry(job["key"], lambda: _workspace(cfg))
+    model, product, reduced = ws["model"], ws["product"], ws["reduced"]
+    params = add_pctl_constraints(cfg, product, reduced, loop_params_from_config(cfg))
+    params["verbose_every"] = 0
+
+    # factorized projection and baseline workspaces, shared by every job on this map
+    opts = params["projection_opts"] or {}
+    projector = cached(ws["projectors"], (params["projection"], repr(sorted(opts.items())), params["solver"]),
+                       lambda: make_projector(params["projection"], model.A, model.b, model.goal_idx,
+                                              solver=params["solver"], **opts))
+    extra = params.get("extra_constraints")
+    G, names = model.C[1:], list(model.cost_names[1:])
+    if extra is not None:
+        G, names = np.vstack([G, extra["G"]]), names + list(extra["names"])
+    baseline_problem = cached(ws["baselines"], (params["rho"], params["baseline_backend"]),
+                              lambda: build_baseline_problem(model, params["rho"], G=G, names=names,
+                                                             backend=params["baseline_backend"]))
+
+    if job.get("stream"):
+        labels = ["E", "T"] + (list(extra["labels"]) if extra is not None else [])
+        params["hooks"] = list(params["hooks"] or []) + [
+            RowStreamer(job["id"], outbox, names, labels, stride=job.get("stride", 1))]
+    hist, xk, _, baseline = projected_primal_dual_loop(
+        None, None, None, ws["mdp"].start, ws["mdp"].goal,
+        mdp=model, baseline_problem=baseline_problem, projector=projector, **params,
+    )
+    xk, pctl = grid_solution(xk, hist, product, reduced, params)
+    return {
+        "job": job["id"], "event": "result",
+        "xk": xk, "history": hist.to_json(), "pctl": pctl,
+        "totals": ws["mdp"].C @ xk,
+        "baseline": None if baseline is None else {k: v for k, v in baseline.items() if k != "x"},
+        "cache": {"hit": hit, "keys": cache.keys(), **cache.stats()},
+        "wall_time": time.perf_counter() - t0,
+    }
+
+
+def worker_main(index, inbox, outbox, cache_size):
+    """Worker process: run jobs from inbox until None, replies (and history rows) to outbox."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # the server shuts workers down
+    cache = WorkspaceCache(cache_size)
+    while True:
+        job = inbox.get()
+        if job is None:
+            break
+        try:
+            reply = run_job(job, cache, outbox)
+        except Exception as exc:
+            reply = {"job": job["id"], "event": "error", "message": f"{type(exc).__name__}: {exc}",
+                     "traceback": traceback.format_exc()}
+        reply["worker"] = index
+        outbox.put(reply)
+
+
+# ---------------------------------------------------------------- server
+
+class Worker:
+    def __init__(self, index, ctx, outbox, cache_size):
+        self.index = index
+        self.inbox = ctx.Queue()
+        self.proc = ctx.Process(target=worker_main, args=(index, self.inbox, outbox, cache_size), daemon=True)
+        self.proc.start()
+        self.pending = 0
+        self.keys = set()    # workspaces cached on this worker (as of its last reply)
+        self.done = 0
+
+
+class SolverServer:
+    """
+    Asyncio front end of the solver daemon. Jobs go to the worker that
+    already holds their map's workspace unless another worker is less
+    busy; each worker process keeps its own WorkspaceCache, so repeated
+    runs on a map skip compilation, factorization and baseline setup.
+    Replies from the workers are pumped from one multiprocessing queue
+    into per-job asyncio queues by a reader thread.
+    """
+
+    def __init__(self, address, workers=2, cache_size=8):
+        self.address = address
+        ctx = mp.get_context("spawn")
+        self.outbox = ctx.Queue()
+        self.workers = [Worker(k, ctx, self.outbox, cache_size) for k in range(max(1, int(workers)))]
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.started = time.time()
+
+    def pick(self, key):
+        return min(self.workers, key=lambda w: (w.pending, key not in w.keys, w.index))
+
+    def _pump(self, loop):
+        while True:
+            msg = self.outbox.get()
+            if msg is None:
+                break
+            loop.call_soon_threadsafe(self._dispatch, msg)
+
+    def _dispatch(self, msg):
+        queue = self.jobs.get(msg["job"])
+        if queue is not None:
+            queue.put_nowait(msg)
+
+    async def solve(self, msg, send):
+        cfg = msg["config"]
+        job_id = next(self.ids)
+        key = workspace_key(cfg)
+        worker = self.pick(key)
+        warm = key in worker.keys
+        queue = self.jobs[job_id] = asyncio.Queue()
+        worker.pending += 1
+        worker.inbox.put({"id": job_id, "key": key, "config": cfg, "stream": bool(msg.get("stream")),
+                          "stride": int(msg.get("stride", 1))})
+        await send({"event": "accepted", "job": job_id, "worker": worker.index, "warm": warm})
+        try:
+            while True:
+                reply = await queue.get()
+                if reply["event"] != "history":
+                    break
+                await send(reply)
+        finally:
+            del self.jobs[job_id]
+            worker.pending -= 1
+        worker.done += 1
+        if "cache" in reply:
+            worker.keys = set(reply["cache"]["keys"])
+        await send(reply)
+
+    def stats(self):
+        return {"event": "stats", "uptime": time.time() - self.started, "running": len(self.jobs),
+                "workers": [{"index": w.index, "pid": w.proc.pid, "alive": w.proc.is_alive(),
+                             "pending": w.pending, "done": w.done, "cached": sorted(w.keys)}
+                            for w in self.workers]}
+
+    async def handle(self, reader, writer):
+        closed = False
+
+        async def send(reply):
+            nonlocal closed
+            if closed:
+                return   # client went away: finish the job anyway, drop its output
+            try:
+                writer.write(encode(reply))
+                await writer.drain()
+            except ConnectionError:
+                closed = True
+
+        try:
+            while line := await reader.readline():
+                msg = decode(line)
+                op = msg.get("op")
+                if op == "solve":
+                    await self.solve(msg, send)
+                elif op == "stats":
+                    await send(self.stats())
+                elif op == "ping":
+                    await send({"event": "pong"})
+                elif op == "shutdown":
+                    await send({"event": "bye"})
+                    self.stop.set()
+                    break
+                else:
+                    await send({"event": "error", "message": f"Unknown op {op!r}"})
+        except asyncio.CancelledError:
+            pass   # daemon shutting down with this client still connected
+        finally:
+            if not closed:
+                writer.close()
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        self.stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stop.set)
+        pump = threading.Thread(target=self._pump, args=(loop,), daemon=True)
+        pump.start()
+
+        kind, addr = parse_address(self.address)
+        if kind == "tcp":
+            server = await asyncio.start_server(self.handle, *addr, limit=2**26)
+        else:
+            if os.path.exists(addr):
+                os.unlink(addr)   # stale socket of a previous daemon
+            server = await asyncio.start_unix_server(self.handle, addr, limit=2**26)
+        print(f"Solver daemon on {self.address}: {len(self.workers)} workers "
+              f"(pids {', '.join(str(w.proc.pid) for w in self.workers)})", flush=True)
+        async with server:
+            await self.stop.wait()
+
+        for w in self.workers:
+            w.inbox.put(None)
+        for w in self.workers:
+            w.proc.join(timeout=10)
+        self.outbox.put(None)
+        pump.join(timeout=10)
+        if kind == "unix" and os.path.exists(addr):
+            os.unlink(addr)
+        print("Solver daemon stopped", flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local solver daemon: keeps compiled maps and solver workspaces hot")
+    ap.add_argument("--address", default=DEFAULT_ADDRESS,
+                    help=f"Unix socket path or host:port (default {DEFAULT_ADDRESS})")
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="Worker processes")
+    ap.add_argument("--cache-size", type=int, default=8, help="Workspaces (maps) cached per worker")
+    args = ap.parse_args()
+
+    asyncio.run(SolverServer(args.address, args.workers, args.cache_size).serve())
+
+
+if __name__ == "__main__":
+    main()
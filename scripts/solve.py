@@ -0,0 +1,67 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]   # repo root
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+
+from models.mdp import compile_mdp
+from solvers.primal_dual import projected_primal_dual_loop
+from run_experiment import add_pctl_constraints, build_model, build_summary, ensure_dir, env_from_config, \
+    grid_solution, load_yaml, loop_params_from_config
+
+
+def main():
+    """
+    Solve-only entry point: compile, run projected_primal_dual_loop and
+    write summary.json (+ xk.npy). No plots, history CSV, streaming or
+    store, so matplotlib, pandas and pyarrow are never imported and cvxpy
+    only when the config selects a cvxpy projection / baseline.
+    """
+    ap = argparse.ArgumentParser(description="Run one experiment config without plots or history files")
+    ap.add_argument("--config", required=True, help="Path to YAML config")
+    ap.add_argument("--out", default=None, help="Summary path (default: out_dir/summary.json)")
+    ap.add_argument("--no-xk", action="store_true", help="Do not save the final occupancy")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    cfg = load_yaml(args.config)
+    exp_name = cfg.get("experiment_name", "experiment")
+    out_dir = ensure_dir(cfg.get("out_dir", f"results/{exp_name}"))
+
+    price, energy, time_grid, start, goal, slip = env_from_config(cfg)
+    params = loop_params_from_config(cfg)
+    mdp = compile_mdp(price, energy, time_grid, start, goal, slip, cache_dir=cfg.get("cache_dir"),
+                      walls=cfg["env"].get("walls"))
+    model, product, reduced = build_model(cfg, mdp)
+    add_pctl_constraints(cfg, product, reduced, params)
+
+    t1 = time.perf_counter()
+    hist, xk, _, baseline = projected_primal_dual_loop(
+        price, energy, time_grid, start, goal, slip=slip, mdp=model, **params,
+    )
+    wall_time = time.perf_counter() - t1
+    xk, pctl = grid_solution(xk, hist, product, reduced, params)
+
+    summary = build_summary(exp_name, out_dir, start, goal, slip, params, hist, hist, baseline, pctl=pctl,
+                            wall_time=wall_time)
+    summary["wall_time"] = time.perf_counter() - t0
+    out_path = Path(args.out) if args.out else out_dir / "summary.json"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    if not args.no_xk:
+        np.save(out_dir / "xk.npy", xk)
+
+    final = summary["final"] or {}
+    print(f"{exp_name}: {hist.iters_ran} iters, price {final.get('price_raw', float('nan')):.6f}, "
+          f"energy {final.get('energy', float('nan')):.6f}, time {final.get('time', float('nan')):.6f} "
+          f"({summary['wall_time']:.2f}s) -> {out_path}")
+
+
+if __name__ == "__main__":
+    main()
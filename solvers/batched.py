@@ -0,0 +1,114 @@
+import numpy as np
+
+from models.flow import flow_rhs
+from solvers.projection import make_projector
+
+
+def batched_primal_dual_loop(
+    mdp, budgets, betas, etas,
+    alpha=0.02,
+    rho=1e-6,
+    iters=200,
+    lam0=None,
+    starts=None,
+    projector=None,
+    projection="osqp",
+    projection_opts=None,
+    solver="OSQP",
+):
+    """
+    Run N bargaining instances on one compiled MDP in lockstep.
+
+    Constraint rows are G = mdp.C[1:] (K of them); budgets, betas, etas and
+    lam0 broadcast to (N, K), alpha to (N,). starts optionally gives one
+    start state per instance. Per iteration, for all active instances at once:
+      X <- Proj_X(X - alpha * (c + rho*X + lam @ G))
+      lam <- [lam + eta * (G x_prev - (B + beta*lam))]_+   (paper-style)
+    Instances meeting the single-run stopping rule are frozen: they leave
+    the batched projection and stop updating.
+
+    Returns (X, lam, hist): final (N, S*A) occupancies, (N, K) duals and a
+    dict of (iters, N[, K]) arrays plus "iters_ran" (N,).
+    """
+    c_vec = mdp.C[0]
+    G = mdp.C[1:]
+    K = G.shape[0]
+
+    budgets = np.atleast_2d(np.asarray(budgets, float))
+    N = budgets.shape[0]
+    budgets = np.broadcast_to(budgets, (N, K))
+    betas = np.broadcast_to(np.asarray(betas, float), (N, K))
+    etas = np.broadcast_to(np.asarray(etas, float), (N, K))
+    alpha = np.broadcast_to(np.asarray(alpha, float), (N,))[:, None]
+    lam = np.zeros((N, K)) if lam0 is None else np.array(np.broadcast_to(lam0, (N, K)), float)
+
+    B = None
+    if starts is not None:
+        B = np.stack([flow_rhs(mdp.n_rows, mdp.n_cols, tuple(s), mdp.goal) for s in starts])
+
+    if projector is None:
+        projector = make_projector(projection, mdp.A, mdp.b, mdp.goal_idx, solver=solver,
+                                   **(projection_opts or {}))
+
+    # per-instance solver duals, so each row keeps its own warm start
+    Z = np.zeros((N, projector.n_duals)) if hasattr(projector, "n_duals") else None
+    X = projector.project_batch(np.zeros((N, mdp.n)), B=B, Z=Z)
+
+    hist = {
+        "price_raw": np.empty((iters, N)),
+        "price_reg": np.empty((iters, N)),
+        "g": np.empty((iters, N, K)),
+        "lam": np.empty((iters, N, K)),
+        "g_eff": np.empty((iters, N, K)),
+        "viol": np.empty((iters, N, K)),
+        "cs": np.empty((iters, N, K)),
+        "dx1": np.empty((iters, N)),
+    }
+    iters_ran = np.zeros(N, dtype=int)
+    active = np.arange(N)
+
+    t = 0
+    for t in range(1, iters + 1):
+        X_prev = X.copy()
+        a = active
+
+        # primal step + one batched projection of the active rows only, so
+        # frozen instances drop out of the solve (each keeps its own duals)
+        Y = X[a] - alpha[a] * (c_vec + rho * X[a] + lam[a] @ G)
+        Z_a = None if Z is None else Z[a]
+        X[a] = projector.project_batch(Y, X0=X[a], B=None if B is None else B[a], Z=Z_a)
+        if Z is not None:
+            Z[a] = Z_a
+
+        # paper-style dual update on previous-iterate residuals
+        resid_prev = X_prev[a] @ G.T - (budgets[a] + betas[a] * lam[a])
+        lam[a] = np.maximum(0.0, lam[a] + etas[a] * resid_prev)
+
+        # diagnostics for every instance (frozen ones keep their last values)
+        g_val = X @ G.T
+        g_eff = budgets + betas * lam
+        resid = g_val - g_eff
+        viol = np.maximum(0.0, resid)
+        cs = np.abs(lam * resid)
+        dx = np.abs(X - X_prev).sum(axis=1)
+        price_raw = X @ c_vec
+
+        row = t - 1
+        hist["price_raw"][row] = price_raw
+        hist["price_reg"][row] = price_raw + (rho / 2.0) * np.einsum("ij,ij->i", X, X)
+        hist["g"][row] = g_val
+        hist["lam"][row] = lam
+        hist["g_eff"][row] = g_eff
+        hist["viol"][row] = viol
+        hist["cs"][row] = cs
+        hist["dx1"][row] = dx
+        iters_ran[a] = t
+
+        done = (dx[a] < 1e-6) & (viol[a].max(axis=1) < 1e-4) & (cs[a].max(axis=1) < 1e-6)
+        active = a[~done]
+        if active.size == 0:
+            break
+
+    hist = {k: v[:t] for k, v in hist.items()}
+    hist["iters_ran"] = iters_ran
+    return X, lam, hist
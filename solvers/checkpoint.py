@@ -0,0 +1,125 @@
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+from solvers.history import flat_row
+
+# loop state saved in a checkpoint; None entries are stored as empty arrays
+STATE_KEYS = ("xk", "lam", "x_before", "grad_old", "resid_old", "eta", "acc", "last_sign")
+
+
+class HistoryStreamer:
+    """
+    Hook (solvers/hooks.py) that appends history rows to `path` while the
+    loop runs: every `stride`-th iteration (and the last) is buffered and
+    written in chunks of `chunk` rows, appended to a CSV or, for a .parquet
+    path, as one part file per chunk in that directory (a Parquet dataset,
+    so a killed run never leaves a file without its footer;
+    pd.read_parquet reads the directory).
+
+    resume_t: continue an existing file, dropping rows after iteration
+    resume_t (written after the checkpoint being resumed).
+    """
+
+    def __init__(self, path, names, labels=None, chunk=100, stride=1, resume_t=None):
+        self.path = Path(path)
+        self.names = list(names)
+        self.labels = list(labels) if labels is not None else self.names
+        self.chunk = max(1, int(chunk))
+        self.stride = max(1, int(stride))
+        self.parquet = self.path.suffix == ".parquet"
+        self.rows = []
+        self._parts = 0
+        self._header = True
+
+        old = None
+        if resume_t is not None and self.path.exists():
+            import pandas as pd
+
+            old = pd.read_parquet(self.path) if self.parquet else pd.read_csv(self.path)
+            old = old[old["t"] <= resume_t]
+        if self.path.is_dir():
+            shutil.rmtree(self.path)
+        elif self.path.exists():
+            self.path.unlink()
+        if old is not None and len(old):
+            self._write(old)
+
+    def __call__(self, event, payload):
+        if event == "iteration":
+            t = payload["t"]
+            if t % self.stride == 0 or payload.get("last"):
+                self.rows.append(flat_row(t, payload["values"], self.names, self.labels))
+            if len(self.rows) >= self.chunk:
+                self.flush()
+        elif event == "done":
+            self.close()
+
+    def extend(self, rows):
+        """Append already-flat history rows (e.g. streamed by the solver daemon), flushing full chunks."""
+        self.rows += list(rows)
+        if len(self.rows) >= self.chunk:
+            self.flush()
+
+    def _write(self, df):
+        if self.parquet:
+            self.path.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(self.path / f"part-{self._parts:05d}.parquet", index=False)
+            self._parts += 1
+        else:
+            df.to_csv(self.path, mode="a", header=self._header, index=False)
+            self._header = False
+
+    def flush(self):
+        if self.rows:
+            import pandas as pd
+
+            df = pd.DataFrame(self.rows)
+            df["t"] = df["t"].astype(int)
+            self._write(df)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+
+
+class Checkpointer:
+    """
+    Hook that saves the loop state (STATE_KEYS + iteration t) to `path`
+    every `every` iterations and at the end, flushing `streamer` first so
+    the streamed history always reaches the checkpoint. Writes go to a
+    temporary file that is renamed into place.
+    """
+
+    def __init__(self, path, every=50, streamer=None):
+        self.path = Path(path)
+        self.every = max(1, int(every))
+        self.streamer = streamer
+
+    def __call__(self, event, payload):
+        if event == "iteration" and payload["t"] % self.every == 0:
+            self.save(payload["t"], payload["state"])
+        elif event == "done":
+            self.save(payload["hist"].iters_ran, payload["state"], finished=True)
+
+    def save(self, t, state, finished=False):
+        if self.streamer is not None:
+            self.streamer.flush()
+        arrays = {key: np.asarray([] if state.get(key) is None else state[key], float) for key in STATE_KEYS}
+        tmp = self.path.with_name(self.path.name + ".tmp.npz")
+        np.savez(tmp, t=t, finished=finished, **arrays)
+        os.replace(tmp, self.path)
+
+
+def load_checkpoint(path):
+    """
+    The state dict saved by Checkpointer: t, finished (the run ended
+    there) and STATE_KEYS (empty arrays -> None).
+    """
+    with np.load(path) as data:
+        state = {key: (data[key] if data[key].size else None) for key in STATE_KEYS}
+        state["t"] = int(data["t"])
+        state["finished"] = bool(data["finished"])
+    return state
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import socket
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+# Wire protocol of scripts/serve.py: one JSON object per line, both ways.
+#   client -> server   {"op": "solve", "config": {...YAML dict...}, "stream": bool, "stride": int}
+#                      {"op": "stats"} | {"op": "ping"} | {"op": "shutdown"}
+#   server -> client   {"event": "accepted", "job", "worker", "warm"}   warm: map cached on that worker
+#                      {"event": "history", "job", "rows": [...]}         flat history rows (stream=true)
+#                      {"event": "result", "job", "xk", "history", "baseline", "pctl", "totals", "cache", ...}
+#                      {"event": "error", "job", "message", "traceback"}
+#                      {"event": "stats", ...} | {"event": "pong"} | {"event": "bye"}
+DEFAULT_ADDRESS = os.path.join(tempfile.gettempdir(), f"bargaining-{os.getuid()}.sock")
+
+
+def _json_default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode(msg):
+    """One protocol line (numpy scalars / arrays become JSON numbers / lists)."""
+    return (json.dumps(msg, default=_json_default) + "\n").encode()
+
+
+def decode(line):
+    return json.loads(line)
+
+
+def parse_address(address):
+    """('unix', path) or ('tcp', (host, port)) of 'path', 'host:port' or ':port'."""
+    address = str(address)
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return "tcp", (host or "127.0.0.1", int(port))
+    return "unix", address
+
+
+def workspace_key(cfg):
+    """
+    Key of the cached workspace a config runs on: the map (costs, env block
+    incl. walls / prune) and the pctl specs. Runs that differ only in
+    budgets, betas, step sizes or rules share it.
+    """
+    spec = json.dumps([cfg["costs"], cfg["env"], cfg.get("pctl") or []], sort_keys=True, default=str)
+    return hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+
+class WorkspaceCache:
+    """
+    LRU of per-map workspaces held by a daemon worker: the model the loop
+    runs on (grid, product and/or reduction) plus the projectors and
+    baseline problems built for it, each keyed by its own settings.
+    entry() returns the workspace dict, building it on a miss.
+    """
+
+    def __init__(self, size=8):
+        self.size = max(1, int(size))
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def entry(self, key, build):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key], True
+        self.misses += 1
+        ws = build()
+        ws.setdefault("projectors", {})
+        ws.setdefault("baselines", {})
+        self.entries[key] = ws
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return ws, False
+
+    def keys(self):
+        return list(self.entries)
+
+    def stats(self):
+        return {"entries": len(self.entries), "size": self.size, "hits": self.hits, "misses": self.misses}
+
+
+def cached(table, key, build):
+    """table[key], built by build() the first time."""
+    if key not in table:
+        table[key] = build()
+    return table[key]
+
+
+class DaemonClient:
+    """
+    Blocking client of the solver daemon (scripts/serve.py). Each call
+    opens its own connection, so one client can be shared by threads.
+
+        client = DaemonClient()                     # DEFAULT_ADDRESS, or 'host:port'
+        result = client.solve(cfg, on_rows=print)   # history rows arrive while it runs
+        result["history"]                           # HistoryRecorder
+    """
+
+    def __init__(self, address=None, timeout=None):
+        self.address = address or DEFAULT_ADDRESS
+        self.timeout = timeout
+
+    def _connect(self):
+        kind, addr = parse_address(self.address)
+        if kind == "tcp":
+            sock = socket.create_connection(addr, timeout=self.timeout)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(addr)
+        return sock
+
+    def request(self, msg):
+        """Send msg and yield every reply until the final one (result / error / single reply)."""
+        with self._connect() as sock, sock.makefile("rb") as replies:
+            sock.sendall(encode(msg))
+            for line in replies:
+                reply = decode(line)
+                yield reply
+                if reply.get("event") not in ("accepted", "history"):
+                    return
+        raise ConnectionError(f"Solver daemon at {self.address} closed the connection")
+
+    def _one(self, op):
+        return next(self.request({"op": op}))
+
+    def ping(self):
+        """True if a daemon answers at the address."""
+        try:
+            return self._one("ping").get("event") == "pong"
+        except OSError:
+            return False
+
+    def stats(self):
+        return self._one("stats")
+
+    def shutdown(self):
+        return self._one("shutdown")
+
+    def stream(self, cfg, stride=1):
+        """The raw replies of a solve with streamed history (accepted, history..., result)."""
+        return self.request({"op": "solve", "config": cfg, "stream": True, "stride": int(stride)})
+
+    def solve(self, cfg, on_rows=None, stride=1):
+        """
+        Run one config on the daemon. on_rows(rows) gets each batch of flat
+        history rows while the loop runs. Returns the result message with
+        xk as an array and history as a HistoryRecorder; raises
+        RuntimeError with the worker's traceback if the job failed.
+        """
+        from solvers.history import HistoryRecorder
+
+        msgs = self.stream(cfg, stride) if on_rows is not None else \
+            self.request({"op": "solve", "config": cfg, "stream": False, "stride": int(stride)})
+        for msg in msgs:
+            event = msg.get("event")
+            if event == "history":
+                on_rows(msg["rows"])
+            elif event == "error":
+                raise RuntimeError(f"Daemon job {msg.get('job')} failed: {msg['message']}\n"
+                                   f"{msg.get('traceback', '')}")
+            elif event == "result":
+                msg["xk"] = np.asarray(msg["xk"], float)
+                msg["history"] = HistoryRecorder.from_json(msg["history"])
+                return msg
+        raise ConnectionError(f"Solver daemon at {self.address} sent no result")
@@ -0,0 +1,209 @@
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+DIRECT_BACKENDS = ("osqp", "clarabel", "highs")
+
+
+class DirectQP:
+    """
+    Baseline occupancy-measure QP assembled in native sparse form:
+
+      min c^T x + rho/2 ||x||^2  s.t.  A x = b,  G x <= budgets,  x >= 0,  x[goal] = 0
+
+    and handed straight to OSQP, Clarabel or HiGHS (scipy.optimize.linprog),
+    bypassing cvxpy's canonicalization. The OSQP workspace is set up once;
+    new budgets only update the bounds. HiGHS is called through linprog,
+    which has no quadratic term, so it solves the rho = 0 LP and its "obj"
+    is the LP objective c^T x.
+
+    solve() returns the same dict as solve_baseline plus setup_time and
+    solve_time (seconds), or None if the solver reports no solution.
+    """
+
+    def __init__(self, mdp, rho, G, names, backend="osqp", **settings):
+        backend = str(backend).lower()
+        if backend not in DIRECT_BACKENDS:
+            raise ValueError(f"Unknown direct backend {backend!r}; expected one of {list(DIRECT_BACKENDS)}")
+        self.backend = backend
+        self.c = mdp.C[0]
+        self.G = np.asarray(G, float)
+        self.names = list(names)
+        self.rho = float(rho)
+        self.A = sp.csr_matrix(mdp.A)
+        self.b = mdp.b
+        self.settings = settings
+
+        n = mdp.n
+        self.upper_x = np.full(n, np.inf)
+        self.upper_x[mdp.goal_idx] = 0.0
+        self._osqp = None
+
+    # --- OSQP: l <= [A; G; I] x <= u, workspace reused across budgets ---
+    def _solve_osqp(self, budgets):
+        import osqp
+
+        n = len(self.c)
+        m, K = self.A.shape[0], self.G.shape[0]
+        l = np.concatenate([self.b, np.full(K, -np.inf), np.zeros(n)])
+        u = np.concatenate([self.b, budgets, self.upper_x])
+
+        setup_time = 0.0
+        if self._osqp is None:
+            t0 = time.perf_counter()
+            self._osqp = osqp.OSQP()
+            self._osqp.setup(
+                P=self.rho * sp.eye(n, format="csc"),
+                q=self.c,
+                A=sp.vstack([self.A, sp.csr_matrix(self.G), sp.eye(n)]).tocsc(),
+                l=l, u=u,
+                **{"eps_abs": 1e-5, "eps_rel": 1e-5, "max_iter": 10000, "polishing": True,
+                   "verbose": False, **self.settings},
+            )
+            setup_time = time.perf_counter() - t0
+        else:
+            self._osqp.update(l=l, u=u)
+
+        res = self._osqp.solve()
+        ok = res.info.status_val in (osqp.SolverStatus.OSQP_SOLVED, osqp.SolverStatus.OSQP_SOLVED_INACCURATE)
+        return (res.x if ok else None), setup_time, res.info.solve_time
+
+    # --- Clarabel: [A; I_goal; G; -I] x + s = [b; 0; budgets; 0], s in Zero x Nonneg ---
+    def _solve_clarabel(self, budgets):
+        import clarabel
+
+        n = len(self.c)
+        goal_cols = np.flatnonzero(self.upper_x == 0.0)
+        t0 = time.perf_counter()
+        E_goal = sp.csr_matrix((np.ones(len(goal_cols)), (np.arange(len(goal_cols)), goal_cols)),
+                               shape=(len(goal_cols), n))
+        M = sp.vstack([self.A, E_goal, sp.csr_matrix(self.G), -sp.eye(n)]).tocsc()
+        rhs = np.concatenate([self.b, np.zeros(len(goal_cols)), budgets, np.zeros(n)])
+        cones = [clarabel.ZeroConeT(self.A.shape[0] + len(goal_cols)),
+                 clarabel.NonnegativeConeT(self.G.shape[0] + n)]
+        settings = clarabel.DefaultSettings()
+        settings.verbose = False
+        for key, value in self.settings.items():
+            setattr(settings, key, value)
+        solver = clarabel.DefaultSolver(sp.triu(self.rho * sp.eye(n)).tocsc(), self.c, M, rhs, cones, settings)
+        setup_time = time.perf_counter() - t0
+
+        sol = solver.solve()
+        ok = str(sol.status) in ("Solved", "AlmostSolved")
+        return (np.array(sol.x) if ok else None), setup_time, sol.solve_time
+
+    # --- HiGHS via scipy.optimize.linprog (LP, rho ignored) ---
+    def _solve_highs(self, budgets):
+        from scipy.optimize import linprog
+
+        t0 = time.perf_counter()
+        bounds = np.column_stack([np.zeros(len(self.c)), self.upper_x])
+        bounds = [(lo, None if np.isinf(hi) else hi) for lo, hi in bounds]
+        setup_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        res = linprog(self.c, A_ub=self.G, b_ub=budgets, A_eq=self.A, b_eq=self.b,
+                      bounds=bounds, method="highs", options=self.settings or None)
+        return (res.x if res.status == 0 else None), setup_time, time.perf_counter() - t0
+
+    def solve(self, budgets):
+        budgets = np.asarray(budgets, float)
+        x, setup_time, solve_time = getattr(self, f"_solve_{self.backend}")(budgets)
+        if x is None:
+            return None
+        x = np.asarray(x, float).reshape(-1)
+        baseline = {"x": x, "price": float(self.c @ x)}
+        baseline.update({name: float(v) for name, v in zip(self.names, self.G @ x)})
+        # HiGHS solved the rho = 0 LP: report its objective, not the QP's at the LP solution
+        rho = 0.0 if self.backend == "highs" else self.rho
+        baseline["obj"] = float(self.c @ x + (rho / 2.0) * (x @ x))
+        baseline["setup_time"] = setup_time
+        baseline["solve_time"] = solve_time
+        return baseline
+
+
+class MultiplierQP:
+    """
+    Inner problem of the proximal method of multipliers for the bargaining
+    equilibrium lam _|_ (G x - budgets - beta*lam) <= 0, x minimizing the
+    Lagrangian c^T x + rho/2 ||x||^2 + lam^T G x over X:
+
+      (x+, lam+) = saddle point of
+        c^T x + rho/2 ||x||^2 + lam^T (G x - budgets) - beta/2 ||lam||^2
+        + ||x - x_k||^2 / (2 alpha) - ||lam - lam_k||^2 / (2 mu)
+
+    over x in X, lam >= 0. Maximizing out lam leaves one QP in (x, z),
+    a = beta + 1/mu:
+
+      min c^T x + rho/2 ||x||^2 + ||x - x_k||^2 / (2 alpha) + sum_k z_k^2 / (2 a_k)
+      s.t. A x = b,  x >= 0,  x[goal] = 0,  z >= 0,  G x - z <= budgets - lam_k/mu
+
+    with lam+ = z / a. The proximal x term keeps the inner QP well
+    conditioned when rho is tiny. It is solved to tolerance on one OSQP
+    workspace: new (x_k, lam_k) only move q and the bounds (warm start
+    from the last solution), new steps only rescale the diagonal of P.
+    """
+
+    def __init__(self, mdp, rho, G, budgets, betas, eps_abs=1e-7, eps_rel=1e-7, max_iter=20000,
+                 polishing=True, batch=None, **settings):
+        # batch: OSQPProjector's batching mode (shared projection_opts); one QP here, so unused
+        self.G = sp.csr_matrix(np.asarray(G, float))
+        self.budgets = np.asarray(budgets, float)
+        self.betas = np.asarray(betas, float)
+        self.rho = float(rho)
+        n, K = mdp.n, self.G.shape[0]
+        self.n, self.K = n, K
+
+        upper_x = np.full(n, np.inf)
+        upper_x[mdp.goal_idx] = 0.0
+        m = mdp.A.shape[0]
+        self.M = sp.vstack([
+            sp.hstack([sp.csr_matrix(mdp.A), sp.csr_matrix((m, K))]),
+            sp.hstack([self.G, -sp.eye(K)]),
+            sp.eye(n + K),
+        ]).tocsc()
+        self.l = np.concatenate([mdp.b, np.full(K, -np.inf), np.zeros(n + K)])
+        self.u = np.concatenate([mdp.b, self.budgets, upper_x, np.full(K, np.inf)])
+        self.c = mdp.C[0]
+        self.q = np.concatenate([self.c, np.zeros(K)])
+        self.settings = {"eps_abs": eps_abs, "eps_rel": eps_rel, "max_iter": max_iter,
+                         "polishing": polishing, "verbose": False, **settings}
+        self.solver = None
+        self.steps = None
+        self.info = None
+
+    def _P_diag(self, alpha, mu):
+        return np.concatenate([np.full(self.n, self.rho + 1.0 / alpha), 1.0 / (self.betas + 1.0 / mu)])
+
+    def solve(self, x, lam, alpha, mu):
+        """(x+, lam+) from (x, lam) with primal step alpha and dual steps mu (length K)."""
+        import osqp
+
+        mu = np.broadcast_to(np.asarray(mu, float), (self.K,))
+        steps = np.concatenate([[alpha], mu])
+        self.q[:self.n] = self.c - x / alpha
+        self.u[-self.K - self.n - self.K:-self.n - self.K] = self.budgets - lam / mu
+        if self.solver is None:
+            self.solver = osqp.OSQP()
+            self.solver.setup(P=sp.diags(self._P_diag(alpha, mu)).tocsc(), q=self.q, A=self.M,
+                              l=self.l, u=self.u, **self.settings)
+        else:
+            if not np.array_equal(steps, self.steps):
+                self.solver.update(Px=self._P_diag(alpha, mu))
+            self.solver.update(q=self.q, u=self.u)
+        self.steps = steps
+
+        res = self.solver.solve()
+        self.info = res.info
+        if res.info.status_val not in (osqp.SolverStatus.OSQP_SOLVED, osqp.SolverStatus.OSQP_SOLVED_INACCURATE):
+            raise RuntimeError(f"OSQP multiplier step failed: {res.info.status}")
+        x, z = res.x[:self.n], np.maximum(0.0, res.x[self.n:])
+        return np.array(x), z / (self.betas + 1.0 / mu)
+
+    def stats(self):
+        """{setup_time, solve_time, iters, status} of the last solve (as Projector.stats)."""
+        info = self.info
+        solve_time = info.solve_time + info.polish_time
+        return {"setup_time": info.run_time - solve_time, "solve_time": solve_time,
+                "iters": info.iter, "status": info.status}
@@ -0,0 +1,134 @@
+import time
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+from models.indexing import N_ACTIONS, sa_id
+
+
+def goal_states(mdp):
+    """Absorbing goal state ids: goal_states of a ProductMDP, [goal_state] of a CompiledMDP."""
+    return np.atleast_1d(getattr(mdp, "goal_states", getattr(mdp, "goal_state", None)))
+
+
+def bellman_q(mdp, cost, V):
+    """
+    Q[s, a] = cost(s, a) + sum_s' P(s' | s, a) V[s'], as an (S, A) array.
+    Successor id n_states (the exit column of a ReducedMDP) has value 0.
+    """
+    EV = (mdp.prob * np.append(V, 0.0)[mdp.succ]).sum(axis=1)
+    return (np.asarray(cost, float) + EV).reshape(-1, N_ACTIONS)
+
+
+def value_iteration(mdp, cost, V0=None, tol=1e-10, max_iter=100000):
+    """
+    Vectorized value iteration for the stochastic shortest path with
+    per-(s, a) cost vector `cost` (e.g. c + lamE*e + lamT*t). V = 0 on the
+    goal state(s).
+
+    Started from V0 = 0 it needs every cycle that avoids the goal to have
+    positive cost; policy_iteration handles zero-cost cycles.
+    Returns (V, policy) with policy the greedy action index per state.
+    """
+    g = goal_states(mdp)
+    V = np.zeros(mdp.n_states) if V0 is None else np.array(V0, float)
+    V[g] = 0.0
+    for _ in range(max_iter):
+        Q = bellman_q(mdp, cost, V)
+        V_new = Q.min(axis=1)
+        V_new[g] = 0.0
+        done = np.abs(V_new - V).max() < tol
+        V = V_new
+        if done:
+            break
+    return V, bellman_q(mdp, cost, V).argmin(axis=1)
+
+
+def policy_matrix(mdp, policy):
+    """Sparse P_pi[s, s'] over all states for a deterministic policy (goal rows empty)."""
+    S = mdp.n_states
+    g = goal_states(mdp)
+    sa = sa_id(np.arange(S), policy)
+    sa = np.delete(sa, g)
+    succ, prob = mdp.succ[sa], mdp.prob[sa]
+    rows = np.repeat(np.delete(np.arange(S), g), succ.shape[1])
+    keep = (prob.ravel() > 0.0) & (succ.ravel() < S)   # moves to a ReducedMDP's exit leave the system
+    return sp.csr_matrix((prob.ravel()[keep], (rows[keep], succ.ravel()[keep])), shape=(S, S))
+
+
+def _non_goal_system(mdp, policy):
+    """I - P_pi restricted to the non-goal states (transient part)."""
+    keep = np.delete(np.arange(mdp.n_states), goal_states(mdp))
+    P_pi = policy_matrix(mdp, policy)[keep][:, keep]
+    return sp.identity(len(keep), format="csc") - P_pi.tocsc(), keep
+
+
+def evaluate_policy(mdp, cost, policy):
+    """V_pi from (I - P_pi) V = c_pi on the non-goal states (sparse solve)."""
+    M, keep = _non_goal_system(mdp, policy)
+    c_pi = np.asarray(cost, float).reshape(-1, N_ACTIONS)[np.arange(len(policy)), policy]
+    V = np.zeros(len(policy))
+    V[keep] = spla.spsolve(M, c_pi[keep])
+    return V
+
+
+def policy_iteration(mdp, cost, policy0=None, max_iter=1000, tol=1e-12):
+    """
+    Howard policy iteration; ties keep the current action, so a proper
+    policy0 stays proper even with zero-cost cycles. policy0 defaults to
+    the minimum-expected-steps policy (value iteration on unit cost).
+    Returns (V, policy).
+    """
+    if policy0 is None:
+        _, policy0 = value_iteration(mdp, np.ones(mdp.n))
+    policy = np.array(policy0, int)
+    rows = np.arange(len(policy))
+    for _ in range(max_iter):
+        V = evaluate_policy(mdp, cost, policy)
+        Q = bellman_q(mdp, cost, V)
+        best = Q.argmin(axis=1)
+        improve = Q[rows, best] < Q[rows, policy] - tol * (1.0 + np.abs(V))
+        if not improve.any():
+            break
+        policy = np.where(improve, best, policy)
+    return V, policy
+
+
+def occupancy_from_policy(mdp, policy, b=None):
+    """
+    Occupancy measure x (length S*A) of a deterministic policy: the state
+    visits solve (I - P_pi^T) x_s = b on the non-goal states and all of
+    x_s sits on the chosen action. b defaults to mdp.b (start state).
+    """
+    M, keep = _non_goal_system(mdp, policy)
+    x_s = spla.spsolve(M.T.tocsc(), mdp.b if b is None else b)
+    x = np.zeros(mdp.n)
+    x[sa_id(keep, np.asarray(policy)[keep])] = x_s
+    return x
+
+
+class DPOracle:
+    """
+    Linear minimization oracle over the occupancy polytope:
+    solve(cost) = argmin_{x in X} cost^T x, by policy iteration warm-started
+    from the previous call's policy. Returns the occupancy x; V and policy
+    of the last call are kept on the object.
+    """
+
+    def __init__(self, mdp):
+        self.mdp = mdp
+        self.policy = None
+        self.V = None
+        self.wall = 0.0
+
+    def solve(self, cost, b=None):
+        t0 = time.perf_counter()
+        self.V, self.policy = policy_iteration(self.mdp, cost, policy0=self.policy)
+        x = occupancy_from_policy(self.mdp, self.policy, b=b)
+        self.wall = time.perf_counter() - t0
+        return x
+
+    def stats(self):
+        """Projector.stats-style summary of the last solve (no iteration count)."""
+        return {"setup_time": 0.0, "solve_time": self.wall, "iters": np.nan, "status": "solved"}
@@ -0,0 +1,75 @@
+import numpy as np
+
+# primal-dual update rules selectable from the YAML solver block
+PRIMAL_RULES = ("gd", "optimistic", "extragradient", "nesterov", "multipliers", "dp")
+DUAL_RULES = ("fixed", "adagrad", "backtracking")
+DUAL_RESIDUALS = ("prev", "current")
+
+
+def check_rules(primal_rule, dual_rule, dual_residual, alpha=None):
+    for value, allowed, what in ((primal_rule, PRIMAL_RULES, "primal_rule"),
+                                 (dual_rule, DUAL_RULES, "dual_rule"),
+                                 (dual_residual, DUAL_RESIDUALS, "dual_residual")):
+        if value not in allowed:
+            raise ValueError(f"Unknown {what} {value!r}; expected one of {list(allowed)}")
+    # dp steps are convex combinations of occupancies: alpha caps the step at a fraction
+    if primal_rule == "dp" and alpha is not None and not 0.0 < alpha <= 1.0:
+        raise ValueError(f"primal_rule 'dp' needs 0 < alpha <= 1 (the largest step), got {alpha}")
+
+
+def dp_step(alpha, t):
+    """Conditional-gradient step of iteration t >= 1: min(alpha, 2 / (t + 1)), i.e. 2/(k+2) from k = 0."""
+    return min(alpha, 2.0 / (t + 1.0))
+
+
+class DualStepSize:
+    """
+    Per-constraint dual step sizes eta (length K).
+
+    fixed:        eta = eta0
+    adagrad:      eta = eta0 / sqrt(eps + sum_t r_t^2); the residual scale
+                  cancels, so eta0 is a step on lam itself and needs to be
+                  far larger than a fixed eta. On configs/toy_3x3.yaml: eta0
+                  0.02 (the shipped etas) has not converged after 5000
+                  iterations, 0.2 converges in 1235 (1006 with slip 0.2), 0.5
+                  in 1181 (296), against 1267 (834) for fixed 0.02
+    backtracking: grow eta by `grow` while the residual keeps its sign, cut
+                  it by `shrink` when it flips (the dual overshot); kept in
+                  [eta0 * min_scale, eta0 * max_scale]
+
+    update(r) returns the step for residual r and advances the state; eta
+    is the last step used (for look-ahead steps such as extragradient).
+    """
+
+    def __init__(self, rule, etas, eps=1e-8, grow=1.2, shrink=0.5, min_scale=1e-3, max_scale=1e3):
+        self.rule = rule
+        self.eta0 = np.array(etas, float)
+        self.eta = self.eta0.copy()
+        self.eps = eps
+        self.grow = grow
+        self.shrink = shrink
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.acc = np.zeros_like(self.eta0)
+        self.last_sign = None
+
+    def restore(self, state):
+        """Continue from a checkpointed state (eta, acc, last_sign; missing keys keep their value)."""
+        if state.get("eta") is not None:
+            self.eta = np.array(state["eta"], float)
+        if state.get("acc") is not None:
+            self.acc = np.array(state["acc"], float)
+        self.last_sign = state.get("last_sign")
+
+    def update(self, r):
+        if self.rule == "adagrad":
+            self.acc += r**2
+            self.eta = self.eta0 / np.sqrt(self.eps + self.acc)
+        elif self.rule == "backtracking":
+            sign = np.sign(r)
+            if self.last_sign is not None:
+                flipped = sign * self.last_sign < 0
+                self.eta = np.where(flipped, self.eta * self.shrink, self.eta * self.grow)
+                self.eta = np.clip(self.eta, self.eta0 * self.min_scale, self.eta0 * self.max_scale)
+            self.last_sign = sign
+        return self.eta
@@ -0,0 +1,192 @@
+import numpy as np
+
+# scalar columns (n,) and per-constraint columns (n, K)
+SCALAR_KEYS = ("t", "price_raw", "price_reg", "reg_term", "dx1")
+CONSTRAINT_KEYS = ("g", "lam", "g_eff", "g_prev", "g_eff_prev", "resid_prev", "resid", "viol", "cs")
+# optional per-iteration instrumentation (timing=True); times in seconds
+TIMING_KEYS = ("wall_time", "setup_time", "solve_time", "solver_iters", "solver_status", "diag_time", "log_time")
+
+# legacy flat column names, {name}: constraint value name, {label}: short label
+FLAT_NAMES = {
+    "g": "{name}",
+    "lam": "lam{label}",
+    "g_eff": "{label}_eff",
+    "g_prev": "{name}_prev",
+    "g_eff_prev": "{label}_eff_prev",
+    "resid_prev": "resid{label}_prev",
+    "resid": "resid{label}",
+    "viol": "viol{label}",
+    "cs": "cs{label}",
+}
+
+
+def flat_row(t, values, names, labels):
+    """{legacy column name: value} of one iteration's values, in history.csv order."""
+    row = {"t": t}
+    for key in ("price_raw", "price_reg", "reg_term"):
+        if key in values:
+            row[key] = values[key]
+    for key in CONSTRAINT_KEYS:
+        if key in values:
+            for name, label, v in zip(names, labels, values[key]):
+                row[FLAT_NAMES[key].format(name=name, label=label)] = v
+    for key in ("dx1",) + TIMING_KEYS:
+        if key in values:
+            row[key] = values[key]
+    return row
+
+
+class HistoryRecorder:
+    """
+    Columnar per-iteration history of the bargaining loop.
+
+    One preallocated array per metric, filled every `stride` iterations
+    (the last iteration is always kept) and trimmed by finish(). `metrics`
+    selects a subset of SCALAR_KEYS + CONSTRAINT_KEYS ("t" is always kept).
+    Columns are read natively (hist["lam"] -> (n, K)) or by their flat
+    legacy name (hist["lamE"] -> (n,)). timing=True adds the TIMING_KEYS
+    columns (solver_status holds strings).
+    """
+
+    def __init__(self, iters, names, labels=None, stride=1, metrics=None, timing=False):
+        self.names = list(names)
+        self.labels = list(labels) if labels is not None else self.names
+        self.stride = max(1, int(stride))
+        K = len(self.names)
+
+        keys = SCALAR_KEYS + CONSTRAINT_KEYS if metrics is None else ("t",) + tuple(metrics)
+        unknown = set(keys) - set(SCALAR_KEYS + CONSTRAINT_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown history metrics {sorted(unknown)}")
+        if timing:
+            keys = tuple(keys) + TIMING_KEYS
+
+        capacity = iters // self.stride + 1
+        self.columns = {
+            key: np.full((capacity, K) if key in CONSTRAINT_KEYS else capacity, np.nan)
+            for key in SCALAR_KEYS + CONSTRAINT_KEYS + TIMING_KEYS if key in keys
+        }
+        if timing:
+            self.columns["solver_status"] = np.full(capacity, None, dtype=object)
+        # totals over every iteration (not only the kept rows)
+        self.timing_totals = {key: 0.0 for key in TIMING_KEYS if timing and key != "solver_status"}
+        self.n = 0
+        self.iters_ran = 0
+        self.solver_time = 0.0     # seconds spent in primal solves (projections)
+        self.baseline_time = 0.0   # seconds spent building + solving the baseline
+        self.status = None         # converged | iters | diverged, set by the loop
+
+        flat = {}
+        for key in CONSTRAINT_KEYS:
+            for k, (name, label) in enumerate(zip(self.names, self.labels)):
+                flat[FLAT_NAMES[key].format(name=name, label=label)] = (key, k)
+        self._flat = flat
+
+    def record(self, t, last=False, **values):
+        """Store the values for iteration t if it falls on the stride (or last=True)."""
+        self.iters_ran = t
+        self._add_totals(values)
+        if t % self.stride and not last:
+            return
+        if self.n and self.columns["t"][self.n - 1] == t:
+            return
+        row = self.n
+        self.columns["t"][row] = t
+        for key, col in self.columns.items():
+            if key in values:
+                col[row] = values[key]
+        self.n += 1
+
+    def _add_totals(self, values):
+        for key in self.timing_totals:
+            value = values.get(key)
+            if value is not None and not np.isnan(value):
+                self.timing_totals[key] += value
+
+    def add_timing(self, t, **values):
+        """Late timing values for iteration t (e.g. log_time): added to the totals and its row, if kept."""
+        self._add_totals(values)
+        if self.n and self.columns["t"][self.n - 1] == t:
+            for key, value in values.items():
+                if key in self.columns:
+                    self.columns[key][self.n - 1] = value
+
+    def timing_summary(self):
+        """Solver / baseline wall time and the timing column totals over all iterations."""
+        out = {"solver_time": self.solver_time, "baseline_time": self.baseline_time}
+        out.update({f"{key}_total": value for key, value in self.timing_totals.items()})
+        return out
+
+    def finish(self):
+        """Trim the columns to the recorded rows."""
+        self.columns = {key: col[:self.n] for key, col in self.columns.items()}
+        return self
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, key):
+        return key in self.columns or (key in self._flat and self._flat[key][0] in self.columns)
+
+    def __getitem__(self, key):
+        if key in self.columns:
+            return self.columns[key][:self.n]
+        if key in self._flat:
+            native, k = self._flat[key]
+            return self.columns[native][:self.n, k]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def last(self, key):
+        """Last recorded value of a column (NaN if empty or not recorded)."""
+        if key == "solver_status":
+            return self[key][-1] if self.n and key in self else None
+        return float(self[key][-1]) if self.n and key in self else float("nan")
+
+    def flat_columns(self):
+        """{legacy column name: (n,) array} of the recorded metrics, in history.csv order."""
+        keys = ["t", "price_raw", "price_reg", "reg_term"]
+        for key in CONSTRAINT_KEYS:
+            keys += [FLAT_NAMES[key].format(name=name, label=label)
+                     for name, label in zip(self.names, self.labels)]
+        keys.append("dx1")
+        keys += list(TIMING_KEYS)
+        return {key: self[key] for key in keys if key in self}
+
+    def to_json(self):
+        """The recorded history as a JSON-safe dict (NaN stays float NaN); see from_json."""
+        return {
+            "names": self.names, "labels": self.labels, "stride": self.stride,
+            "iters_ran": self.iters_ran, "status": self.status, "solver_time": self.solver_time, "baseline_time": self.baseline_time,
+            "timing_totals": self.timing_totals,
+            "columns": {key: col[:self.n].tolist() for key, col in self.columns.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """A finished recorder rebuilt from to_json() output (e.g. sent by the solver daemon)."""
+        columns = data["columns"]
+        hist = cls(0, data["names"], data["labels"], stride=data["stride"],
+                   metrics=[key for key in columns if key in SCALAR_KEYS + CONSTRAINT_KEYS and key != "t"])
+        K = len(hist.names)
+        hist.columns = {
+            key: (np.array(col, dtype=object) if key == "solver_status" else
+                  np.array(col, dtype=float).reshape((-1, K) if key in CONSTRAINT_KEYS else -1))
+            for key, col in columns.items()
+        }
+        hist.n = len(columns["t"])
+        hist.iters_ran = data["iters_ran"]
+        hist.status = data.get("status")
+        hist.solver_time = data["solver_time"]
+        hist.baseline_time = data["baseline_time"]
+        hist.timing_totals = dict(data["timing_totals"])
+        return hist
+
+    def to_frame(self):
+        import pandas as pd
+
+        df = pd.DataFrame(self.flat_columns())
+        df["t"] = df["t"].astype(int)
+        return df
@@ -0,0 +1,37 @@
+import importlib
+
+# events emitted by bargaining_loop, each with a payload dict:
+#   "baseline"   {"baseline", "time"}
+#   "iteration"  {"t", "values", "hist", "last", "state"}   values: everything recorded
+#                for t (+ timings); state: loop state (xk, lam, ... see solvers/checkpoint.py)
+#   "done"       {"hist", "xk", "converged", "status", "state"}
+HOOK_EVENTS = ("baseline", "iteration", "done")
+
+
+def load_hook(spec):
+    """A hook callable from 'package.module:function' (or the callable itself)."""
+    if callable(spec):
+        return spec
+    module, _, attr = str(spec).partition(":")
+    if not attr:
+        raise ValueError(f"Hook {spec!r} must look like 'package.module:function'")
+    return getattr(importlib.import_module(module), attr)
+
+
+def load_hooks(specs):
+    return [load_hook(spec) for spec in (specs or [])]
+
+
+def emit(hooks, event, **payload):
+    """Call hook(event, payload) for every subscribed hook."""
+    for hook in hooks:
+        hook(event, payload)
+
+
+def accumulate_stats(acc, stats):
+    """Add one solve's Projector.stats() into the iteration totals acc."""
+    for key in ("setup_time", "solve_time", "iters"):
+        if stats.get(key) is not None:
+            acc[key] = acc.get(key, 0.0) + stats[key]
+    if "status" in stats:
+        acc["status"] = stats["status"]
@@ -1,185 +1,445 @@
+import time
+
 import numpy as np
-import cvxpy as cp
 
-from models.indexing import build_sa_index
-from models.costs import build_cost_vectors
-from models.flow import build_flow_A_b
-from envs.gridworld import ACTIONS
+from models.mdp import compile_mdp
+from solvers.direct import DirectQP, MultiplierQP
+from solvers.dp import DPOracle
+from solvers.dynamics import DualStepSize, check_rules, dp_step
+from solvers.history import HistoryRecorder
+from solvers.hooks import accumulate_stats, emit, load_hooks
+from solvers.projection import make_projector
 
+# |lam| beyond this counts as divergence (the loop stops with status "diverged")
+LAM_LIMIT = 1e12
 
 
-def projected_primal_dual_loop(
-    price_grid, energy_grid, time_grid, start, goal,
-    slip=0.2,
-    Emax=3.0,
-    Tmax=3.0,
-    betaE=5.0,
-    betaT=5.0,
+def build_baseline_problem(mdp, rho, G=None, names=None, backend="cvxpy"):
+    """
+    Hard-constrained baseline QP  min c^T x + rho/2 ||x||^2  s.t. G x <= budgets,
+    with the budgets as a cvxpy Parameter, so re-solving for new budgets
+    skips canonicalization. G defaults to the constraint rows of mdp.C.
+    Any backend other than "cvxpy" (osqp, clarabel, highs) returns a
+    DirectQP that calls the solver on native sparse data.
+    """
+    c_vec = mdp.C[0]
+    if G is None:
+        G, names = mdp.C[1:], mdp.cost_names[1:]
+    if backend != "cvxpy":
+        return DirectQP(mdp, rho, G, names, backend=backend)
+    import cvxpy as cp
+
+    x = cp.Variable(mdp.n, nonneg=True)
+    budgets = cp.Parameter(G.shape[0])
+    prob = cp.Problem(
+        cp.Minimize(c_vec @ x + (rho/2)*cp.sum_squares(x)),
+        [mdp.A @ x == mdp.b, G @ x <= budgets] + ([x[mdp.goal_idx] == 0] if len(mdp.goal_idx) else [])
+    )
+    return {"prob": prob, "x": x, "budgets": budgets, "c": c_vec, "G": G, "names": list(names)}
+
+
+def solve_baseline(base, budgets, solver="OSQP"):
+    """
+    Solve the baseline for the given budgets; None if infeasible or not solved.
+    setup_time covers canonicalization and solver setup, solve_time the solver.
+    """
+    if isinstance(base, DirectQP):
+        return base.solve(budgets)
+
+    base["budgets"].value = np.asarray(budgets, float)
+    prob_base, x_base = base["prob"], base["x"]
+    t0 = time.perf_counter()
+    prob_base.solve(solver=solver, warm_start=True)   # budgets are a Parameter: no re-canonicalization
+    wall = time.perf_counter() - t0
+    if prob_base.status in ("optimal", "optimal_inaccurate") and x_base.value is not None:
+        x = np.array(x_base.value).reshape(-1)
+        baseline = {"x": x, "price": float(base["c"] @ x)}
+        baseline.update({name: float(v) for name, v in zip(base["names"], base["G"] @ x)})
+        baseline["obj"] = prob_base.value
+        solve_time = prob_base.solver_stats.solve_time or 0.0
+        baseline["setup_time"] = wall - solve_time
+        baseline["solve_time"] = solve_time
+        return baseline
+    return None
+
+
+def bargaining_loop(
+    mdp, budgets, betas, etas,
+    G=None,
+    names=None,
+    labels=None,
     rho=1e-2,
     alpha=0.02,
-    etaE=0.02,
-    etaT=0.02,
     iters=200,
-    lamE0=0.0,
-    lamT0=0.0,
-    solver=cp.OSQP,
+    lam0=None,
+    solver="OSQP",
     verbose_every=10,
+    projection="cvxpy",
+    projection_opts=None,
+    baseline_backend="cvxpy",
+    baseline_problem=None,
+    projector=None,
+    history_stride=1,
+    history_metrics=None,
+    primal_rule="gd",
+    dual_rule="fixed",
+    dual_residual="prev",
+    momentum=0.1,
+    timing=False,
+    hooks=None,
+    resume=None,
+    x0=None,
+    z0=None,
 ):
     """
+    Counterfactual bargaining with K linear constraints G x <= budgets
+    (G defaults to mdp.C[1:]); budgets, betas, etas and lam0 are length K.
+
     Primal step: projected gradient on x over X={x>=0, Ax=b}
-      grad_x L = c + rho*x + lambda*e   (since e^T x is linear)
-      y = x - alpha * grad
-      x <- argmin_{x in X} ||x - y||^2   (projection)
-    Dual step:
-      lambda <- [lambda + eta*(e^T x - (Emax + beta*lambda))]_+
+      y = x - alpha * (c + rho*x + G^T lam)
+      x <- argmin_{x in X} ||x - y||^2   (projection, see solvers/projection.py)
+    Dual step (paper-style, previous iterate):
+      lam <- [lam + eta*(G x_prev - (budgets + beta*lam))]_+
+
+    Update rules (solvers/dynamics.py):
+      primal_rule   gd | optimistic (2*grad_t - grad_{t-1}, same on the duals)
+                    | extragradient (look-ahead half step, two projections)
+                    | nesterov (gradient step from x + momentum*(x - x_prev); the
+                      momentum is dropped for one step when the step goes
+                      uphill, (y - x_new).(x_new - x) > 0. On configs/toy_3x3.yaml
+                      (alpha 0.02) gd converges in 1267 iterations and nesterov in
+                      1143 / 1275 / 1593 / 12701 at momentum 0.1 / 0.2 / 0.3 / 0.5;
+                      with slip 0.2, 834 vs 852 at 0.1. Neither converges at alpha 0.2)
+                    | multipliers (exact proximal method of multipliers, see
+                      solvers/direct.py:MultiplierQP; alpha and eta are the
+                      proximal steps, projection_opts also set its OSQP
+                      tolerances, dual_residual unused)
+                    | dp (conditional gradient x <- x + gamma_t*(x_dp - x), x_dp the
+                      policy-iteration best response to the linearized Lagrangian,
+                      solvers/dp.py; no projection; gamma_t = min(alpha, 2/(t+1))
+                      diminishes, so 0 < alpha <= 1 only caps the early steps)
+      dual_rule     fixed | adagrad | backtracking  (step sizes eta)
+      dual_residual prev (paper-style: x before the primal step) | current
+
+    Returns (hist, xk, baseline); hist is a HistoryRecorder keeping every
+    history_stride-th iteration (and the last) of history_metrics (all if None),
+    with hist.solver_time the total wall time of the primal solves and
+    hist.baseline_time that of the baseline build + solve. hist.status is
+    "converged", "iters" (ran out of iterations) or "diverged": a primal
+    solve failed or x / lam stopped being finite or exceeded LAM_LIMIT at
+    iteration t; the loop then stops and returns the history and iterate
+    of t - 1 instead of raising.
+
+    timing=True adds per-iteration wall_time, solver setup/solve time,
+    iteration count and status, diagnostics and logging time to the history
+    (solvers/history.py:TIMING_KEYS). hooks are callables (or
+    'module:function' strings) called as hook(event, payload) on the
+    "baseline", "iteration" and "done" events (solvers/hooks.py); the
+    "iteration" and "done" payloads carry the loop state, which
+    solvers/checkpoint.py saves. resume (load_checkpoint's dict) restarts
+    the loop after iteration resume["t"] from that state and runs up to
+    iters (also after a finished run); hist then only holds the iterations
+    run now.
+
+    x0 (a feasible occupancy, e.g. a neighbouring run's final xk) replaces
+    the projection of 0 as the starting iterate, and z0 warm-starts the
+    projector's duals on the first projection (continuation, see
+    solvers/sweep.py).
     """
-
-    price_grid = np.asarray(price_grid, float)
-    energy_grid = np.asarray(energy_grid, float)
-    n_rows, n_cols = price_grid.shape
-
-    states, sa_list, sa_idx = build_sa_index(n_rows, n_cols)
-    goal_idx = [sa_idx[(goal, a)] for a in ACTIONS]
-    c_vec, e_vec, t_vec = build_cost_vectors(price_grid, energy_grid, time_grid, start, goal, n_rows, n_cols, sa_list, slip = slip)
-    A, b = build_flow_A_b(n_rows, n_cols, start, goal, slip, sa_list, sa_idx)
-
-    n = len(sa_list)
+    c_vec = mdp.C[0]
+    if G is None:
+        G, names = mdp.C[1:], mdp.cost_names[1:]
+    K = G.shape[0]
+    names = list(names) if names is not None else [f"g{k}" for k in range(K)]
+    labels = list(labels) if labels is not None else names
+
+    budgets = np.broadcast_to(np.asarray(budgets, float), (K,))
+    betas = np.broadcast_to(np.asarray(betas, float), (K,))
+    etas = np.broadcast_to(np.asarray(etas, float), (K,))
+    lam = np.zeros(K) if lam0 is None else np.array(np.broadcast_to(lam0, (K,)), float)
+    check_rules(primal_rule, dual_rule, dual_residual, alpha=alpha)
+    step_size = DualStepSize(dual_rule, etas)
 
     # Initialize x by projecting 0 onto Ax=b, x>=0 (gives a feasible occupancy)
-    x = cp.Variable(n, nonneg=True)
-    y_param = cp.Parameter(n)
-    proj_prob = cp.Problem(cp.Minimize(cp.sum_squares(x - y_param)), [A @ x == b, x[goal_idx] == 0])
-
-    # Start at y=0 projection
-    y_param.value = np.zeros(n)
-    proj_prob.solve(solver=solver)
-    xk = np.array(x.value).reshape(-1)
-
-    lamE = float(lamE0)
-    lamT = float(lamT0)
-    hist = []
+    if projector is None:
+        projector = make_projector(projection, mdp.A, mdp.b, mdp.goal_idx, solver=solver,
+                                   **(projection_opts or {}))
+    xk = projector.project(np.zeros(mdp.n)) if x0 is None else np.array(x0, float)
+    t_start = 0
+    if resume is not None:
+        t_start = resume["t"]   # a finished run continues too, if iters is now larger than t
+        xk, lam = np.array(resume["xk"], float), np.array(resume["lam"], float)
+        step_size.restore(resume)
+
+    hooks = load_hooks(hooks)
+    hist = HistoryRecorder(iters, names, labels, stride=history_stride, metrics=history_metrics,
+                           timing=timing)
 
     # baseline hard constraint solve
-    x_base = cp.Variable(n, nonneg=True)
-    prob_base = cp.Problem(
-        cp.Minimize(c_vec @ x_base + (rho/2)*cp.sum_squares(x_base)),
-        [A @ x_base == b, e_vec @ x_base <= Emax, t_vec @ x_base <= Tmax,x_base[goal_idx] == 0  ]
-    )
-    prob_base.solve(solver=solver)
-    baseline = None
-    if prob_base.status in ("optimal", "optimal_inaccurate") and x_base.value is not None:
-        baseline = {
-            "x": np.array(x_base.value).reshape(-1),
-            "price": float(c_vec @ x_base.value),
-            "energy": float(e_vec @ x_base.value),
-            "time": float(t_vec @ x_base.value),
-            "obj": prob_base.value,
-        }
+    t0 = time.perf_counter()
+    if baseline_problem is None:
+        baseline_problem = build_baseline_problem(mdp, rho, G=G, names=names, backend=baseline_backend)
+    baseline = solve_baseline(baseline_problem, budgets, solver=solver)
+    hist.baseline_time = time.perf_counter() - t0
+    emit(hooks, "baseline", baseline=baseline, time=hist.baseline_time)
+    if verbose_every and baseline is not None:
         print("Baseline objective:", baseline["obj"])
-        print("Baseline energy:", baseline["energy"])
-        print("Baseline time:", baseline["time"])
-    else:
+        for name in names:
+            print(f"Baseline {name}:", baseline[name])
+        print(f"Baseline setup/solve time: {baseline['setup_time']:.4f}s / {baseline['solve_time']:.4f}s")
+    elif verbose_every:
         print("Baseline infeasible or not solved.")
 
-    for t in range(1, iters + 1):
-        x_prev = xk.copy()  # <-- save previous x for dx
-        # gradient of L wrt x: c + rho*x + lam*e
-        grad = c_vec + rho * xk + lamE * e_vec + lamT * t_vec
+    if primal_rule == "multipliers":
+        inner = MultiplierQP(mdp, rho, G, budgets, betas, **(projection_opts or {}))
+    elif primal_rule == "dp":
+        oracle = DPOracle(mdp)
+
+    it_stats = {}   # solver stats summed over the current iteration's solves
+
+    def timed(source, solve, *args, **kwargs):
+        t0 = time.perf_counter()
+        out = solve(*args, **kwargs)
+        hist.solver_time += time.perf_counter() - t0
+        if timing:
+            accumulate_stats(it_stats, source.stats())
+        return out
+
+    z_seed = [z0]   # dual warm start for the first projection only
+
+    def project(y, x0):
+        z, z_seed[0] = z_seed[0], None
+        return timed(projector, projector.project, y, x0=x0, z0=z)
+
+    g = G @ xk
+    x_before = xk       # nesterov: iterate before xk
+    grad_old = None     # optimistic: last primal gradient
+    resid_old = None    # optimistic: last dual residual
+    if resume is not None:
+        x_before = xk if resume.get("x_before") is None else np.array(resume["x_before"], float)
+        grad_old, resid_old = resume.get("grad_old"), resume.get("resid_old")
+
+    def state():
+        return {"xk": xk, "lam": lam, "x_before": x_before, "grad_old": grad_old, "resid_old": resid_old,
+                "eta": step_size.eta, "acc": step_size.acc, "last_sign": step_size.last_sign}
+
+    t = hist.iters_ran = t_start
+    converged = False
+    status = "iters"
+    for t in range(t_start + 1, iters + 1):
+        t_iter = time.perf_counter()
+        it_stats.clear()
+        x_prev, g_prev, lam_prev = xk, g, lam
+        restart = False
+        g_eff_prev = budgets + betas * lam      # s^{t-1} = beta*lam^{t-1}
+
+        try:
+            if primal_rule == "extragradient":
+                # look-ahead point (x_half, lam_half), then step from x with its gradients
+                x_half = project(xk - alpha * (c_vec + rho * xk + lam @ G), x0=xk)
+                g_look = g_prev if dual_residual == "prev" else G @ x_half
+                lam_half = np.maximum(0.0, lam + step_size.eta * (g_look - g_eff_prev))
+                xk = project(xk - alpha * (c_vec + rho * x_half + lam_half @ G), x0=x_half)
+                g_prev = G @ x_half if dual_residual == "prev" else G @ xk
+                g_eff_prev = budgets + betas * lam_half
+            elif primal_rule == "multipliers":
+                # inner QP solved to tolerance; it returns the next multipliers too
+                xk, lam_next = timed(inner, inner.solve, xk, lam, alpha, step_size.eta)
+                g_prev = G @ xk
+            elif primal_rule == "dp":
+                x_dp = timed(oracle, oracle.solve, c_vec + rho * xk + lam @ G)
+                xk = xk + dp_step(alpha, t) * (x_dp - xk)
+                if dual_residual == "current":
+                    g_prev = G @ xk
+            else:
+                point = xk + momentum * (xk - x_before) if primal_rule == "nesterov" else xk
+                grad = c_vec + rho * point + lam @ G
+                step = grad
+                if primal_rule == "optimistic":
+                    step = 2.0 * grad - (grad if grad_old is None else grad_old)
+                    grad_old = grad
+                xk = project(point - alpha * step, x0=xk)
+                if dual_residual == "current":
+                    g_prev = G @ xk
+                # gradient restart: drop the momentum once the step goes uphill
+                restart = primal_rule == "nesterov" and (point - xk) @ (xk - x_prev) > 0.0
+            x_before = xk if restart else x_prev
+
+            # dual update; dual_residual="prev" uses the point that drove the primal step (paper-style)
+            resid_prev = g_prev - g_eff_prev
+            direction = resid_prev
+            if primal_rule == "optimistic":
+                direction = 2.0 * resid_prev - (resid_prev if resid_old is None else resid_old)
+                resid_old = resid_prev
+            if primal_rule == "multipliers":
+                step_size.update(resid_prev)
+                lam = lam_next
+            else:
+                lam = np.maximum(0.0, lam + step_size.update(resid_prev) * direction)
+        except RuntimeError as exc:   # a projection / inner solve failed: the iterates blew up
+            failure = str(exc)
+        else:
+            failure = None if np.isfinite(xk).all() and np.abs(lam).max(initial=0.0) < LAM_LIMIT else \
+                "iterates blew up"
+        if failure is not None:
+            status = "diverged"
+            if verbose_every:
+                print(f"Diverged at t={t}: {failure}; returning the history up to t={t - 1}")
+            xk, lam, t = x_prev, lam_prev, t - 1   # the last finite iterate
+            break
 
-        # primal step + projection
-        y = xk - alpha * grad
-        y_param.value = y
-        proj_prob.solve(solver=solver)
-        xk = np.array(x.value).reshape(-1)
+        # derived quantities, one vectorized pass over the K constraints
+        t_diag = time.perf_counter()
+        g = G @ xk
+        g_eff = budgets + betas * lam
+        resid = g - g_eff
+        viol = np.maximum(0.0, resid)
+        cs = np.abs(lam * resid)
+        dx = np.abs(xk - x_prev).sum()
 
-        # --- diagnostics on current xk (optional) ---
         price_raw = float(c_vec @ xk)
-        price_reg = float(c_vec @ xk + (rho / 2.0) * (xk @ xk))
-        energy = float(e_vec @ xk)  # current energy (for logging)
-        time = float(t_vec @ xk)
-
-        lamE_old, lamT_old = lamE, lamT
-
-        # --- paper-style dual update uses x_prev ---
-        energy_prev = float(e_vec @ x_prev)      # f1(x^{t-1}) part
-        E_eff_prev  = Emax + betaE * lamE_old          # s^{t-1} = beta*lambda^{t-1}
-        residE_prev  = energy_prev - E_eff_prev
-
-
-        time_prev = float(t_vec @ x_prev)
-        T_eff_prev  = Tmax + betaT * lamT_old
-        residT_prev = time_prev   - T_eff_prev
-
-        lamE = max(0.0, lamE_old + etaE * residE_prev)
-        lamT = max(0.0, lamT_old + etaT * residT_prev)
-        # ---- derived quantities (for logging & plots) ----
-        energy      = float(e_vec @ xk)
-        time_used = float(t_vec @ xk)
-        price_raw  = float(c_vec @ xk)
-        reg_term   = (rho / 2.0) * float(xk @ xk)
-        price_reg  = price_raw + reg_term
-
-        E_eff = Emax + betaE * lamE
-        T_eff = Tmax + betaT * lamT
-
-        slack      = E_eff - Emax
-        residE = energy    - E_eff
-        residT = time_used - T_eff
-
-        violE = max(0.0, residE)
-        violT = max(0.0, residT)
-
-        csE = abs(lamE * residE)
-        csT = abs(lamT * residT)
-        dx         = np.linalg.norm(xk - x_prev, 1)
-
-
-        # # convergence metrics
-        # r_cur    = float(e_vec @ xk) - (Emax + beta * lam)
-        # viol_cur = max(0.0, r_cur)
-        # cs       = abs(lam * r_cur)
-        dx       = np.linalg.norm(xk - x_prev, 1)
-
-
-        hist.append({
-    "t": t,
-
-    # primal values
-    "price_raw": price_raw,
-    "price_reg": price_reg,
-    "reg_term": reg_term,
-    "energy": energy,
-    "time": time_used,
-
-    "lamE": lamE,
-    "lamT": lamT,
-    "E_eff": E_eff,
-    "T_eff": T_eff,
-    "energy_prev": energy_prev,
-    "time_prev": time_prev,
-    "E_eff_prev": E_eff_prev,
-    "T_eff_prev": T_eff_prev,
-    "residE_prev": residE_prev,
-    "residT_prev": residT_prev,
-    "residE": residE,
-    "residT": residT,
-    "violE": violE,
-    "violT": violT,
-    "csE": csE,
-    "csT": csT,
-
-    # convergence
-    "dx1": dx,
-        })
-        if dx < 1e-6 and max(violE, violT) < 1e-4 and max(csE, csT) < 1e-6:
-            print(f"Converged at t={t}: violE={violE:.2e}, violT={violT:.2e}, "
-                  f"csE={csE:.2e}, csT={csT:.2e}, dx={dx:.2e}, lamE={lamE:.4f}, lamT={lamT:.4f}")
+        reg_term = (rho / 2.0) * float(xk @ xk)
+
+        converged = dx < 1e-6 and viol.max() < 1e-4 and cs.max() < 1e-6
+        values = dict(
+            price_raw=price_raw, price_reg=price_raw + reg_term, reg_term=reg_term,
+            g=g, lam=lam, g_eff=g_eff, g_prev=g_prev, g_eff_prev=g_eff_prev,
+            resid_prev=resid_prev, resid=resid, viol=viol, cs=cs, dx1=dx,
+        )
+        if timing:
+            now = time.perf_counter()
+            values.update(wall_time=now - t_iter, diag_time=now - t_diag,
+                          setup_time=it_stats.get("setup_time", np.nan),
+                          solve_time=it_stats.get("solve_time", np.nan),
+                          solver_iters=it_stats.get("iters", np.nan), solver_status=it_stats.get("status"))
+        last = converged or t == iters
+        hist.record(t, last=last, **values)
+        if hooks:
+            emit(hooks, "iteration", t=t, values=values, hist=hist, last=last, state=state())
+
+        t_log = time.perf_counter()
+        if converged:
+            if verbose_every:
+                print(f"Converged at t={t}: "
+                      + "".join(f"viol{lb}={v:.2e}, " for lb, v in zip(labels, viol))
+                      + "".join(f"cs{lb}={v:.2e}, " for lb, v in zip(labels, cs))
+                      + f"dx={dx:.2e}"
+                      + "".join(f", lam{lb}={v:.4f}" for lb, v in zip(labels, lam)))
+        elif verbose_every and (t % verbose_every == 0 or t == 1):
+            print(f"t={t:03d} "
+                  + "".join(f"lam{lb}={v:8.4f} " for lb, v in zip(labels, lam))
+                  + "".join(f"{lb}_prev={gp:8.4f} {lb}eff_prev={ge:8.4f} r{lb}_prev={r:+9.4f} "
+                            for lb, gp, ge, r in zip(labels, g_prev, g_eff_prev, resid_prev))
+                  + f"price_reg={price_raw + reg_term:8.4f}")
+        if timing:
+            hist.add_timing(t, log_time=time.perf_counter() - t_log)
+        if converged:
+            status = "converged"
             break
 
-        if verbose_every and (t % verbose_every == 0 or t == 1):
-                print(f"t={t:03d} lamE={lamE:8.4f} lamT={lamT:8.4f} "
-                          f"E_prev={energy_prev:8.4f} Eeff_prev={E_eff_prev:8.4f} rE_prev={residE_prev:+9.4f} "
-                          f"T_prev={time_prev:8.4f} Teff_prev={T_eff_prev:8.4f} rT_prev={residT_prev:+9.4f} "
-                          f"price_reg={price_reg:8.4f}")
+    if verbose_every:
+        print(f"Primal solver time: {hist.solver_time:.4f}s over {t} iterations")
+    hist.status = status
+    hist.finish()
+    emit(hooks, "done", hist=hist, xk=xk, converged=converged, status=status, state=state())
+    return hist, xk, baseline
+
+
+def projected_primal_dual_loop(
+    price_grid, energy_grid, time_grid, start, goal,
+    slip=0.2,
+    Emax=3.0,
+    Tmax=3.0,
+    betaE=5.0,
+    betaT=5.0,
+    rho=1e-2,
+    alpha=0.02,
+    etaE=0.02,
+    etaT=0.02,
+    iters=200,
+    lamE0=0.0,
+    lamT0=0.0,
+    solver="OSQP",
+    verbose_every=10,
+    projection="cvxpy",
+    projection_opts=None,
+    baseline_backend="cvxpy",
+    mdp=None,
+    baseline_problem=None,
+    projector=None,
+    history_stride=1,
+    history_metrics=None,
+    primal_rule="gd",
+    dual_rule="fixed",
+    dual_residual="prev",
+    momentum=0.1,
+    timing=False,
+    hooks=None,
+    resume=None,
+    x0=None,
+    z0=None,
+    extra_constraints=None,
+):
+    """
+    Energy/time (two-constraint) front end of bargaining_loop:
+      grad_x L = c + rho*x + lamE*e + lamT*t
+      lambda <- [lambda + eta*(e^T x_prev - (Emax + beta*lambda))]_+
+
+    mdp / baseline_problem / projector can be passed in to reuse a compiled
+    map and its solver workspaces across runs (sweeps); the grids, start,
+    goal and slip are then ignored. Flat history columns keep their legacy
+    names (energy, lamE, residT_prev, ...).
+
+    extra_constraints = {"G", "budgets", "betas", "etas", "names", "labels"}
+    appends more bargained rows after energy and time, e.g. the PCTL
+    probability rows of a models/product.py:ProductMDP passed as mdp.
+    """
+
+    if mdp is None:
+        mdp = compile_mdp(price_grid, energy_grid, time_grid, start, goal, slip)
+    names, labels = ["energy", "time"], ["E", "T"]
+    G, budgets, betas, etas = mdp.C[1:], [Emax, Tmax], [betaE, betaT], [etaE, etaT]
+    lam0 = [lamE0, lamT0]
+    if extra_constraints is not None:
+        ex = extra_constraints
+        K = len(ex["names"])
+        G = np.vstack([G, ex["G"]])
+        budgets = budgets + list(np.broadcast_to(ex["budgets"], (K,)))
+        betas = betas + list(np.broadcast_to(ex["betas"], (K,)))
+        etas = etas + list(np.broadcast_to(ex["etas"], (K,)))
+        names, labels = names + list(ex["names"]), labels + list(ex.get("labels", ex["names"]))
+        lam0 = lam0 + [0.0] * K
+
+    hist, xk, baseline = bargaining_loop(
+        mdp,
+        budgets=budgets,
+        betas=betas,
+        etas=etas,
+        G=G,
+        names=names,
+        labels=labels,
+        rho=rho,
+        alpha=alpha,
+        iters=iters,
+        lam0=lam0,
+        solver=solver,
+        verbose_every=verbose_every,
+        projection=projection,
+        projection_opts=projection_opts,
+        baseline_backend=baseline_backend,
+        baseline_problem=baseline_problem,
+        projector=projector,
+        history_stride=history_stride,
+        history_metrics=history_metrics,
+        primal_rule=primal_rule,
+        dual_rule=dual_rule,
+        dual_residual=dual_residual,
+        momentum=momentum,
+        timing=timing,
+        hooks=hooks,
+        resume=resume,
+        x0=x0,
+        z0=z0,
+    )
 
-    return hist, xk, (states, sa_list, sa_idx), baseline
\ No newline at end of file
+    return hist, xk, (mdp.states, mdp.sa_list, mdp.sa_idx), baseline
@@ -0,0 +1,266 @@
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class Projector(ABC):
+    """
+    Euclidean projection onto X = {x >= 0, Ax = b, x[fixed_zero] = 0}.
+
+    Subclasses implement project(y, x0=None, b=None, z0=None); b overrides
+    the flow right-hand side (e.g. another start state) without rebuilding
+    anything, and z0 is a solver dual warm start (ignored if unsupported).
+    After each call self.z holds the solver's duals (None if unsupported)
+    and stats() describes the last solve.
+    """
+
+    z = None
+
+    @abstractmethod
+    def project(self, y, x0=None, b=None, z0=None):
+        ...
+
+    def stats(self):
+        """{setup_time, solve_time, iters, status} of the last project() call."""
+        return {}
+
+    def project_batch(self, Y, X0=None, B=None, Z=None):
+        """
+        Project each row of Y (N, n). This fallback solves the rows one by
+        one on the same workspace; OSQPProjector overrides it with a single
+        stacked solve. If Z (N, n_duals) is given, row i warm-starts from
+        Z[i] and Z[i] is overwritten with its new duals, so interleaved
+        instances keep their own warm starts.
+        """
+        Y = np.atleast_2d(Y)
+        X = np.empty_like(Y, dtype=float)
+        for i in range(Y.shape[0]):
+            X[i] = self.project(Y[i],
+                                x0=None if X0 is None else X0[i],
+                                b=None if B is None else B[i],
+                                z0=None if Z is None else Z[i])
+            if Z is not None and self.z is not None:
+                Z[i] = self.z
+        return X
+
+
+class CvxpyProjector(Projector):
+    """The original formulation, solved through cvxpy's problem pipeline."""
+
+    def __init__(self, A, b, fixed_zero, solver="OSQP"):
+        import cvxpy as cp
+
+        n = A.shape[1]
+        self.solver = solver
+        self.b0 = np.asarray(b, float)
+        self.x = cp.Variable(n, nonneg=True)
+        self.y = cp.Parameter(n)
+        self.b = cp.Parameter(A.shape[0], value=self.b0)
+        self.prob = cp.Problem(cp.Minimize(cp.sum_squares(self.x - self.y)),
+                               [A @ self.x == self.b] + ([self.x[fixed_zero] == 0] if len(fixed_zero) else []))
+        self.wall = 0.0
+
+    def project(self, y, x0=None, b=None, z0=None):
+        import cvxpy as cp
+
+        self.y.value = y
+        self.b.value = self.b0 if b is None else b
+        t0 = time.perf_counter()
+        try:
+            self.prob.solve(solver=self.solver)
+        except cp.error.SolverError as exc:
+            raise RuntimeError(f"cvxpy projection failed: {exc}") from exc
+        self.wall = time.perf_counter() - t0
+        if self.x.value is None:
+            raise RuntimeError(f"cvxpy projection failed: {self.prob.status}")
+        return np.array(self.x.value).reshape(-1)
+
+    def stats(self):
+        # setup = canonicalization / parameter refill + solver setup
+        st = self.prob.solver_stats
+        solve_time = st.solve_time or 0.0
+        return {"setup_time": self.wall - solve_time, "solve_time": solve_time,
+                "iters": st.num_iters, "status": self.prob.status}
+
+
+class OSQPProjector(Projector):
+    """
+    Same projection on a persistent low-level OSQP workspace.
+
+    min ||x - y||^2  s.t.  [A; I] x in [b; 0] .. [b; u],  u = 0 on fixed_zero
+    P and the constraint matrix never change, so the KKT system is factorized
+    once in setup(); each project() call only updates q = -2y (and the bounds
+    if b changes) and starts from the previous solution (or from x0).
+
+    project_batch() stacks N projections into one block-diagonal problem
+    (P = 2I, constraints diag([A; I], ..., [A; I])) solved in a single OSQP
+    call; its workspace is set up once per batch size N (the last
+    BATCH_WORKSPACES sizes are kept). The block runs until its slowest row
+    converges (one ADMM iteration count and step size for all rows), so
+    batch="auto" times it against per-row warm-started solves for each N
+    and uses the faster, retiming the other every BATCH_RETIME calls;
+    "block" / "rows" force one.
+    """
+
+    BATCH_WORKSPACES = 4
+    BATCH_MODES = ("auto", "block", "rows")
+    BATCH_RETIME = 20
+
+    def __init__(self, A, b, fixed_zero, eps_abs=1e-5, eps_rel=1e-5, max_iter=10000, polishing=True,
+                 batch="auto", **settings):
+        import osqp
+
+        if batch not in self.BATCH_MODES:
+            raise ValueError(f"Unknown batch mode {batch!r}; expected one of {list(self.BATCH_MODES)}")
+        n = A.shape[1]
+        upper = np.full(n, np.inf)
+        upper[fixed_zero] = 0.0
+
+        self.n = n
+        self.n_duals = A.shape[0] + n
+        self.b0 = np.asarray(b, float)
+        self.b_cur = self.b0
+        self.lower_x = np.zeros(n)
+        self.upper_x = upper
+        self.M = sp.vstack([sp.csr_matrix(A), sp.eye(n)]).tocsc()
+        self.settings = dict(eps_abs=eps_abs, eps_rel=eps_rel, max_iter=max_iter, polishing=polishing,
+                             verbose=False, **settings)
+        self.solver = osqp.OSQP()
+        self.solver.setup(
+            P=2.0 * sp.eye(n, format="csc"),
+            q=np.zeros(n),
+            A=self.M,
+            l=np.concatenate([self.b0, self.lower_x]),
+            u=np.concatenate([self.b0, self.upper_x]),
+            **self.settings,
+        )
+        self.info = None
+        self.batch = batch
+        self._batches = OrderedDict()   # N -> [OSQP workspace, its current (N, m) flow rhs]
+        self._batch_times = {}          # N -> {"block", "rows": average seconds, "calls"} (batch="auto")
+        self._solved = (osqp.SolverStatus.OSQP_SOLVED, osqp.SolverStatus.OSQP_SOLVED_INACCURATE)
+
+    def project(self, y, x0=None, b=None, z0=None):
+        b = self.b0 if b is None else np.asarray(b, float)
+        if b is not self.b_cur and not np.array_equal(b, self.b_cur):
+            self.solver.update(l=np.concatenate([b, self.lower_x]), u=np.concatenate([b, self.upper_x]))
+        self.b_cur = b
+
+        self.solver.update(q=-2.0 * np.asarray(y, float))
+        if x0 is not None or z0 is not None:
+            self.solver.warm_start(x=x0, y=z0)
+        res = self.solver.solve()
+        self.info = res.info
+        self.z = res.y
+        if res.info.status_val not in self._solved:
+            raise RuntimeError(f"OSQP projection failed: {res.info.status}")
+        return np.array(res.x).reshape(-1)
+
+    def _batch_workspace(self, N):
+        """OSQP workspace of the N-block problem, set up (and factorized) on first use."""
+        if N in self._batches:
+            self._batches.move_to_end(N)
+            return self._batches[N]
+        import osqp
+
+        solver = osqp.OSQP()
+        solver.setup(
+            P=2.0 * sp.eye(N * self.n, format="csc"),
+            q=np.zeros(N * self.n),
+            A=sp.block_diag([self.M] * N, format="csc"),
+            l=np.tile(np.concatenate([self.b0, self.lower_x]), N),
+            u=np.tile(np.concatenate([self.b0, self.upper_x]), N),
+            **self.settings,
+        )
+        ws = self._batches[N] = [solver, np.broadcast_to(self.b0, (N, self.b0.size))]
+        while len(self._batches) > self.BATCH_WORKSPACES:
+            self._batches.popitem(last=False)
+        return ws
+
+    def _batch_mode(self, N):
+        """'block' or 'rows' for a batch of N: the forced mode, an untimed one, or the faster so far."""
+        if self.batch != "auto":
+            return self.batch
+        times = self._batch_times.setdefault(N, {"block": None, "rows": None, "calls": 0})
+        times["calls"] += 1
+        for mode in ("block", "rows"):
+            if times[mode] is None:
+                return mode
+        faster, slower = sorted(("block", "rows"), key=times.get)
+        # the cost of both changes as the iterates settle: retime the slower one now and then
+        return slower if times["calls"] % self.BATCH_RETIME == 0 else faster
+
+    def project_batch(self, Y, X0=None, B=None, Z=None):
+        """
+        Project the N rows of Y (N, n), in one solve of the block-diagonal
+        problem or row by row on the single workspace (see batch). B (N, m)
+        gives per-row flow right-hand sides, X0 / Z (N, n) / (N, n_duals)
+        per-row primal / dual warm starts; Z is overwritten with the new
+        duals. Without them the workspace starts from its previous
+        solution, as project() does.
+        """
+        Y = np.atleast_2d(np.asarray(Y, float))
+        N = Y.shape[0]
+        mode = self._batch_mode(N)
+        if mode == "rows":
+            t0 = time.perf_counter()
+            X = super().project_batch(Y, X0=X0, B=B, Z=Z)
+            self._record_batch(N, mode, time.perf_counter() - t0)
+            return X
+
+        ws = self._batch_workspace(N)
+        solver, b_cur = ws
+        t0 = time.perf_counter()
+
+        B = np.broadcast_to(self.b0, b_cur.shape) if B is None else np.asarray(B, float)
+        if B is not b_cur and not np.array_equal(B, b_cur):
+            lower = np.broadcast_to(self.lower_x, (N, self.n))
+            upper = np.broadcast_to(self.upper_x, (N, self.n))
+            solver.update(l=np.hstack([B, lower]).ravel(), u=np.hstack([B, upper]).ravel())
+            ws[1] = B
+
+        solver.update(q=-2.0 * Y.ravel())
+        if X0 is not None or Z is not None:
+            solver.warm_start(x=None if X0 is None else np.asarray(X0, float).ravel(),
+                              y=None if Z is None else np.asarray(Z, float).ravel())
+        res = solver.solve()
+        self.info = res.info
+        self.z = None
+        if res.info.status_val not in self._solved:
+            raise RuntimeError(f"OSQP batch projection failed: {res.info.status}")
+        if Z is not None:
+            Z[...] = res.y.reshape(N, self.n_duals)
+        self._record_batch(N, mode, time.perf_counter() - t0)
+        return np.array(res.x).reshape(N, self.n)
+
+    def _record_batch(self, N, mode, seconds):
+        """Fold a timed batch solve into the mode's moving average (batch="auto")."""
+        if self.batch == "auto":
+            times = self._batch_times[N]
+            times[mode] = seconds if times[mode] is None else 0.5 * (times[mode] + seconds)
+
+    def stats(self):
+        # run_time = (setup on the first call | data update) + solve + polish
+        info = self.info
+        solve_time = info.solve_time + info.polish_time
+        return {"setup_time": info.run_time - solve_time, "solve_time": solve_time,
+                "iters": info.iter, "status": info.status}
+
+
+PROJECTORS = {
+    "cvxpy": CvxpyProjector,
+    "osqp": OSQPProjector,
+}
+
+
+def make_projector(name, A, b, fixed_zero, solver="OSQP", **opts):
+    """Build a projector by its YAML name ('cvxpy' or 'osqp')."""
+    key = str(name).lower()
+    if key not in PROJECTORS:
+        raise ValueError(f"Unknown projection backend {name!r}; expected one of {sorted(PROJECTORS)}")
+    if key == "cvxpy":
+        return CvxpyProjector(A, b, fixed_zero, solver=solver)
+    return PROJECTORS[key](A, b, fixed_zero, **opts)
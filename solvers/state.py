@@ -0,0 +1,79 @@
+import numpy as np
+
+from solvers.primal_dual import build_baseline_problem, projected_primal_dual_loop
+from solvers.projection import make_projector
+
+
+class SolverState:
+    """
+    A compiled map plus the solver workspaces built on it, kept between
+    re-solves while the map is edited a little at a time:
+
+        state = SolverState(mdp, **loop_params)      # projected_primal_dual_loop kwargs
+        hist, xk, meta, baseline = state.solve()
+        state.update_costs({"price": {(2, 3): 9.0}})  # patches a few cost columns
+        state.update_budgets(Emax=8.0)                # baseline: Parameter update, warm start
+        hist, xk, meta, baseline = state.solve()      # warm from the previous solution
+
+    What each update invalidates:
+      costs     baseline problem (c / G are its data); projector and iterate stay
+      budgets   nothing: the baseline's budgets are a cvxpy Parameter (or the
+                DirectQP rhs), so it is re-solved without canonicalization
+      dynamics  (slip / goal) projector, baseline and the warm start: A, b changed
+    solve() starts from the last xk, multipliers and projector duals
+    (as sweep continuation does) unless warm=False or they were invalidated.
+    """
+
+    def __init__(self, mdp, **params):
+        self.mdp = mdp
+        self.params = dict(params)
+        self.projector = None
+        self.baseline_problem = None
+        self.x = self.z = self.lam = None
+        self.solves = 0
+
+    def update_costs(self, edits):
+        """Apply {cost name: {(r, c): value}} edits (see CompiledMDP.with_costs)."""
+        self.mdp = self.mdp.with_costs(edits)
+        self.baseline_problem = None
+        return self
+
+    def update_dynamics(self, slip=None, goal=None):
+        """Move the goal and/or change the slip (see CompiledMDP.with_dynamics)."""
+        mdp = self.mdp.with_dynamics(slip=slip, goal=goal)
+        if mdp is not self.mdp:
+            self.mdp = mdp
+            self.projector = self.baseline_problem = None
+            self.x = self.z = self.lam = None
+        return self
+
+    def update_budgets(self, Emax=None, Tmax=None):
+        if Emax is not None:
+            self.params["Emax"] = float(Emax)
+        if Tmax is not None:
+            self.params["Tmax"] = float(Tmax)
+        return self
+
+    def solve(self, warm=True, **overrides):
+        """projected_primal_dual_loop on the current map, reusing the cached workspaces."""
+        kwargs = {**self.params, **overrides}
+        mdp = self.mdp
+        if self.projector is None:
+            self.projector = make_projector(kwargs.get("projection", "cvxpy"), mdp.A, mdp.b, mdp.goal_idx,
+                                            solver=kwargs.get("solver", "OSQP"),
+                                            **(kwargs.get("projection_opts") or {}))
+        if self.baseline_problem is None:
+            self.baseline_problem = build_baseline_problem(mdp, kwargs.get("rho", 1e-6),
+                                                           backend=kwargs.get("baseline_backend", "cvxpy"))
+        if warm and self.lam is not None:
+            kwargs.update(lamE0=self.lam[0], lamT0=self.lam[1], x0=self.x, z0=self.z)
+
+        hist, xk, meta, baseline = projected_primal_dual_loop(
+            None, None, None, mdp.start, mdp.goal,
+            mdp=mdp, projector=self.projector, baseline_problem=self.baseline_problem, **kwargs,
+        )
+        self.x = xk
+        self.lam = (hist.last("lamE"), hist.last("lamT"))
+        self.z = None if self.projector.z is None else np.array(self.projector.z)
+        self.solves += 1
+        return hist, xk, meta, baseline
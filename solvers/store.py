@@ -0,0 +1,184 @@
+import fcntl
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+# scalar columns of a run row: parameters (filterable) and final values
+PARAM_COLUMNS = {
+    "Emax": pa.float64(), "Tmax": pa.float64(), "betaE": pa.float64(), "betaT": pa.float64(),
+    "rho": pa.float64(), "alpha": pa.float64(), "etaE": pa.float64(), "etaT": pa.float64(),
+    "slip": pa.float64(), "iters": pa.int64(), "n_rows": pa.int64(), "n_cols": pa.int64(),
+    "primal_rule": pa.string(), "dual_rule": pa.string(), "projection": pa.string(),
+}
+FINAL_COLUMNS = ("iters_ran", "price_raw", "energy", "time", "lamE", "lamT", "all_in", "wall_time")
+
+SCHEMA = pa.schema(
+    [("run_id", pa.string()), ("experiment_name", pa.string()), ("created", pa.float64())]
+    + list(PARAM_COLUMNS.items())
+    + [(key, pa.int64() if key == "iters_ran" else pa.float64()) for key in FINAL_COLUMNS]
+    + [("config", pa.string()), ("summary", pa.string()),
+       ("xk", pa.list_(pa.float64())), ("history", pa.binary())]
+)
+# columns runs() returns (everything but the per-run payloads)
+SCALAR_COLUMNS = tuple(name for name in SCHEMA.names if name not in ("config", "summary", "xk", "history"))
+
+
+def _history_bytes(history):
+    """A history (HistoryRecorder or DataFrame) as an Arrow IPC stream, stored in one binary cell."""
+    df = history.to_frame() if hasattr(history, "to_frame") else history
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class ResultsStore:
+    """
+    Append-only results file: an Arrow IPC stream of runs, one record
+    batch (row) per run holding its parameters, final values, config and
+    summary (JSON), final xk and full history (a nested IPC stream).
+
+    append() writes a single record batch at the end of the file under an
+    exclusive lock, so sweep workers can share one store; a batch cut off
+    by a crash is dropped by the next append. Reads memory-map the file:
+    runs() filters on the scalar columns, and xk() / history() of a run
+    are zero-copy views into the mapping.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    # --- writing ---
+    def append(self, params, summary=None, config=None, xk=None, history=None, experiment_name="",
+               run_id=None):
+        """Add one run; params / summary supply the PARAM_COLUMNS / FINAL_COLUMNS. Returns its run_id."""
+        run_id = run_id or uuid.uuid4().hex[:12]
+        summary = summary or {}
+        row = {"run_id": run_id, "experiment_name": experiment_name, "created": time.time()}
+        row.update({key: params.get(key) for key in PARAM_COLUMNS})
+        final = summary.get("final") or {}
+        row.update({key: summary.get(key, final.get(key)) for key in FINAL_COLUMNS})
+        row["config"] = json.dumps(config, default=str) if config is not None else None
+        row["summary"] = json.dumps(summary, default=str)
+        row["xk"] = None if xk is None else np.asarray(xk, float)
+        row["history"] = None if history is None else _history_bytes(history)
+        batch = pa.RecordBatch.from_pylist([row], schema=SCHEMA)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                end = self._valid_end(f)
+                f.truncate(end)
+                f.seek(end)
+                if end == 0:
+                    f.write(SCHEMA.serialize())
+                f.write(batch.serialize())
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return run_id
+
+    def _valid_end(self, f):
+        """Byte offset just past the last complete record batch (0 for an empty file)."""
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return 0
+        f.seek(0)
+        try:
+            reader = ipc.open_stream(f)
+        except (OSError, pa.ArrowInvalid):
+            return 0   # cut inside the schema: the first append never finished
+        end = f.tell()
+        try:
+            while True:
+                reader.read_next_batch()
+                end = f.tell()
+        except StopIteration:
+            pass
+        except (OSError, pa.ArrowInvalid):
+            pass   # truncated tail batch (cut in its body or in its metadata)
+        return end
+
+    # --- reading ---
+    def table(self):
+        """All runs as a pyarrow Table backed by the memory-mapped file."""
+        if not self.path.exists():
+            return SCHEMA.empty_table()
+        try:
+            reader = ipc.open_stream(pa.memory_map(str(self.path), "r"))
+        except (OSError, pa.ArrowInvalid):
+            return SCHEMA.empty_table()   # empty, or cut inside the schema
+        batches = []
+        try:
+            while True:
+                batches.append(reader.read_next_batch())
+        except StopIteration:
+            pass
+        except (OSError, pa.ArrowInvalid):
+            pass   # truncated tail batch (a crashed or in-progress append)
+        return pa.Table.from_batches(batches, schema=SCHEMA)
+
+    @staticmethod
+    def _mask(table, where):
+        mask = None
+        for key, cond in where.items():
+            if key not in SCALAR_COLUMNS:
+                raise ValueError(f"Cannot filter on {key!r}; columns: {list(SCALAR_COLUMNS)}")
+            col = table[key]
+            if isinstance(cond, tuple):
+                m = pc.and_(pc.greater_equal(col, cond[0]), pc.less_equal(col, cond[1]))
+            elif isinstance(cond, list):
+                m = pc.is_in(col, value_set=pa.array(cond, type=col.type))
+            else:
+                m = pc.equal(col, cond)
+            mask = m if mask is None else pc.and_(mask, m)
+        return mask
+
+    def select(self, **where):
+        """
+        Runs matching every condition, as a Table: key=value, key=[values]
+        (any of) or key=(lo, hi) (inclusive range) on the scalar columns.
+        """
+        table = self.table()
+        mask = self._mask(table, where)
+        return table if mask is None else table.filter(mask)
+
+    def runs(self, **where):
+        """Scalar columns of the matching runs as a DataFrame (see select)."""
+        return self.select(**where).select(list(SCALAR_COLUMNS)).to_pandas()
+
+    def _row(self, run_id):
+        """The run's row as a one-row slice of the mapped table (latest if run_id repeats)."""
+        table = self.table()
+        hits = pc.indices_nonzero(self._mask(table, {"run_id": run_id}))
+        if len(hits) == 0:
+            raise KeyError(f"No run {run_id!r} in {self.path}")
+        return table.slice(hits[-1].as_py(), 1)
+
+    def xk(self, run_id):
+        """Final occupancy of a run (read-only view into the mapping)."""
+        cell = self._row(run_id)["xk"].chunk(0)
+        return cell.flatten().to_numpy(zero_copy_only=True)
+
+    def history(self, run_id):
+        """History of a run as a DataFrame (history.csv columns)."""
+        cell = self._row(run_id)["history"][0]
+        if not cell.is_valid:
+            raise KeyError(f"Run {run_id!r} has no stored history")
+        return ipc.open_stream(cell.as_buffer()).read_all().to_pandas()
+
+    def config(self, run_id):
+        return json.loads(self._row(run_id)["config"][0].as_py() or "null")
+
+    def summary(self, run_id):
+        return json.loads(self._row(run_id)["summary"][0].as_py())
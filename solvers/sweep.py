@@ -0,0 +1,241 @@
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from solvers.batched import batched_primal_dual_loop
+from solvers.primal_dual import build_baseline_problem, projected_primal_dual_loop, solve_baseline
+from solvers.projection import make_projector
+
+# loop parameters that may vary between sweep points ("eta" sets etaE and etaT)
+SWEEP_KEYS = ("Emax", "Tmax", "betaE", "betaT", "etaE", "etaT", "eta", "alpha", "lamE0", "lamT0")
+
+# parameters that fix a run's multipliers: continuation carries lam only between points equal in these
+LAM_KEYS = ("Emax", "Tmax", "betaE", "betaT")
+
+FINAL_KEYS = ("price_raw", "price_reg", "energy", "time", "lamE", "lamT",
+              "E_eff", "T_eff", "violE", "violT", "csE", "csT", "dx1")
+
+
+def expand_grid(grid):
+    """Cartesian product of a {param: value or [values]} dict -> list of points."""
+    unknown = set(grid) - set(SWEEP_KEYS)
+    if unknown:
+        raise ValueError(f"Cannot sweep over {sorted(unknown)}; allowed: {list(SWEEP_KEYS)}")
+
+    keys = list(grid)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+    points = []
+    for combo in itertools.product(*values):
+        point = dict(zip(keys, (float(v) for v in combo)))
+        if "eta" in point:
+            eta = point.pop("eta")
+            point.setdefault("etaE", eta)
+            point.setdefault("etaT", eta)
+        points.append(point)
+    return points
+
+
+# per-process state: the compiled MDP and its solver workspaces, built once
+_WORKER = {}
+
+
+def _init_worker(mdp, params, store=None):
+    _WORKER["mdp"] = mdp
+    _WORKER["params"] = params
+    _WORKER["store"] = store
+    _WORKER["baseline_problem"] = build_baseline_problem(mdp, params["rho"],
+                                                         backend=params.get("baseline_backend", "cvxpy"))
+    _WORKER["projector"] = make_projector(params.get("projection", "cvxpy"), mdp.A, mdp.b, mdp.goal_idx,
+                                          solver=params["solver"], **(params.get("projection_opts") or {}))
+
+
+def order_points(points):
+    """
+    Continuation order of sweep points: sorted by the swept keys in
+    boustrophedon (snake) order, so consecutive points differ in as few
+    parameters, by as little, as the grid allows. Returns the permutation
+    (list of indices into points).
+    """
+    keys = [k for k in SWEEP_KEYS if len({p.get(k) for p in points}) > 1]
+
+    def snake(idx, depth, reverse):
+        if depth == len(keys) or len(idx) <= 1:
+            return idx
+        key = keys[depth]
+        values = sorted({points[i][key] for i in idx}, reverse=reverse)
+        out = []
+        for j, v in enumerate(values):
+            group = [i for i in idx if points[i][key] == v]
+            out += snake(group, depth + 1, reverse=bool(j % 2))
+        return out
+
+    return snake(list(range(len(points))), 0, False)
+
+
+def sweep_row(kwargs, final, iters_ran, baseline, wall_time, solver_time=float("nan")):
+    """One flat results-table row for a finished run (final: last history entry)."""
+    row = {key: kwargs[key] for key in ("Emax", "Tmax", "betaE", "betaT", "etaE", "etaT", "alpha", "rho")}
+    row["iters_ran"] = iters_ran
+    row["wall_time"] = wall_time
+    row["solver_time"] = solver_time
+    row["baseline_feasible"] = baseline is not None
+    for key in ("price", "energy", "time", "obj", "setup_time", "solve_time"):
+        row[f"baseline_{key}"] = float("nan") if baseline is None else float(baseline[key])
+
+    for key in FINAL_KEYS:
+        row[key] = float(final.get(key, float("nan")))
+    row["penalty_total"] = (kwargs["betaE"] / 2.0) * row["lamE"]**2 + (kwargs["betaT"] / 2.0) * row["lamT"]**2
+    row["all_in"] = row["price_raw"] + row["penalty_total"]
+    return row
+
+
+def _run_point(point, seed=None):
+    """
+    One run; seed = {"x", "lam", "z", "key"} from a neighbouring run
+    starts it from that run's final iterate and projector duals, and from
+    its multipliers if it has the same LAM_KEYS values (key).
+    Returns (row, seed for the next point).
+    """
+    mdp = _WORKER["mdp"]
+    projector = _WORKER["projector"]
+    kwargs = {**_WORKER["params"], **point, "verbose_every": 0,
+              "history_metrics": ("price_raw", "price_reg", "g", "lam", "g_eff", "viol", "cs", "dx1")}
+    if seed is not None:
+        kwargs.update(x0=seed["x"], z0=seed["z"])
+        # the multipliers are the dual fixed point of (budgets, betas): a different budget moves the
+        # active set and a different beta rescales lam, so only steps (eta, alpha, lam0) may differ
+        if seed["key"] == tuple(kwargs[k] for k in LAM_KEYS):
+            kwargs.update(lamE0=seed["lam"][0], lamT0=seed["lam"][1])
+
+    t0 = time.perf_counter()
+    hist, xk, _, baseline = projected_primal_dual_loop(
+        None, None, None, mdp.start, mdp.goal,
+        mdp=mdp,
+        baseline_problem=_WORKER["baseline_problem"],
+        projector=projector,
+        **kwargs,
+    )
+    final = {key: hist.last(key) for key in FINAL_KEYS}
+    row = sweep_row(kwargs, final, hist.iters_ran, baseline, time.perf_counter() - t0,
+                    solver_time=hist.solver_time)
+    row["warm_start"] = seed is not None
+    store = _WORKER["store"]
+    if store is not None:
+        row["run_id"] = store["store"].append({**kwargs, "slip": mdp.slip, "n_rows": mdp.n_rows,
+                                               "n_cols": mdp.n_cols},
+                                              row, config={**store["config"], "point": point}, xk=xk,
+                                              history=hist, experiment_name=store["name"])
+    z = None if projector.z is None else np.array(projector.z)
+    return row, {"x": xk, "lam": (final["lamE"], final["lamT"]), "z": z,
+                 "key": tuple(kwargs[k] for k in LAM_KEYS)}
+
+
+def _run_cold(point):
+    return _run_point(point)[0]
+
+
+def _run_chain(points):
+    """Run points in order, each seeded from the previous one's solution."""
+    rows, seed = [], None
+    for point in points:
+        row, seed = _run_point(point, seed)
+        rows.append(row)
+    return rows
+
+
+def run_sweep(mdp, params, points, workers=1, continuation=False, store=None):
+    """
+    Run projected_primal_dual_loop for every point (dict of overrides of
+    params) on one compiled MDP; returns one row per point, in order.
+
+    Each worker process receives the MDP once and keeps its own
+    parametrized baseline problem and projector across points.
+
+    continuation=True runs the points in order_points() order, split into
+    one contiguous chain per worker; every point after a chain's first is
+    started from its predecessor's final xk and projector duals
+    (row["warm_start"]) instead of the projection of 0. The multipliers
+    start from lamE0 / lamT0 unless the predecessor has the same budgets
+    and betas (LAM_KEYS): carried across a budget or beta change they
+    cost iterations (shipped sweep: 6205 vs 6114 cold; x / z only: 6000).
+
+    store = {"store": ResultsStore, "config": dict, "name": str} also
+    appends every run (with its full history and xk) to that results
+    store from the worker that ran it; rows then carry its run_id.
+    """
+    if not continuation:
+        if workers <= 1:
+            _init_worker(mdp, params, store)
+            return [_run_cold(p) for p in points]
+        chunksize = max(1, len(points) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(mdp, params, store)) as pool:
+            return list(pool.map(_run_cold, points, chunksize=chunksize))
+
+    order = order_points(points)
+    n_chains = max(1, min(workers, len(points)))
+    bounds = np.linspace(0, len(order), n_chains + 1).astype(int)
+    chains = [order[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    if n_chains == 1:
+        _init_worker(mdp, params, store)
+        chain_rows = [_run_chain([points[i] for i in chains[0]])]
+    else:
+        with ProcessPoolExecutor(max_workers=n_chains, initializer=_init_worker,
+                                 initargs=(mdp, params, store)) as pool:
+            chain_rows = list(pool.map(_run_chain, [[points[i] for i in c] for c in chains]))
+
+    rows = [None] * len(points)
+    for chain, out in zip(chains, chain_rows):
+        for i, row in zip(chain, out):
+            rows[i] = row
+    return rows
+
+
+def run_sweep_batched(mdp, params, points):
+    """
+    Same rows as run_sweep, but all points advance in lockstep through
+    batched_primal_dual_loop (one process; wall_time is amortized per point).
+    Baselines reuse one parametrized cvxpy problem.
+    """
+    runs = [{**params, **p} for p in points]
+
+    def col(*keys):
+        return np.array([[r[k] for k in keys] for r in runs], float)
+
+    t0 = time.perf_counter()
+    X, lam, hist = batched_primal_dual_loop(
+        mdp,
+        budgets=col("Emax", "Tmax"),
+        betas=col("betaE", "betaT"),
+        etas=col("etaE", "etaT"),
+        alpha=col("alpha")[:, 0],
+        rho=params["rho"],
+        iters=params["iters"],
+        lam0=col("lamE0", "lamT0"),
+        projection=params.get("projection", "osqp"),
+        projection_opts=params.get("projection_opts"),
+        solver=params["solver"],
+    )
+    wall_time = (time.perf_counter() - t0) / max(len(runs), 1)
+
+    base = build_baseline_problem(mdp, params["rho"], backend=params.get("baseline_backend", "cvxpy"))
+    rows = []
+    for i, kwargs in enumerate(runs):
+        last = hist["iters_ran"][i] - 1
+        g, g_eff = hist["g"][last, i], hist["g_eff"][last, i]
+        viol, cs = hist["viol"][last, i], hist["cs"][last, i]
+        final = {
+            "price_raw": hist["price_raw"][last, i],
+            "price_reg": hist["price_reg"][last, i],
+            "energy": g[0], "time": g[1],
+            "lamE": lam[i, 0], "lamT": lam[i, 1],
+            "E_eff": g_eff[0], "T_eff": g_eff[1],
+            "violE": viol[0], "violT": viol[1],
+            "csE": cs[0], "csT": cs[1],
+            "dx1": hist["dx1"][last, i],
+        }
+        baseline = solve_baseline(base, [kwargs["Emax"], kwargs["Tmax"]], solver=params["solver"])
+        rows.append(sweep_row(kwargs, final, int(hist["iters_ran"][i]), baseline, wall_time))
+    return rows
@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import yaml
+
+# make the repo's top-level packages (envs, models, solvers, ...) importable
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+TOY_CONFIG = Path(__file__).resolve().parents[1] / "configs" / "toy_3x3.yaml"
+
+
+@pytest.fixture
+def toy():
+    """The 3x3 toy config: its YAML dict plus (price, energy, time) grids, start and goal."""
+    with open(TOY_CONFIG) as f:
+        cfg = yaml.safe_load(f)
+    grids = [np.array(cfg["costs"][name], float) for name in ("price", "energy", "time")]
+    return {"cfg": cfg, "grids": grids, "start": tuple(cfg["env"]["start"]), "goal": tuple(cfg["env"]["goal"])}
@@ -0,0 +1,105 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+import models.mdp as mdp_module
+from envs.slip import slip_transitions
+from models.costs import build_cost_matrix
+from models.flow import build_flow_A_b, build_flow_A_b_sparse
+from models.indexing import build_sa_index
+from models.mdp import compile_mdp
+from models.product import build_product
+
+
+def _dense_costs(grids, goal, n_rows, n_cols, sa_list, slip):
+    """Expected one-step costs pair by pair from slip_transitions (entering the goal is free)."""
+    C = np.zeros((len(grids), len(sa_list)))
+    for k, (s, a) in enumerate(sa_list):
+        for (r2, c2), p in slip_transitions(s, a, slip, n_rows, n_cols, goal=goal).items():
+            if (r2, c2) != goal:
+                C[:, k] += p * np.array([g[r2, c2] for g in grids])
+    return C
+
+
+@pytest.mark.parametrize("slip", [0.0, 0.2])
+def test_sparse_builders_match_dense(toy, slip):
+    grids, start, goal = toy["grids"], toy["start"], toy["goal"]
+    _, sa_list, sa_idx = build_sa_index(3, 3)
+    A_dense, b_dense = build_flow_A_b(3, 3, start, goal, slip, sa_list, sa_idx)
+    A, b = build_flow_A_b_sparse(3, 3, start, goal, slip)
+    np.testing.assert_allclose(A.toarray(), A_dense, atol=1e-12)
+    np.testing.assert_array_equal(b, b_dense)
+
+    C = build_cost_matrix(grids, goal, 3, 3, slip)
+    np.testing.assert_allclose(C, _dense_costs(grids, goal, 3, 3, sa_list, slip), atol=1e-12)
+
+
+def _fresh(monkeypatch, grids, start, goal, slip):
+    """compile_mdp with an empty LRU, so the map is built from scratch (not patched from a cached one)."""
+    monkeypatch.setattr(mdp_module, "_CACHE", OrderedDict())
+    return compile_mdp(*grids, start, goal, slip)
+
+
+def _assert_same_map(got, want):
+    np.testing.assert_allclose(got.C, want.C, atol=1e-12)
+    np.testing.assert_allclose(got.A.toarray(), want.A.toarray(), atol=1e-12)
+    np.testing.assert_allclose(got.P.toarray(), want.P.toarray(), atol=1e-12)
+    np.testing.assert_array_equal(got.b, want.b)
+    np.testing.assert_array_equal(got.goal_idx, want.goal_idx)
+    assert got.key == want.key
+
+
+def test_patches_match_fresh_compile(toy, monkeypatch):
+    grids, start, goal = toy["grids"], toy["start"], toy["goal"]
+    base = compile_mdp(*grids, start, goal, 0.0)
+
+    edited = [g.copy() for g in grids]
+    edited[0][1, 1], edited[2][2, 1] = 7.0, 0.5
+    patched = base.with_costs({"price": {(1, 1): 7.0}, "time": {(2, 1): 0.5}}, remember=False)
+    _assert_same_map(patched, _fresh(monkeypatch, edited, start, goal, 0.0))
+
+    patched = base.with_dynamics(slip=0.2, goal=(1, 2), remember=False)
+    _assert_same_map(patched, _fresh(monkeypatch, grids, start, (1, 2), 0.2))
+
+
+def _policy_occupancy(model, pi):
+    """Occupancy x of the grid policy pi (S, 4) on model (a CompiledMDP or ProductMDP): A x = b on its support."""
+    grid_state = getattr(model, "grid_state", np.arange(model.n_states))
+    live = np.setdiff1d(np.arange(model.n_states), model.goal_idx // 4)
+    X = np.zeros((model.n, len(live)))
+    for j, p in enumerate(live):
+        X[4 * p:4 * p + 4, j] = pi[grid_state[p]]
+    d = np.linalg.solve(model.A.toarray() @ X, model.b)
+    return X @ d
+
+
+def test_product_probabilities(toy):
+    """P(spec) read off the product occupancy matches a first-passage solve on the grid."""
+    mdp = compile_mdp(*toy["grids"], toy["start"], toy["goal"], 0.2)
+    safe = [[2, 0], [2, 1], [2, 2], [1, 2]]
+    specs = [{"type": "until", "name": "bottom_route", "safe": safe, "target": [[0, 2]]},
+             {"type": "reach", "name": "centre", "region": [[1, 1]]}]
+    product = build_product(mdp, specs)
+    pi = np.full((mdp.n_states, 4), 0.25)
+    probs = product.probabilities(_policy_occupancy(product, pi))
+
+    # h(s) = P(hit `hit` before `stop`) from s under pi, by a linear solve on the grid chain
+    P_pi = np.einsum("sa,sat->st", pi, mdp.P.toarray().reshape(mdp.n_states, 4, mdp.n_states))
+
+    def first_passage(hit, stop):
+        free = ~(hit | stop)
+        h = hit.astype(float)
+        M = np.eye(free.sum()) - P_pi[np.ix_(free, free)]
+        h[free] = np.linalg.solve(M, P_pi[np.ix_(free, hit)].sum(axis=1))
+        return h[mdp.start_state]
+
+    def cells(cs):
+        return np.isin(np.arange(mdp.n_states), [r * 3 + c for r, c in cs])
+
+    goal = cells([toy["goal"]])
+    assert probs["bottom_route"] == pytest.approx(first_passage(goal, ~cells(safe) & ~goal), abs=1e-9)
+    assert probs["centre"] == pytest.approx(first_passage(cells([[1, 1]]), goal), abs=1e-9)
+    # summed over flags, the product occupancy is the grid policy's occupancy
+    np.testing.assert_allclose(product.grid_occupancy(_policy_occupancy(product, pi)),
+                               _policy_occupancy(mdp, pi), atol=1e-9)
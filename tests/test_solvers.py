@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from models.mdp import compile_mdp
+from solvers.checkpoint import Checkpointer, load_checkpoint
+from solvers.primal_dual import projected_primal_dual_loop
+from solvers.projection import make_projector
+
+
+@pytest.fixture
+def toy_mdp(toy):
+    return compile_mdp(*toy["grids"], toy["start"], toy["goal"], 0.2)
+
+
+def test_osqp_projection_matches_cvxpy(toy_mdp):
+    mdp = toy_mdp
+    osqp_proj = make_projector("osqp", mdp.A, mdp.b, mdp.goal_idx)
+    # an interior-point reference: cvxpy's OSQP defaults stop around 1e-4
+    cvxpy_proj = make_projector("cvxpy", mdp.A, mdp.b, mdp.goal_idx, solver="CLARABEL")
+    rng = np.random.default_rng(0)
+    for y in rng.normal(0.0, 2.0, (5, mdp.n)):
+        x = osqp_proj.project(y)
+        np.testing.assert_allclose(x, cvxpy_proj.project(y), atol=1e-5)
+        np.testing.assert_allclose(mdp.A @ x, mdp.b, atol=1e-5)
+        assert x.min() > -1e-6 and np.abs(x[mdp.goal_idx]).max() < 1e-6
+
+
+class _Crash(Exception):
+    pass
+
+
+def _crash_at(t_crash):
+    def hook(event, payload):
+        if event == "iteration" and payload["t"] == t_crash:
+            raise _Crash
+    return hook
+
+
+def test_resume_matches_uninterrupted_run(toy, toy_mdp, tmp_path):
+    """A run killed after its checkpoint at t=40 and resumed from it ends where an uninterrupted run does."""
+    toy_cfg = toy["cfg"]
+    kwargs = dict(Emax=toy_cfg["constraints"]["Emax"], Tmax=toy_cfg["constraints"]["Tmax"],
+                  betaE=1.5, betaT=1.5, alpha=0.02, etaE=0.02, etaT=0.02, iters=80, rho=1e-6,
+                  projection="osqp", baseline_backend="osqp", verbose_every=0)
+
+    def run(**extra):
+        hist, xk, _, _ = projected_primal_dual_loop(None, None, None, toy["start"], toy["goal"], mdp=toy_mdp,
+                                                    **kwargs, **extra)
+        return hist, xk
+
+    hist, xk = run()
+
+    path = tmp_path / "checkpoint.npz"
+    with pytest.raises(_Crash):
+        run(hooks=[Checkpointer(path, every=20), _crash_at(47)])
+    state = load_checkpoint(path)
+    assert state["t"] == 40 and not state["finished"]
+
+    resumed, xk_resumed = run(resume=state)
+    assert resumed.iters_ran == hist.iters_ran
+    np.testing.assert_allclose(xk_resumed, xk, atol=1e-5)
+    for key in ("lamE", "lamT", "price_raw"):
+        assert resumed.last(key) == pytest.approx(hist.last(key), abs=1e-5)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from solvers.store import ResultsStore
+
+
+def _append(store, k):
+    history = pd.DataFrame({"t": np.arange(5), "price_raw": np.linspace(1.0, 2.0, 5) + k})
+    return store.append({"Emax": 10.0 + k, "iters": 5}, {"iters_ran": 5, "price_raw": 2.0 + k},
+                        config={"k": k}, xk=np.arange(8.0) + k, history=history, experiment_name="t")
+
+
+@pytest.fixture
+def two_runs(tmp_path):
+    path = tmp_path / "runs.arrows"
+    store = ResultsStore(path)
+    ids = [_append(store, k) for k in range(2)]
+    return path, path.read_bytes(), ids
+
+
+def test_round_trip(two_runs):
+    path, _, ids = two_runs
+    store = ResultsStore(path)
+    assert list(store.runs()["run_id"]) == ids
+    np.testing.assert_array_equal(store.xk(ids[1]), np.arange(8.0) + 1)
+    assert store.history(ids[0])["price_raw"].iloc[-1] == 2.0
+    assert len(store.runs(Emax=(10.5, 11.5))) == 1
+
+
+def test_truncated_tail_is_dropped(two_runs):
+    """A store cut anywhere (a crashed append) stays readable and appendable."""
+    path, data, ids = two_runs
+    for cut in np.unique(np.linspace(1, len(data) - 1, 60).astype(int)):
+        path.write_bytes(data[:cut])
+        store = ResultsStore(path)
+        n_before = len(store.table())
+        assert n_before <= 2
+        assert list(store.runs()["run_id"]) == ids[:n_before]
+        new_id = _append(store, 7)
+        assert list(store.runs()["run_id"]) == ids[:n_before] + [new_id]
+        np.testing.assert_array_equal(store.xk(new_id), np.arange(8.0) + 7)